@@ -0,0 +1,318 @@
+"""
+Benchmarks for the crawling pipeline, run against a local stand-in server
+that serves a synthetic site with the same HTML structure as the real one.
+
+Usage: python benchmark.py [--pages 5000] [--latency-ms 2]
+"""
+
+import argparse
+import logging
+import multiprocessing
+import random
+import sys
+import time
+from array import array
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+import fetcher
+from crawler import Crawler
+from graph_store import GraphStore
+from logger import logger
+
+# --- Stand-in server ---
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head><meta charset="UTF-8"><title>Crawling Assignment - {page_id}</title></head>
+<body>
+    <div class="header">
+        <div class="header-content">
+            <h1>Assignment 2: Crawling</h1>
+            <div class="page-id">Page ID: {page_id}</div>
+        </div>
+    </div>
+    <div class="container">
+        <div class="stats">
+            <div class="stat-card">
+                <div class="stat-number">{visits}</div>
+                <div class="stat-label">Total Visits</div>
+            </div>
+        </div>
+        <div class="section">
+            <h2>Outgoing Links</h2>
+            <div style="margin-bottom:1.5rem;">
+                    <span class="node-id">Node ID: <b>{node_id}</b></span><br>
+                    <span class="last-updated">Last Updated: {updated} UTC</span>
+                    <br><details style="margin-top: 0.5rem;">
+                            <summary>Previous IDs ({num_history})</summary>
+                            <div style="margin-top: 0.5rem;">{history}</div>
+                        </details>
+                </div>
+                <table class="files-table">
+                    <thead><tr><th>Name</th><th>Actions</th></tr></thead>
+                    <tbody>{rows}
+                    </tbody>
+                </table>
+        </div>
+    </div>
+</body>
+</html>
+"""
+
+ROW_TEMPLATE = """
+                        <tr>
+                            <td>
+                                <span class="file-icon">📁</span>
+                                <span class="file-name">{link}/</span>
+                            </td>
+                            <td>
+                                <a href="/{link}" class="file-link">Go</a>
+                            </td>
+                        </tr>
+                        """
+
+HISTORY_TEMPLATE = ("<div style='margin-left: 1rem; color: #95a5a6; font-size: 0.8rem;'>"
+                    "• {node_id} ({timestamp} UTC)</div>")
+
+class StandInSite:
+    """A synthetic site of `num_pages` pages with random links and node ids."""
+
+    def __init__(self, num_pages: int, max_links: int = 8, seed: int = 42,
+                 churn: float = 0.0):
+        rng = random.Random(seed)
+        self.rng = rng
+        # Probability that a request finds the page's node id changed
+        self.churn = churn
+        self.pages: List[str] = [f"page_{i:08x}" for i in range(num_pages)]
+        self.links: Dict[str, List[str]] = {}
+        for i, page in enumerate(self.pages):
+            # Link to the next page too, so everything is reachable from page 0
+            targets = {self.pages[(i + 1) % num_pages]}
+            targets.update(rng.sample(self.pages, rng.randint(0, max_links)))
+            self.links[page] = sorted(targets)
+        self.node_ids: Dict[str, str] = {page: f"node{rng.getrandbits(40):010x}" for page in self.pages}
+        self.history: Dict[str, List[Dict[str, str]]] = {page: [] for page in self.pages}
+        self.visits: Dict[str, int] = {page: 0 for page in self.pages}
+        # The real server sends no validators, so conditional fetches fall
+        # back to the content hash unless this is enabled
+        self.serve_etags = False
+
+    def update_node(self, page_id: str, node_id: str):
+        """Simulates a node id change on a page."""
+        timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
+        self.history[page_id].append({"node_id": self.node_ids[page_id], "timestamp": timestamp})
+        self.node_ids[page_id] = node_id
+
+    def etag(self, page_id: str) -> str:
+        return f'"{self.node_ids[page_id]}-{len(self.history[page_id])}"'
+
+    def render(self, page_id: str) -> str:
+        self.visits[page_id] += 1
+        history = "".join(HISTORY_TEMPLATE.format(**h) for h in self.history[page_id])
+        rows = "".join(ROW_TEMPLATE.format(link=link) for link in self.links[page_id])
+        return PAGE_TEMPLATE.format(
+            page_id=page_id, node_id=self.node_ids[page_id], visits=self.visits[page_id],
+            updated=time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime()),
+            num_history=len(self.history[page_id]), history=history, rows=rows
+        )
+
+def _serve(site: StandInSite, latency_s: float, port_queue: multiprocessing.Queue):
+    """Server process body: serves `site` on a free localhost port."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+        # Send headers and body in one write; split writes hit the 40ms
+        # Nagle / delayed-ACK stall on keep-alive connections
+        wbufsize = -1
+
+        def do_GET(self):
+            page_id = self.path.strip('/') or site.pages[0]
+            if page_id not in site.links:
+                self.send_error(404)
+                return
+            if latency_s:
+                time.sleep(latency_s)
+            if site.churn and site.rng.random() < site.churn:
+                site.update_node(page_id, f"node{site.rng.getrandbits(40):010x}")
+
+            etag = site.etag(page_id)
+            if site.serve_etags and self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                self.wfile.flush()
+                return
+
+            body = site.render(page_id).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            if site.serve_etags:
+                self.send_header('ETag', etag)
+            self.end_headers()
+            self.wfile.write(body)
+            self.wfile.flush()
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+def start_server(site: StandInSite, latency_s: float = 0.0) -> multiprocessing.Process:
+    """
+    Starts the stand-in server in its own process (so it does not compete
+    with the crawler for the GIL) and points the fetcher at it.
+    """
+    port_queue: multiprocessing.Queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve, args=(site, latency_s, port_queue), daemon=True)
+    process.start()
+    fetcher.BASE_URL = f"http://127.0.0.1:{port_queue.get()}"
+    return process
+
+# --- Benchmarks ---
+
+def bench_discovery(site: StandInSite):
+    """Wall-clock time of the sequential vs. parallel discovery crawl."""
+    print(f"\n### Discovery crawl ({len(site.pages)} pages) ###")
+
+    crawler = Crawler(start_page_id=site.pages[0])
+    start = time.perf_counter()
+    crawler.discovery_crawl(max_pages=len(site.pages))
+    sequential = time.perf_counter() - start
+    print(f"Sequential BFS:  {sequential:7.2f}s  ({len(crawler.visited)} pages, "
+          f"frontier peak {crawler.crawl_stats['frontier_peak']}, "
+          f"{crawler.crawl_stats['duplicates_suppressed']} duplicates suppressed)")
+
+    crawler = Crawler(start_page_id=site.pages[0])
+    start = time.perf_counter()
+    crawler.parallel_discovery_crawl(max_pages=len(site.pages))
+    parallel = time.perf_counter() - start
+    print(f"Parallel BFS:    {parallel:7.2f}s  ({len(crawler.visited)} pages, "
+          f"frontier peak {crawler.crawl_stats['frontier_peak']}, "
+          f"{crawler.crawl_stats['duplicates_suppressed']} duplicates suppressed)")
+    print(f"Speedup:         {sequential / parallel:7.2f}x")
+
+def bench_monitoring(site: StandInSite, sweeps: int = 3):
+    """Full re-fetch vs. conditional re-fetch in monitoring sweeps."""
+    mode = "ETag / 304" if site.serve_etags else "content hash"
+    print(f"\n### Monitoring sweeps ({len(site.pages)} pages, churn {site.churn:.0%}, {mode}) ###")
+    crawler = Crawler(start_page_id=site.pages[0])
+    crawler.parallel_discovery_crawl(max_pages=len(site.pages))
+    pages = list(crawler.graph)
+
+    for name, keep_validators in [("Full re-fetch", False), ("Conditional", True)]:
+        start, start_cpu = time.perf_counter(), time.process_time()
+        for _ in range(sweeps):
+            if not keep_validators:
+                fetcher._validators.clear()
+            crawler.monitor_pages(pages)
+        elapsed = (time.perf_counter() - start) / sweeps
+        cpu = (time.process_time() - start_cpu) / sweeps
+        print(f"{name:<15} {elapsed:7.2f}s wall, {cpu:7.2f}s crawler CPU per sweep")
+
+def bench_parsing(site: StandInSite, num_pages: int = 200, history_len: int = 50):
+    """Fast regex extraction vs. the full BeautifulSoup parse, per page."""
+    print(f"\n### Page parsing ({num_pages} pages, {history_len} history entries each) ###")
+    pages = site.pages[:num_pages]
+    for page in pages:
+        for i in range(history_len):
+            site.update_node(page, f"node{i:08d}")
+    html_pages = [site.render(page) for page in pages]
+
+    mismatches = sum(fetcher._extract_page_fast(html) != fetcher._parse_page_html(html)
+                     for html in html_pages)
+    print(f"Fast extraction mismatches vs BeautifulSoup: {mismatches}")
+
+    timings = {}
+    for name, parse in [
+        ("BeautifulSoup", fetcher._parse_page_html),
+        ("Fast, full", fetcher._extract_page_fast),
+        ("Fast, unchanged node",
+         lambda html: fetcher._extract_page_fast(html, known_node_id=f"node{history_len - 1:08d}")),
+    ]:
+        start = time.perf_counter()
+        for html in html_pages:
+            parse(html)
+        timings[name] = (time.perf_counter() - start) / len(html_pages) * 1000
+        print(f"{name:<22} {timings[name]:8.3f} ms/page  "
+              f"({timings['BeautifulSoup'] / timings[name]:6.1f}x)")
+
+def _deep_sizeof(obj, seen=None) -> int:
+    """Bytes held by `obj` and everything it references, each object once."""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_sizeof(k, seen) + _deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(_deep_sizeof(item, seen) for item in obj)
+    elif isinstance(obj, array):
+        pass  # getsizeof already includes the buffer
+    return size
+
+def bench_memory(site: StandInSite, max_history: int = 20):
+    """Memory per page: dict-of-lists graph and history vs. the interned store."""
+    print(f"\n### Graph memory ({len(site.pages)} pages, up to {max_history} history entries) ###")
+    rng = random.Random(7)
+    for page in site.pages:
+        for _ in range(rng.randint(0, max_history)):
+            site.update_node(page, f"node{rng.getrandbits(40):010x}")
+
+    # The dict layout the crawler used to keep: fetched lists and dicts as-is
+    graph, node_history = {}, {}
+    for html in (site.render(page) for page in site.pages):
+        page_data = fetcher._extract_page(html)
+        graph[page_data["page_id"]] = page_data["outgoing_links"]
+        node_history[page_data["page_id"]] = page_data["node_history"]
+    dict_bytes = _deep_sizeof(graph) + _deep_sizeof(node_history)
+
+    store = GraphStore()
+    for page_id in graph:
+        store.set_links(page_id, graph[page_id])
+        store.set_history(page_id, node_history[page_id])
+    assert dict(store.graph) == graph and dict(store.node_history) == node_history
+    store_bytes = store.memory_bytes()
+
+    num_pages = len(site.pages)
+    print(f"Dict of lists:   {dict_bytes / num_pages:8.0f} bytes/page  ({dict_bytes / 2**20:.1f} MB)")
+    print(f"Interned store:  {store_bytes / num_pages:8.0f} bytes/page  ({store_bytes / 2**20:.1f} MB, "
+          f"{dict_bytes / store_bytes:.1f}x smaller)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=5000)
+    parser.add_argument("--latency-ms", type=float, default=2.0,
+                        help="Artificial per-request server latency")
+    args = parser.parse_args()
+
+    # Crawl progress logs would drown the results
+    logger.setLevel(logging.WARNING)
+
+    site = StandInSite(args.pages)
+    server = start_server(site, args.latency_ms / 1000)
+    try:
+        bench_discovery(site)
+    finally:
+        server.terminate()
+
+    for serve_etags in (False, True):
+        site = StandInSite(args.pages, churn=0.05)
+        site.serve_etags = serve_etags
+        server = start_server(site, args.latency_ms / 1000)
+        try:
+            bench_monitoring(site)
+        finally:
+            server.terminate()
+
+    bench_parsing(site)
+    bench_memory(StandInSite(args.pages))
+
+if __name__ == "__main__":
+    main()
@@ -6,8 +6,21 @@ Configuration file for the crawler pipeline.
 # Server configuration
 BASE_URL = "http://localhost:3000"
 REQUEST_TIMEOUT = 5  # 5-second timeout for requests
+MAX_CONCURRENT_REQUESTS = 32  # In-flight requests for the parallel discovery crawl
+
+# Crawl state persistence
+STATE_DB_PATH = "crawl_state.db"  # SQLite file; delete it to start a fresh crawl
+CHECKPOINT_EVERY_PAGES = 500      # Discovery: checkpoint after this many new pages
+CHECKPOINT_INTERVAL = 10          # Monitoring: checkpoint every 10 seconds
 
 # PageRank algorithm parameters
 DAMPING_FACTOR = 0.85  # Standard damping factor
 MAX_ITERATIONS = 100   # Max iterations for convergence
-TOLERANCE = 1.0e-6     # Convergence tolerance
\ No newline at end of file
+TOLERANCE = 1.0e-6     # Convergence tolerance
+
+# Adaptive monitoring scheduler
+FETCH_BUDGET_PER_SECOND = 5.0  # Global cap on monitoring fetches
+MIN_REVISIT_INTERVAL = 1.0     # Seconds; never revisit a page more often
+MAX_REVISIT_INTERVAL = 120.0   # Seconds; never leave a page longer
+PRIOR_CHANGES = 1              # Poisson prior: 1 change...
+PRIOR_SECONDS = 60.0           # ...per 60 seconds for pages with no history
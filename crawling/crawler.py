@@ -3,11 +3,20 @@
 Defines the main Crawler class.
 """
 
+import asyncio
 import numpy as np
 from collections import deque
-from typing import Deque, Set, Dict, List, Any
+from typing import Callable, Deque, Set, Dict, List, Any, Mapping, Sequence
+from config import MAX_CONCURRENT_REQUESTS, CHECKPOINT_EVERY_PAGES
 from logger import logger
-from fetcher import fetch_page
+from graph_store import GraphStore
+from fetcher import (fetch_page, fetch_page_async, create_async_session,
+                     PAGE_CHANGED, PAGE_UNCHANGED, PAGE_NOT_MODIFIED)
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
 
 class Crawler:
     def __init__(self, start_page_id: str):
@@ -17,11 +26,31 @@ class Crawler:
         # For BFS discovery
         self.frontier: Deque[str] = deque([start_page_id])
         self.visited: Set[str] = set()
+        # Every page ever put in the frontier, so each is queued at most once
+        # and the frontier is bounded by O(V) instead of O(E)
+        self.enqueued: Set[str] = {start_page_id}
+        self.crawl_stats: Dict[str, int] = {
+            "frontier_size": 1,
+            "frontier_peak": 1,
+            "duplicates_suppressed": 0,
+            "peak_rss_kb": 0,
+        }
         
         # --- Data to be collected ---
-        self.graph: Dict[str, List[str]] = {} 
+        # Links and node history live in compact interned arrays; `graph`
+        # and `node_history` are read-only dict-like views over them
+        self.store = GraphStore()
+        self.graph: Mapping[str, List[str]] = self.store.graph
         self.node_states: Dict[str, str] = {}
-        self.node_history: Dict[str, List[Dict]] = {} 
+        self.node_history: Mapping[str, Sequence[Dict]] = self.store.node_history
+
+        # Pages whose outgoing links changed since the last PageRank refresh
+        self.changed_pages: Set[str] = set()
+
+        # --- Persistence (see state_store.py) ---
+        self.state_store = None  # Set by main.py to checkpoint during discovery
+        self.unsaved_pages: Set[str] = set()
+        self.unsaved_enqueued: List[str] = [start_page_id]
         
         # --- Priority Monitoring Lists ---
         self.p1_pages: List[str] = [] # High priority
@@ -40,7 +69,11 @@ class Crawler:
             return
 
         # Objective 2: Update graph structure
-        self.graph[page_id] = page_data.get("outgoing_links", [])
+        links = page_data.get("outgoing_links", [])
+        if self.graph.get(page_id) != links:
+            self.changed_pages.add(page_id)
+            self.unsaved_pages.add(page_id)
+            self.store.set_links(page_id, links)
 
         # Objective 3: Track node ID updates
         current_node_id = page_data.get("node_id")
@@ -54,7 +87,43 @@ class Crawler:
                 logger.info(f"Discovered Page {page_id} (Node: {current_node_id})")
             
             self.node_states[page_id] = current_node_id
-            self.node_history[page_id] = page_data.get("node_history", [])
+            self.store.set_history(page_id, page_data.get("node_history", []))
+            self.unsaved_pages.add(page_id)
+
+    def _enqueue_links(self, page_id: str, push: Callable[[str], None]):
+        """
+        Pushes the not-yet-enqueued outgoing links of `page_id` to the
+        frontier via `push`, counting the ones suppressed as duplicates.
+        """
+        for link in self.graph.get(page_id, []):
+            if link in self.enqueued:
+                self.crawl_stats["duplicates_suppressed"] += 1
+            else:
+                self.enqueued.add(link)
+                self.unsaved_enqueued.append(link)
+                push(link)
+
+    def _maybe_checkpoint(self):
+        """Checkpoints to the state store once enough pages are unsaved."""
+        if self.state_store is not None and len(self.unsaved_pages) >= CHECKPOINT_EVERY_PAGES:
+            self.state_store.checkpoint(self)
+
+    def _update_crawl_stats(self, frontier_size: int):
+        """Records the current frontier size and its running peak."""
+        self.crawl_stats["frontier_size"] = frontier_size
+        if frontier_size > self.crawl_stats["frontier_peak"]:
+            self.crawl_stats["frontier_peak"] = frontier_size
+
+    def _log_crawl_stats(self):
+        """Logs the frontier stats plus the process's peak resident memory."""
+        if resource is not None:
+            # ru_maxrss is in kilobytes on Linux
+            self.crawl_stats["peak_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        logger.info(f"Crawl stats: frontier {self.crawl_stats['frontier_size']} "
+                    f"(peak {self.crawl_stats['frontier_peak']}), "
+                    f"{self.crawl_stats['duplicates_suppressed']} duplicate links suppressed, "
+                    f"peak RSS {self.crawl_stats['peak_rss_kb'] / 1024:.1f} MB, "
+                    f"graph store {self.store.memory_bytes() / max(len(self.graph), 1):.0f} bytes/page")
 
     def discovery_crawl(self, max_pages: int = 1000):
         """
@@ -71,6 +140,8 @@ class Crawler:
                 
             page_data = fetch_page(current_page_id)
             if not page_data:
+                # Allow a later link to queue it again
+                self.enqueued.discard(current_page_id)
                 continue 
                 
             self.visited.add(current_page_id)
@@ -78,11 +149,84 @@ class Crawler:
             
             self._process_page_data(page_data)
             
-            for link in self.graph.get(current_page_id, []):
-                if link not in self.visited:
-                    self.frontier.append(link)
+            self._enqueue_links(current_page_id, self.frontier.append)
+            self._update_crawl_stats(len(self.frontier))
+            self._maybe_checkpoint()
                             
         logger.info(f"Discovery crawl finished. Visited {len(self.visited)} pages.")
+        self._log_crawl_stats()
+
+    def parallel_discovery_crawl(self, max_pages: int = 1000,
+                                 concurrency: int = MAX_CONCURRENT_REQUESTS):
+        """
+        Phase 1 (parallel): Same BFS discovery as discovery_crawl, but keeps
+        up to `concurrency` requests in flight over a shared keep-alive pool.
+        """
+        logger.info(f"--- Starting Parallel Discovery Crawl (concurrency={concurrency}) ---")
+        asyncio.run(self._parallel_discovery(max_pages, concurrency))
+        logger.info(f"Discovery crawl finished. Visited {len(self.visited)} pages.")
+        self._log_crawl_stats()
+
+    async def _parallel_discovery(self, max_pages: int, concurrency: int):
+        """
+        Worker-pool BFS. All bookkeeping runs on the event loop thread, so
+        `self.enqueued` needs no locking: a page is queued at most once, and
+        pages left over when `max_pages` is hit go back to `self.frontier`.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        while self.frontier:
+            page_id = self.frontier.popleft()
+            if page_id not in self.visited:
+                queue.put_nowait(page_id)
+
+        # Fetches started (including in-flight ones), so we never overshoot
+        pages_started = 0
+
+        async def worker(session):
+            nonlocal pages_started
+            while True:
+                page_id = await queue.get()
+                try:
+                    if pages_started >= max_pages:
+                        self.frontier.append(page_id)
+                        continue
+
+                    pages_started += 1
+                    page_data = await fetch_page_async(session, page_id)
+                    if not page_data:
+                        pages_started -= 1
+                        self.enqueued.discard(page_id)
+                        continue
+
+                    self.visited.add(page_id)
+                    self._process_page_data(page_data)
+
+                    self._enqueue_links(page_id, queue.put_nowait)
+                    self._update_crawl_stats(queue.qsize())
+                    self._maybe_checkpoint()
+                except Exception as e:
+                    # A dead worker would leave queue.join() waiting forever
+                    logger.error(f"Error processing page {page_id}: {e}")
+                finally:
+                    queue.task_done()
+
+        async with create_async_session(concurrency) as session:
+            workers = [asyncio.create_task(worker(session)) for _ in range(concurrency)]
+            await queue.join()
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        self._update_crawl_stats(len(self.frontier))
+
+    def pop_graph_changes(self) -> Set[str]:
+        """
+        Returns the pages whose links changed since the last call and
+        resets the change set. Used to feed IncrementalPageRank.
+        """
+        changed = self.changed_pages
+        self.changed_pages = set()
+        return changed
 
     def set_monitoring_priorities(self, ranks: Dict[str, float]):
         """
@@ -131,16 +275,27 @@ class Crawler:
             return 0
             
         updates_found = 0
+        status_counts = {PAGE_CHANGED: 0, PAGE_UNCHANGED: 0, PAGE_NOT_MODIFIED: 0}
         
         for page_id in pages_to_check:
-            page_data = fetch_page(page_id)
-            if page_data:
-                old_node_id = self.node_states.get(page_id)
-                self._process_page_data(page_data)
-                
-                if old_node_id != self.node_states.get(page_id):
-                    updates_found += 1
+            old_node_id = self.node_states.get(page_id)
+            page_data = fetch_page(page_id, known_node_id=old_node_id, conditional=True)
+            if not page_data:
+                continue
+
+            status_counts[page_data["status"]] += 1
+            # Unchanged / not-modified pages carry no data to process
+            if page_data["status"] != PAGE_CHANGED:
+                continue
+
+            self._process_page_data(page_data)
+            
+            if old_node_id != self.node_states.get(page_id):
+                updates_found += 1
         
         logger.info(f"Monitoring sweep finished for {len(pages_to_check)} pages. "
-                    f"Found {updates_found} updates.")
+                    f"Found {updates_found} updates. "
+                    f"(changed: {status_counts[PAGE_CHANGED]}, "
+                    f"unchanged hash: {status_counts[PAGE_UNCHANGED]}, "
+                    f"not modified: {status_counts[PAGE_NOT_MODIFIED]})")
         return updates_found
\ No newline at end of file
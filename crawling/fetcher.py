@@ -4,19 +4,39 @@ Handles fetching and parsing page data from the web server.
 This version parses HTML.
 """
 
+import asyncio
+import hashlib
+import re
+import aiohttp
 import requests
 from bs4 import BeautifulSoup
 from typing import Optional, Dict, List, Any
 from config import BASE_URL, REQUEST_TIMEOUT
 from logger import logger
 
+# Shared session so sequential fetches reuse keep-alive connections
+_session = requests.Session()
+
+# --- Fetch outcome, stored under page_data["status"] ---
+PAGE_CHANGED = "changed"             # Parsed normally
+PAGE_UNCHANGED = "unchanged"         # Body hash matched the last fetch, not parsed
+PAGE_NOT_MODIFIED = "not_modified"   # Server answered 304, no body
+
+# Per-page validators from the last full fetch: ETag, Last-Modified and a
+# hash of the page content
+_validators: Dict[str, Dict[str, Optional[str]]] = {}
+
+# The visit counter above this marker changes on every request, so only the
+# rest of the page (node id, history, links) is hashed
+_CONTENT_MARKER = '<span class="node-id">'
+
 def find_start_page_id() -> Optional[str]:
     """
     Fetches the base URL (/) to discover the initial start page ID.
     """
     logger.info(f"Discovering start page ID from {BASE_URL}/")
     try:
-        response = requests.get(BASE_URL, timeout=REQUEST_TIMEOUT)
+        response = _session.get(BASE_URL, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
 
         if 'text/html' not in response.headers.get('Content-Type', ''):
@@ -65,53 +85,168 @@ def _parse_node_history(details_tag) -> List[Dict[str, str]]:
         logger.warning(f"Could not parse node history: {e}")
     return history
 
-def fetch_page(page_id: str) -> Optional[Dict[str, Any]]:
+def _parse_page_html(html: str) -> Dict[str, Any]:
+    """
+    Parses the HTML of a page into the page data dictionary.
+    Raises AttributeError if the expected tags are missing.
+    """
+    soup = BeautifulSoup(html, 'lxml')
+    
+    # 1. Extract Page ID
+    page_id_tag = soup.find('div', class_='page-id')
+    extracted_page_id = page_id_tag.text.split(':')[-1].strip()
+
+    # 2. Extract Node ID
+    node_id_tag = soup.find('span', class_='node-id')
+    extracted_node_id = node_id_tag.find('b').text.strip()
+    
+    # 3. Extract Node History
+    details_tag = soup.find('details')
+    extracted_history = _parse_node_history(details_tag)
+    
+    # 4. Extract Outgoing Links
+    links = []
+    table = soup.find('table', class_='files-table')
+    if table:
+        for link_tag in table.find_all('a', class_='file-link'):
+            href = link_tag.get('href', '')
+            link_page_id = href.split('/')[-1]
+            if link_page_id:
+                links.append(link_page_id)
+
+    # --- Build the same dictionary structure as before ---
+    return {
+        "page_id": extracted_page_id,
+        "node_id": extracted_node_id,
+        "node_history": extracted_history,
+        "outgoing_links": links
+    }
+
+# --- Fast extraction ---
+# Targeted patterns for the four things we need, so monitoring does not
+# build a full BeautifulSoup tree per page. Anything unexpected makes
+# _extract_page_fast return None and the BeautifulSoup parser takes over.
+_PAGE_ID_RE = re.compile(r'<div class="page-id">([^<]*)</div>')
+_NODE_ID_RE = re.compile(r'<span class="node-id">[^<]*<b>([^<]*)</b>')
+_DETAILS_RE = re.compile(r'<details[^>]*>(.*?)</details>', re.S)
+_HISTORY_ITEM_RE = re.compile(r'<div[^>]*>\s*•\s*([^<]*?)\s*</div>')
+_FILES_TABLE_RE = re.compile(r'<table class="files-table">(.*?)</table>', re.S)
+_LINK_TAG_RE = re.compile(r'<a\s([^>]*)>')
+_HREF_RE = re.compile(r'href="([^"]*)"')
+
+def _extract_page_fast(html: str, known_node_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Pulls page_id, node_id, node_history and outgoing_links straight out of
+    the raw HTML. The history block is skipped when the node id equals
+    `known_node_id`, since the crawler only stores history on a change.
+    Returns None if the page does not look as expected.
+    """
+    page_id_match = _PAGE_ID_RE.search(html)
+    node_id_match = _NODE_ID_RE.search(html)
+    if not page_id_match or not node_id_match:
+        return None
+    extracted_page_id = page_id_match.group(1).split(':')[-1].strip()
+    extracted_node_id = node_id_match.group(1).strip()
+
+    history = []
+    if extracted_node_id != known_node_id:
+        details_match = _DETAILS_RE.search(html, node_id_match.end())
+        if details_match:
+            for text in _HISTORY_ITEM_RE.findall(details_match.group(1)):
+                if '(' in text and ')' in text:
+                    node_id, timestamp = text.split(' (', 1)
+                    history.append({"node_id": node_id, "timestamp": timestamp.strip(')')})
+
+    links = []
+    table_match = _FILES_TABLE_RE.search(html)
+    if table_match:
+        for attrs in _LINK_TAG_RE.findall(table_match.group(1)):
+            if 'class="file-link"' not in attrs:
+                continue
+            href_match = _HREF_RE.search(attrs)
+            link_page_id = href_match.group(1).split('/')[-1] if href_match else ''
+            if link_page_id:
+                links.append(link_page_id)
+
+    return {
+        "page_id": extracted_page_id,
+        "node_id": extracted_node_id,
+        "node_history": history,
+        "outgoing_links": links
+    }
+
+def _extract_page(html: str, known_node_id: Optional[str] = None) -> Dict[str, Any]:
+    """Fast extraction, falling back to the full BeautifulSoup parse."""
+    page_data = _extract_page_fast(html, known_node_id)
+    if page_data is None:
+        logger.warning("Fast extraction failed, falling back to BeautifulSoup.")
+        page_data = _parse_page_html(html)
+    return page_data
+
+def _conditional_headers(page_id: str) -> Dict[str, str]:
+    """If-None-Match / If-Modified-Since headers from the stored validators."""
+    validators = _validators.get(page_id, {})
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
+
+def _update_validators(page_id: str, html: str, response_headers) -> bool:
+    """
+    Stores the validators of a full response. Returns True if the page
+    content hash is the same as on the previous fetch.
+    """
+    start = html.find(_CONTENT_MARKER)
+    content = html[start:] if start != -1 else html
+    content_hash = hashlib.blake2b(content.encode('utf-8'), digest_size=16).hexdigest()
+
+    previous = _validators.get(page_id)
+    _validators[page_id] = {
+        "etag": response_headers.get('ETag'),
+        "last_modified": response_headers.get('Last-Modified'),
+        "hash": content_hash,
+    }
+    return previous is not None and previous["hash"] == content_hash
+
+def _process_response(page_id: str, html: str, response_headers,
+                      known_node_id: Optional[str], conditional: bool) -> Dict[str, Any]:
+    """Short-circuits unchanged pages, otherwise extracts the page data."""
+    unchanged = _update_validators(page_id, html, response_headers)
+    if conditional and unchanged:
+        return {"page_id": page_id, "status": PAGE_UNCHANGED}
+
+    page_data = _extract_page(html, known_node_id)
+    page_data["status"] = PAGE_CHANGED
+    return page_data
+
+def fetch_page(page_id: str, known_node_id: Optional[str] = None,
+               conditional: bool = False) -> Optional[Dict[str, Any]]:
     """
     Fetches a single page from the server, parses its HTML,
     and returns its content as a dictionary.
+    Pass the last seen `known_node_id` to skip history parsing when unchanged.
+
+    With `conditional=True` the request carries the stored validators, and
+    a page that is not modified (304) or whose content hash is unchanged is
+    returned as just {"page_id", "status"} without being parsed.
     """
-    # ... (This function remains unchanged)
     url = f"{BASE_URL}/{page_id}"
     try:
-        response = requests.get(url, timeout=REQUEST_TIMEOUT)
+        headers = _conditional_headers(page_id) if conditional else {}
+        response = _session.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
+
+        if response.status_code == 304:
+            return {"page_id": page_id, "status": PAGE_NOT_MODIFIED}
         
         if 'text/html' not in response.headers.get('Content-Type', ''):
             logger.error(f"Server returned non-HTML content for page {page_id}.")
             return None
 
-        # --- Parse the HTML ---
-        soup = BeautifulSoup(response.text, 'lxml')
-        
-        # 1. Extract Page ID
-        page_id_tag = soup.find('div', class_='page-id')
-        extracted_page_id = page_id_tag.text.split(':')[-1].strip()
-
-        # 2. Extract Node ID
-        node_id_tag = soup.find('span', class_='node-id')
-        extracted_node_id = node_id_tag.find('b').text.strip()
-        
-        # 3. Extract Node History
-        details_tag = soup.find('details')
-        extracted_history = _parse_node_history(details_tag)
-        
-        # 4. Extract Outgoing Links
-        links = []
-        table = soup.find('table', class_='files-table')
-        if table:
-            for link_tag in table.find_all('a', class_='file-link'):
-                href = link_tag.get('href', '')
-                link_page_id = href.split('/')[-1]
-                if link_page_id:
-                    links.append(link_page_id)
-
-        # --- Build the same dictionary structure as before ---
-        return {
-            "page_id": extracted_page_id,
-            "node_id": extracted_node_id,
-            "node_history": extracted_history,
-            "outgoing_links": links
-        }
+        return _process_response(page_id, response.text, response.headers,
+                                 known_node_id, conditional)
 
     except requests.exceptions.HTTPError as e:
         logger.error(f"HTTP error for page {page_id}: {e}")
@@ -124,4 +259,52 @@ def fetch_page(page_id: str) -> Optional[Dict[str, Any]]:
     except Exception as e:
         logger.error(f"An unexpected error occurred for page {page_id}: {e}")
     
+    return None
+
+def create_async_session(concurrency: int) -> aiohttp.ClientSession:
+    """
+    Creates an aiohttp session with a keep-alive pool of at most
+    `concurrency` connections. Must be called inside a running event loop.
+    """
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+async def fetch_page_async(
+    session: aiohttp.ClientSession, page_id: str,
+    known_node_id: Optional[str] = None, conditional: bool = False
+) -> Optional[Dict[str, Any]]:
+    """
+    Async version of fetch_page. Uses the session's connection pool,
+    so many requests can be in flight at once.
+    """
+    url = f"{BASE_URL}/{page_id}"
+    try:
+        headers = _conditional_headers(page_id) if conditional else {}
+        async with session.get(url, headers=headers) as response:
+            response.raise_for_status()
+
+            if response.status == 304:
+                return {"page_id": page_id, "status": PAGE_NOT_MODIFIED}
+
+            if 'text/html' not in response.headers.get('Content-Type', ''):
+                logger.error(f"Server returned non-HTML content for page {page_id}.")
+                return None
+
+            html = await response.text()
+
+        return _process_response(page_id, html, response.headers,
+                                 known_node_id, conditional)
+
+    except aiohttp.ClientResponseError as e:
+        logger.error(f"HTTP error for page {page_id}: {e}")
+    except aiohttp.ClientConnectionError:
+        logger.error(f"Connection error for page {page_id}. Server may be down.")
+    except asyncio.TimeoutError:
+        logger.error(f"Request timeout for page {page_id}")
+    except AttributeError as e:
+        logger.error(f"Failed to parse HTML for page {page_id}. Structure may be new. Error: {e}")
+    except Exception as e:
+        logger.error(f"An unexpected error occurred for page {page_id}: {e}")
+
     return None
\ No newline at end of file
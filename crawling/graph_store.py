@@ -0,0 +1,272 @@
+"""
+Compact, array-backed storage for the crawled graph and node history.
+
+Page ids and node ids are interned once into int32 ids. Outgoing links are
+kept as CSR-style rows (per-page offset + length into one int32 target
+array) and node history as two columns (node id, epoch timestamp), so a
+page costs a few machine words instead of a list of string references and
+a list of dicts.
+
+The `graph` and `node_history` views are read-only Mappings with the same
+shape as the old Dict[str, List[str]] / Dict[str, List[Dict]], so
+pagerank.py, visualizer.py and the scheduler work on them unchanged.
+"""
+
+import re
+import sys
+import time
+from array import array
+from collections.abc import Mapping, Sequence
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+
+HISTORY_TIME_FORMAT = "%Y-%m-%d %H:%M:%S UTC"
+_TIMESTAMP_RE = re.compile(r'\d{4}-\d\d-\d\d \d\d:\d\d:\d\d UTC')
+
+# Compact once at least this many slots (and half the array) are dead
+MIN_COMPACT_GARBAGE = 4096
+
+class IdTable:
+    """Interns strings to dense int ids (0, 1, 2, ...) and back."""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.names: List[str] = []
+
+    def intern(self, name: str) -> int:
+        idx = self.ids.get(name)
+        if idx is None:
+            idx = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return idx
+
+    def get(self, name: str) -> Optional[int]:
+        return self.ids.get(name)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+class _Rows:
+    """
+    Variable-length rows of parallel typed columns, indexed by page id.
+
+    Row i lives at columns[c][starts[i]:starts[i] + lengths[i]] (length -1
+    means no row). A row that shrinks is rewritten in place, a row at the
+    end of the arrays grows in place, and any other row that grows is
+    re-appended at the end. The dead slots this leaves are reclaimed by
+    compact(), which rewrites the rows back-to-back in page order.
+    """
+
+    def __init__(self, *typecodes: str):
+        self.typecodes = typecodes
+        self.columns = [array(tc) for tc in typecodes]
+        self.starts = array('q')
+        self.lengths = array('i')
+        self.garbage = 0
+
+    def __contains__(self, idx: int) -> bool:
+        return idx < len(self.lengths) and self.lengths[idx] >= 0
+
+    def row(self, idx: int, column: int) -> array:
+        start = self.starts[idx]
+        return self.columns[column][start:start + self.lengths[idx]]
+
+    def set(self, idx: int, *values: array):
+        if idx >= len(self.lengths):
+            missing = idx + 1 - len(self.lengths)
+            self.starts.extend([0] * missing)
+            self.lengths.extend([-1] * missing)
+
+        n = len(values[0])
+        start, old_n = self.starts[idx], self.lengths[idx]
+        end = len(self.columns[0])
+        if 0 <= n <= old_n:
+            for column, new in zip(self.columns, values):
+                column[start:start + n] = new
+            self.garbage += old_n - n
+        elif old_n >= 0 and start + old_n == end:
+            for column, new in zip(self.columns, values):
+                del column[start:]
+                column.extend(new)
+        else:
+            self.garbage += max(old_n, 0)
+            self.starts[idx] = end
+            for column, new in zip(self.columns, values):
+                column.extend(new)
+        self.lengths[idx] = n
+
+        if self.garbage >= MIN_COMPACT_GARBAGE and 2 * self.garbage > len(self.columns[0]):
+            self.compact()
+
+    def compact(self):
+        columns = [array(tc) for tc in self.typecodes]
+        for idx, n in enumerate(self.lengths):
+            if n < 0:
+                continue
+            start = self.starts[idx]
+            self.starts[idx] = len(columns[0])
+            for new, old in zip(columns, self.columns):
+                new.extend(old[start:start + n])
+        self.columns = columns
+        self.garbage = 0
+
+    def nbytes(self) -> int:
+        arrays = self.columns + [self.starts, self.lengths]
+        return sum(a.buffer_info()[1] * a.itemsize for a in arrays)
+
+class GraphStore:
+    """Interned page/node ids, CSR link rows and columnar node history."""
+
+    def __init__(self):
+        self.pages = IdTable()
+        self.nodes = IdTable()
+        self._links = _Rows('i')           # Target page ids
+        self._history = _Rows('i', 'q')    # (node id, epoch seconds)
+        # Timestamps not in HISTORY_TIME_FORMAT, interned verbatim; encoded
+        # as -(id + 1) in the timestamp column
+        self._raw_timestamps = IdTable()
+        # Page ids in the order their links / history were first set
+        self._link_order = array('i')
+        self._history_order = array('i')
+
+        self.graph = GraphView(self)
+        self.node_history = HistoryView(self)
+
+    # --- Links ---
+
+    def set_links(self, page_id: str, links: List[str]):
+        """Adds a page, or replaces the outgoing links of a known page."""
+        idx = self.pages.intern(page_id)
+        if idx not in self._links:
+            self._link_order.append(idx)
+        self._links.set(idx, array('i', [self.pages.intern(link) for link in links]))
+
+    def links(self, page_id: str) -> Optional[List[str]]:
+        idx = self.pages.get(page_id)
+        if idx is None or idx not in self._links:
+            return None
+        names = self.pages.names
+        return [names[target] for target in self._links.row(idx, 0)]
+
+    def num_links(self) -> int:
+        return len(self._links.columns[0]) - self._links.garbage
+
+    # --- Node history ---
+
+    def set_history(self, page_id: str, history: List[Dict]):
+        """Replaces the node history of a page."""
+        idx = self.pages.intern(page_id)
+        if idx not in self._history:
+            self._history_order.append(idx)
+        node_ids = array('i', [self.nodes.intern(h["node_id"]) for h in history])
+        timestamps = array('q', [self._encode_timestamp(h["timestamp"]) for h in history])
+        self._history.set(idx, node_ids, timestamps)
+
+    def _encode_timestamp(self, timestamp: str) -> int:
+        if _TIMESTAMP_RE.fullmatch(timestamp):
+            try:
+                epoch = int(datetime.fromisoformat(timestamp[:-4])
+                            .replace(tzinfo=timezone.utc).timestamp())
+                if epoch >= 0:
+                    return epoch
+            except ValueError:
+                pass
+        return -self._raw_timestamps.intern(timestamp) - 1
+
+    def _decode_timestamp(self, value: int) -> str:
+        if value < 0:
+            return self._raw_timestamps.names[-value - 1]
+        return time.strftime(HISTORY_TIME_FORMAT, time.gmtime(value))
+
+    def history_length(self, idx: int) -> int:
+        return self._history.lengths[idx]
+
+    def history_entry(self, idx: int, position: int) -> Dict[str, str]:
+        offset = self._history.starts[idx] + position
+        node_ids, timestamps = self._history.columns
+        return {"node_id": self.nodes.names[node_ids[offset]],
+                "timestamp": self._decode_timestamp(timestamps[offset])}
+
+    # --- Stats ---
+
+    def memory_bytes(self) -> int:
+        """Approximate bytes held: arrays, id tables and interned strings."""
+        total = self._links.nbytes() + self._history.nbytes()
+        total += sum(a.buffer_info()[1] * a.itemsize for a in (self._link_order, self._history_order))
+        for table in (self.pages, self.nodes, self._raw_timestamps):
+            total += sys.getsizeof(table.ids) + sys.getsizeof(table.names)
+            total += sum(sys.getsizeof(name) for name in table.names)
+        return total
+
+class GraphView(Mapping):
+    """Read-only Dict[str, List[str]] view of the link rows."""
+
+    def __init__(self, store: GraphStore):
+        self._store = store
+
+    def __getitem__(self, page_id: str) -> List[str]:
+        links = self._store.links(page_id)
+        if links is None:
+            raise KeyError(page_id)
+        return links
+
+    def __contains__(self, page_id) -> bool:
+        idx = self._store.pages.get(page_id)
+        return idx is not None and idx in self._store._links
+
+    def __iter__(self) -> Iterator[str]:
+        names = self._store.pages.names
+        return (names[idx] for idx in self._store._link_order)
+
+    def __len__(self) -> int:
+        return len(self._store._link_order)
+
+class PageHistory(Sequence):
+    """Lazy List[Dict] of one page's history; entries are decoded on access."""
+
+    def __init__(self, store: GraphStore, idx: int):
+        self._store = store
+        self._idx = idx
+
+    def __len__(self) -> int:
+        return self._store.history_length(self._idx)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError(position)
+        return self._store.history_entry(self._idx, position)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, (list, Sequence)):
+            return NotImplemented
+        return len(self) == len(other) and list(self) == list(other)
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+class HistoryView(Mapping):
+    """Read-only Dict[str, List[Dict]] view of the history columns."""
+
+    def __init__(self, store: GraphStore):
+        self._store = store
+
+    def __getitem__(self, page_id: str) -> PageHistory:
+        idx = self._store.pages.get(page_id)
+        if idx is None or idx not in self._store._history:
+            raise KeyError(page_id)
+        return PageHistory(self._store, idx)
+
+    def __contains__(self, page_id) -> bool:
+        idx = self._store.pages.get(page_id)
+        return idx is not None and idx in self._store._history
+
+    def __iter__(self) -> Iterator[str]:
+        names = self._store.pages.names
+        return (names[idx] for idx in self._store._history_order)
+
+    def __len__(self) -> int:
+        return len(self._store._history_order)
@@ -7,38 +7,56 @@ Orchestrates the crawling, PageRank, and monitoring process.
 import time
 import sys
 from crawler import Crawler
-from pagerank import calculate_pagerank
+from pagerank import IncrementalPageRank
 from fetcher import find_start_page_id
+from scheduler import AdaptiveScheduler
+from state_store import StateStore
+from config import STATE_DB_PATH, CHECKPOINT_INTERVAL
 # Import both new functions
 from visualizer import save_dashboard_html, save_interactive_graph
 from logger import logger
 
-# --- Monitoring Intervals (in seconds) ---
+# --- Fixed Monitoring Intervals (in seconds) ---
+# No longer drive the loop; only the baseline the adaptive scheduler reports against
 P1_INTERVAL = 1
 P2_INTERVAL = 2
 P3_INTERVAL = 3
 VIZ_UPDATE_JSON_INTERVAL = 5 # Re-generate the HTML viz every 5 seconds
-BASE_SLEEP = 1
+BASE_SLEEP = 0.2 # Scheduler tick
+MAX_PAGES = 5000
 
 def main():
     logger.info("=== Crawler Pipeline Started ===")
-    
-    start_page_id = find_start_page_id()
+    startup = time.perf_counter()
+
+    # Resume from the last checkpoint if there is one
+    store = StateStore(STATE_DB_PATH)
+    start_page_id = store.get_meta("start_page_id") or find_start_page_id()
     if not start_page_id:
         logger.error("Could not find a start page ID. Exiting.")
         sys.exit(1)
+    store.set_meta("start_page_id", start_page_id)
     
     crawler = Crawler(start_page_id=start_page_id)
+    crawler.state_store = store
+    scheduler = AdaptiveScheduler()
+    resumed = store.load(crawler, scheduler)
     
     # --- Phase 1: Discovery Crawl ---
-    crawler.discovery_crawl(max_pages=5000)
+    remaining = max(MAX_PAGES - len(crawler.visited), 0)
+    if remaining and (crawler.frontier or not resumed):
+        crawler.parallel_discovery_crawl(max_pages=remaining)
+    store.checkpoint(crawler, scheduler)
     if not crawler.graph:
         logger.error("No pages were discovered. Exiting.")
         return
     logger.info(f"Discovered graph with {len(crawler.graph)} nodes.")
 
     # --- Initial PageRank & Viz ---
-    ranks = calculate_pagerank(crawler.graph)
+    # Kept across refreshes so later runs warm-start from the last vector
+    pagerank_engine = IncrementalPageRank()
+    pagerank_engine.apply_deltas(crawler.graph, crawler.pop_graph_changes())
+    ranks = pagerank_engine.compute()
     
     # Generate BOTH files
     save_dashboard_html(crawler.graph, ranks, crawler.node_history, "dashboard.html")
@@ -48,37 +66,39 @@ def main():
     logger.info("--- Your graph is at 'graph.html' ---")
 
     # --- Set Monitoring Priorities ---
+    # P1/P2/P3 buckets are kept as the fixed-interval baseline for the report
     crawler.set_monitoring_priorities(ranks)
+    fixed_intervals = {page: P1_INTERVAL for page in crawler.p1_pages}
+    fixed_intervals.update({page: P2_INTERVAL for page in crawler.p2_pages})
+    fixed_intervals.update({page: P3_INTERVAL for page in crawler.p3_pages})
+
+    scheduler.update_priorities(ranks, crawler.node_history, crawler.node_states)
+    if resumed:
+        logger.info(f"Ready to monitor {time.perf_counter() - startup:.2f}s after startup (resumed).")
 
     # --- Phase 3: Monitoring Loop ---
-    logger.info("=== Entering Priority Monitoring Mode (Press Ctrl+C to stop) ===")
+    logger.info("=== Entering Adaptive Monitoring Mode (Press Ctrl+C to stop) ===")
     
-    last_p1_check = last_p2_check = last_p3_check = 0.0
     last_viz_update = time.time()
+    last_checkpoint = time.time()
     
     try:
         while True:
             current_time = time.time()
             
-            if (current_time - last_p1_check) > P1_INTERVAL:
-                logger.info("--- Starting P1 (High) Monitoring Sweep ---")
-                crawler.monitor_pages(crawler.p1_pages)
-                last_p1_check = time.time()
-
-            if (current_time - last_p2_check) > P2_INTERVAL:
-                logger.info("--- Starting P2 (Medium) Monitoring Sweep ---")
-                crawler.monitor_pages(crawler.p2_pages)
-                last_p2_check = time.time()
-
-            if (current_time - last_p3_check) > P3_INTERVAL:
-                logger.info("--- Starting P3 (Low) Monitoring Sweep ---")
-                crawler.monitor_pages(crawler.p3_pages)
-                last_p3_check = time.time()
+            due_pages = scheduler.due_pages(current_time)
+            if due_pages:
+                logger.info(f"--- Starting Monitoring Sweep ({len(due_pages)} due pages) ---")
+                crawler.monitor_pages(due_pages)
+                scheduler.record_visits(due_pages, crawler.node_states,
+                                        crawler.node_history, time.time())
 
             # Check if we should update the visualizations
             if (current_time - last_viz_update) > VIZ_UPDATE_JSON_INTERVAL:
                 logger.info("--- Regenerating dashboard and graph with new analytics ---")
-                fresh_ranks = calculate_pagerank(crawler.graph)
+                pagerank_engine.apply_deltas(crawler.graph, crawler.pop_graph_changes())
+                fresh_ranks = pagerank_engine.compute()
+                scheduler.update_priorities(fresh_ranks, crawler.node_history, crawler.node_states)
                 
                 # Regenerate BOTH files
                 save_dashboard_html(crawler.graph, fresh_ranks, crawler.node_history, "dashboard.html")
@@ -86,6 +106,10 @@ def main():
                 
                 last_viz_update = time.time()
 
+            if (current_time - last_checkpoint) > CHECKPOINT_INTERVAL:
+                store.checkpoint(crawler, scheduler)
+                last_checkpoint = time.time()
+
             time.sleep(BASE_SLEEP)
 
     except KeyboardInterrupt:
@@ -93,14 +117,18 @@ def main():
     
     finally:
         # --- Final Save ---
+        store.checkpoint(crawler, scheduler)
+        store.close()
         logger.info("Generating final report, dashboard, and graph...")
-        final_ranks = calculate_pagerank(crawler.graph)
+        pagerank_engine.apply_deltas(crawler.graph, crawler.pop_graph_changes())
+        final_ranks = pagerank_engine.compute()
         
         # Save BOTH files one last time
         save_dashboard_html(crawler.graph, final_ranks, crawler.node_history, "dashboard.html")
         save_interactive_graph(crawler.graph, final_ranks, crawler.node_history, "graph.html")
         
         logger.info("Final report:")
+        scheduler.log_report(fixed_intervals)
         logger.info(f"Total pages discovered: {len(crawler.visited)}")
         logger.info("Total node versions tracked per page (showing top 10 most active):")
         
@@ -1,58 +1,211 @@
-# pagerank.py
 """
 Contains the PageRank calculation logic.
 """
 
-from typing import Dict, List
+import numpy as np
+from typing import Dict, List, Set, Tuple
 from config import DAMPING_FACTOR, MAX_ITERATIONS, TOLERANCE
 from logger import logger
 
+def _build_link_matrix(
+    graph: Dict[str, List[str]]
+) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Builds the sparse link structure of the graph once.
+
+    Pages are mapped to integer ids (their position in `pages`) and every
+    distinct link between two known pages becomes one edge. Edges are stored
+    in CSC order (grouped by target page), so `indptr[j]:indptr[j+1]` is the
+    slice of `sources` linking into page j.
+
+    Returns (pages, indptr, sources, out_degree).
+    """
+    pages = list(graph.keys())
+    page_index = {page: i for i, page in enumerate(pages)}
+
+    src_ids: List[int] = []
+    dst_ids: List[int] = []
+    for page, links in graph.items():
+        src = page_index[page]
+        # Links to pages outside the graph carry no rank, and a repeated link
+        # counts once (the same as the old `page in graph[...]` check)
+        targets = {page_index[link] for link in links if link in page_index}
+        src_ids.extend([src] * len(targets))
+        dst_ids.extend(targets)
+
+    num_pages = len(pages)
+    src_arr = np.asarray(src_ids, dtype=np.int64)
+    dst_arr = np.asarray(dst_ids, dtype=np.int64)
+
+    order = np.argsort(dst_arr, kind="stable")
+    sources = src_arr[order]
+    indptr = np.zeros(num_pages + 1, dtype=np.int64)
+    np.cumsum(np.bincount(dst_arr, minlength=num_pages), out=indptr[1:])
+    out_degree = np.bincount(src_arr, minlength=num_pages).astype(np.float64)
+
+    return pages, indptr, sources, out_degree
+
+def _power_iteration(
+    indptr: np.ndarray,
+    sources: np.ndarray,
+    out_degree: np.ndarray,
+    ranks: np.ndarray
+) -> Tuple[np.ndarray, int, bool, float]:
+    """
+    Runs vectorized power iteration on the CSC link structure, starting
+    from `ranks`. Rank held by dangling pages (no links to known pages) is
+    spread uniformly over all pages, so the vector always sums to 1.
+
+    Returns (ranks, iterations, converged, residual), where residual is
+    the L1 change of the last iteration.
+    """
+    num_pages = len(out_degree)
+    dangling = out_degree == 0
+    inv_degree = np.divide(1.0, out_degree, out=np.zeros_like(out_degree), where=~dangling)
+    # Target page of every edge, in the same order as `sources`
+    targets = np.repeat(np.arange(num_pages), np.diff(indptr))
+
+    total_change = 0.0
+    for i in range(MAX_ITERATIONS):
+        contrib = ranks * inv_degree
+        link_sum = np.bincount(targets, weights=contrib[sources], minlength=num_pages)
+
+        dangling_sum = ranks[dangling].sum()
+        teleport = (1.0 - DAMPING_FACTOR + DAMPING_FACTOR * dangling_sum) / num_pages
+        new_ranks = teleport + DAMPING_FACTOR * link_sum
+
+        total_change = np.abs(new_ranks - ranks).sum()
+        ranks = new_ranks
+        if total_change < TOLERANCE:
+            return ranks, i + 1, True, total_change
+
+    return ranks, MAX_ITERATIONS, False, total_change
+
 def calculate_pagerank(graph: Dict[str, List[str]]) -> Dict[str, float]:
     """
-    Calculates PageRank using the iterative power method
-    with the Gauss-Seidel optimization (using new values as they are computed).
+    Calculates PageRank using vectorized power iteration over a sparse
+    (CSC) link matrix built once per call.
     """
-    logger.info("Starting PageRank calculation (Gauss-Seidel optimized)...")
+    logger.info("Starting PageRank calculation (sparse power iteration)...")
     if not graph:
         logger.warning("Graph is empty. Cannot calculate PageRank.")
         return {}
 
-    pages = list(graph.keys())
+    pages, indptr, sources, out_degree = _build_link_matrix(graph)
     num_pages = len(pages)
-    
+
     # Initialize ranks
-    ranks = {page: 1.0 / num_pages for page in pages}
-    
-    # Pre-calculate a "dangling nodes" rank contribution
-    dangling_pages = {page for page in pages if not graph[page]}
+    ranks = np.full(num_pages, 1.0 / num_pages)
 
-    for i in range(MAX_ITERATIONS):
-        old_ranks = ranks.copy()
-        total_change = 0
-        
-        # Base rank + contribution from dangling nodes
-        dangling_sum = sum(old_ranks[page] for page in dangling_pages)
-        base_rank_part = (1.0 - DAMPING_FACTOR) / num_pages
-        dangling_part = DAMPING_FACTOR * (dangling_sum / num_pages)
-        
-        for page in pages:
-            rank_sum = 0
-            # Calculate sum of ranks from inbound links
-            for linking_page in pages:
-                if page in graph[linking_page]:
-                    num_links = len(graph[linking_page])
-                    # Use the most recent rank value (might be from this iter)
-                    rank_sum += ranks[linking_page] / num_links 
-            
-            new_rank = base_rank_part + dangling_part + DAMPING_FACTOR * rank_sum
-            
-            ranks[page] = new_rank
-            total_change += abs(ranks[page] - old_ranks[page])
-        
-        if total_change < (TOLERANCE * num_pages):
-            logger.info(f"PageRank converged after {i+1} iterations.")
-            break
+    ranks, iterations, converged, _ = _power_iteration(indptr, sources, out_degree, ranks)
+    if converged:
+        logger.info(f"PageRank converged after {iterations} iterations.")
     else:
         logger.warning(f"PageRank did not converge after {MAX_ITERATIONS} iterations.")
 
-    return ranks
\ No newline at end of file
+    return dict(zip(pages, ranks.tolist()))
+
+
+class IncrementalPageRank:
+    """
+    Stateful PageRank that survives between monitoring refreshes.
+
+    The crawler reports which pages had their links changed (or were added
+    or removed), the link matrix is rebuilt only when the structure actually
+    changed, and power iteration is warm-started from the last converged
+    vector instead of a uniform 1/N vector. After a handful of changed pages
+    the old vector is already close to the new fixed point, so a refresh
+    typically needs a few iterations instead of a full recomputation.
+    """
+
+    def __init__(self):
+        self.graph: Dict[str, List[str]] = {}
+        self.ranks: Dict[str, float] = {}
+
+        # Cached link matrix; None when the structure has changed
+        self._matrix = None
+
+        # --- Stats of the last refresh ---
+        self.last_iterations = 0
+        self.last_residual = 0.0
+        self.last_edge_updates = 0
+
+    def set_links(self, page_id: str, links: List[str]):
+        """Adds a page, or replaces the outgoing links of a known page."""
+        if self.graph.get(page_id) == links:
+            return
+        self.graph[page_id] = list(links)
+        self._matrix = None
+
+    def add_link(self, page_id: str, link: str):
+        """Adds a single edge page_id -> link."""
+        links = self.graph.get(page_id, [])
+        if link not in links:
+            self.set_links(page_id, links + [link])
+
+    def remove_link(self, page_id: str, link: str):
+        """Removes a single edge page_id -> link."""
+        links = self.graph.get(page_id)
+        if links and link in links:
+            self.set_links(page_id, [l for l in links if l != link])
+
+    def remove_page(self, page_id: str):
+        """Removes a page (and therefore all of its outgoing edges)."""
+        if self.graph.pop(page_id, None) is not None:
+            self.ranks.pop(page_id, None)
+            self._matrix = None
+
+    def apply_deltas(self, graph: Dict[str, List[str]], changed_pages: Set[str]):
+        """
+        Syncs the pages in `changed_pages` from the crawler's graph.
+        Pages missing from `graph` are treated as removed.
+        """
+        for page_id in changed_pages:
+            if page_id in graph:
+                self.set_links(page_id, graph[page_id])
+            else:
+                self.remove_page(page_id)
+
+    def compute(self) -> Dict[str, float]:
+        """
+        Returns fresh PageRank scores (a copy the caller may modify),
+        reusing the previous vector as the starting point. Iterations,
+        final residual and edge updates (iterations x edges) of the refresh
+        are kept in the `last_*` stats; all three are 0 when the graph is
+        unchanged and the refresh is skipped.
+        """
+        if not self.graph:
+            logger.warning("Graph is empty. Cannot calculate PageRank.")
+            return {}
+
+        if self._matrix is not None:
+            self.last_iterations = 0
+            self.last_residual = 0.0
+            self.last_edge_updates = 0
+            logger.info("PageRank refresh skipped: graph unchanged since last run.")
+            return dict(self.ranks)
+
+        self._matrix = _build_link_matrix(self.graph)
+        pages, indptr, sources, out_degree = self._matrix
+        num_pages = len(pages)
+
+        # Warm start: keep old scores, give new pages the uniform share
+        start = np.array([self.ranks.get(page, 1.0 / num_pages) for page in pages])
+        start /= start.sum()
+
+        ranks, iterations, converged, residual = _power_iteration(
+            indptr, sources, out_degree, start
+        )
+        self.ranks = dict(zip(pages, ranks.tolist()))
+
+        self.last_iterations = iterations
+        self.last_residual = residual
+        self.last_edge_updates = iterations * len(sources)
+
+        if converged:
+            logger.info(f"PageRank refreshed in {iterations} iterations "
+                        f"(residual {residual:.2e}, {self.last_edge_updates} edge updates).")
+        else:
+            logger.warning(f"PageRank did not converge after {MAX_ITERATIONS} iterations "
+                           f"(residual {residual:.2e}).")
+        return dict(self.ranks)
@@ -0,0 +1,545 @@
+# --- File: benchmark.py ---
+"""
+Benchmarks for the deduplication pipeline.
+
+Usage: python benchmark.py [--synthetic-pairs 1000000] [--synthetic-rows 10000000]
+                           [--synthetic-records 1000000] [--preprocessing-rows 5000,1000000,10000000]
+                           [--partitioned-copies 10,40]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+import config
+import cluster
+from pipeline import preprocessing, indexing, comparison, classification, cascade, constants, parallel, phonetic, storage
+
+def synthetic_pairs(df, num_pairs, seed=42):
+    """`num_pairs` distinct random (higher, lower) record pairs of `df`."""
+    rng = np.random.default_rng(seed)
+    ids = df.index.to_numpy()
+    first = rng.integers(0, len(ids), size=int(num_pairs * 1.1))
+    second = rng.integers(0, len(ids), size=len(first))
+    keep = first != second
+    pairs = np.unique(np.stack([np.maximum(first, second)[keep],
+                                np.minimum(first, second)[keep]], axis=1), axis=0)
+    pairs = pairs[rng.permutation(len(pairs))[:num_pairs]]
+    return pd.MultiIndex.from_arrays([ids[pairs[:, 0]], ids[pairs[:, 1]]],
+                                     names=[f"{df.index.name}_1", f"{df.index.name}_2"])
+
+def replicated(df, copies):
+    """`df` stacked `copies` times with fresh record ids (a larger input with the same key skew)."""
+    big = pd.concat([df] * copies)
+    big.index = pd.Index([f"{rec_id}-{copy}" for copy in range(copies) for rec_id in df.index],
+                         name=df.index.name)
+    return big
+
+def _traced(func, *args, **kwargs):
+    """Runs `func`, returning (result, seconds, peak traced allocation in bytes)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+def _stream_pairs(df):
+    """Consumes the candidate stream like main.py does, keeping only a count."""
+    return sum(len(batch) for batch in indexing.iter_candidate_batches(df))
+
+def bench_indexing(df, name):
+    """Per-pass recordlinkage indexes + unions vs. the streamed candidate generator."""
+    print(f"\n### Indexing: {name} ({len(df)} records) ###")
+    baseline, baseline_time, baseline_peak = _traced(indexing.create_candidate_pairs_recordlinkage, df, None)
+    print(f"recordlinkage + union: {baseline_time:8.2f}s  peak {baseline_peak / 2**20:8.1f} MB")
+
+    pairs, fast_time, fast_peak = _traced(indexing.create_candidate_pairs, df, None)
+    print(f"Streamed, collected:   {fast_time:8.2f}s  peak {fast_peak / 2**20:8.1f} MB")
+
+    num_pairs, stream_time, stream_peak = _traced(_stream_pairs, df)
+    print(f"Streamed, batches:     {stream_time:8.2f}s  peak {stream_peak / 2**20:8.1f} MB")
+
+    assert pairs.equals(baseline) and num_pairs == len(baseline)
+    print(f"Candidate pairs identical: yes ({len(baseline)} pairs, "
+          f"{baseline_time / stream_time:.1f}x faster, {baseline_peak / stream_peak:.1f}x less memory)")
+
+def _quiet(func, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+MINHASH_FIELDS = ["given_name", "surname", "address_1", "suburb", "postcode", "date_of_birth", "soc_sec_id"]
+
+def bench_minhash(df, known_file, settings=((2, 10, 4), (2, 20, 5), (2, 30, 5), (2, 40, 6), (3, 20, 4), (3, 30, 5))):
+    """
+    Recall of a MinHash/LSH pass on the known duplicate pairs (`known_file`,
+    a results CSV) vs. the number of pairs it generates, per (q, bands, rows).
+    Also counts duplicates the pass finds that the configured passes miss.
+    """
+    known = _known_pairs(known_file)
+    configured = _quiet(indexing.create_candidate_pairs, df, config.BLOCKING_PASSES)
+    print(f"\n### MinHash/LSH pass on {'+'.join(MINHASH_FIELDS)} ({len(known)} known duplicates) ###")
+    print(f"Configured passes: {len(configured)} pairs, recall {known.isin(configured).mean():.4f}")
+    print(f"{'q':>2} {'bands':>5} {'rows':>4} {'pairs':>10} {'recall':>7} {'seconds':>8} {'new dups':>8}")
+    for q, bands, rows in settings:
+        minhash_pass = {"method": "minhash", "fields": MINHASH_FIELDS, "q": q, "bands": bands, "rows": rows}
+        start = time.perf_counter()
+        pairs = _quiet(indexing.create_candidate_pairs, df, [minhash_pass])
+        elapsed = time.perf_counter() - start
+
+        extra = pairs[~pairs.isin(configured)]
+        features = comparison.compare_pairs(extra, df, config.COMPARISON_FIELDS)
+        new_duplicates = classification.find_duplicates(features, config.CLASSIFICATION_THRESHOLD, verbose=False)
+        print(f"{q:>2} {bands:>5} {rows:>4} {len(pairs):>10} {known.isin(pairs).mean():>7.4f} "
+              f"{elapsed:>8.2f} {len(new_duplicates):>8}")
+
+def _known_pairs(known_file):
+    known = storage.read_table(known_file)
+    return pd.MultiIndex.from_arrays([known["level_0"], known["level_1"]])
+
+def bench_phonetic(df, known_file, fields=("given_name", "surname"), encodings=phonetic.PHONETIC_ENCODINGS[:3]):
+    """
+    Phonetic name passes vs. the 4-character truncation passes: pairs added,
+    recall of the known duplicate pairs (`known_file`) gained per added
+    pair, and duplicates the configured passes miss. Also times encoding
+    per record vs. per distinct name, with a cold and a warm cache.
+    """
+    known = _known_pairs(known_file)
+    trunc_passes = [{"method": "block", "field": f"{field}_trunc"} for field in fields]
+    truncated = _quiet(indexing.create_candidate_pairs, df, trunc_passes)
+    configured = _quiet(indexing.create_candidate_pairs, df, config.BLOCKING_PASSES)
+    base_recall = known.isin(truncated).mean()
+    print(f"\n### Phonetic name passes ({len(known)} known duplicates) ###")
+    print(f"Truncation passes: {len(truncated)} pairs, recall {base_recall:.4f}")
+    print(f"{'field':<11} {'encoding':<10} {'pairs':>8} {'added':>8} {'recall':>7} "
+          f"{'gain/1k added':>13} {'new dups':>8}")
+    for field in fields:
+        for encoding in encodings:
+            phonetic_pass = {"method": "phonetic", "field": field, "encoding": encoding}
+            pairs = _quiet(indexing.create_candidate_pairs, df, [phonetic_pass])
+            added = pairs[~pairs.isin(truncated)]
+            recall = known.isin(truncated.append(added)).mean()
+            gain = (recall - base_recall) * len(known) / max(len(added), 1) * 1000
+            extra = pairs[~pairs.isin(configured)]
+            features = comparison.compare_pairs(extra, df, config.COMPARISON_FIELDS)
+            new_duplicates = classification.find_duplicates(features, config.CLASSIFICATION_THRESHOLD, verbose=False)
+            print(f"{field:<11} {encoding:<10} {len(pairs):>8} {len(added):>8} {recall:>7.4f} "
+                  f"{gain:>13.2f} {len(new_duplicates):>8}")
+
+    names = replicated(df[list(fields)], 200)
+    print(f"Encoding {len(names)} records ({len(fields)} fields x {len(encodings)} encodings):")
+    def per_record():
+        for field in fields:
+            for encoding in encodings:
+                encode = getattr(phonetic.jellyfish, encoding)
+                names[field].apply(lambda name: np.nan if pd.isna(name) else encode(str(name)))
+    _, record_time = _timed(per_record)
+    cache = phonetic.PhoneticCache()
+    _, cold_time = _timed(phonetic.add_phonetic_keys, names.copy(), {field: encodings for field in fields}, cache)
+    _, warm_time = _timed(phonetic.add_phonetic_keys, names.copy(), {field: encodings for field in fields}, cache)
+    print(f"  per record {record_time:.2f}s, per distinct name {cold_time:.2f}s ({record_time / cold_time:.0f}x), "
+          f"cached {warm_time:.2f}s ({record_time / warm_time:.0f}x)")
+
+TFIDF_FIELDS = ["given_name", "surname", "address_1"]
+
+def bench_tfidf(df, known_file, settings=((5, 0.3), (10, 0.3), (10, 0.5), (20, 0.3)), copies=10):
+    """
+    Recall of a top-k TF-IDF pass on `TFIDF_FIELDS` vs. the address sorted
+    neighbourhood pass, per (k, min_similarity), with the duplicates it
+    finds that the configured passes miss; then time and traced peak on
+    `copies` replicas: defaults, a 10x smaller chunk budget, and without
+    the q-grams of more than 5% of the records.
+    """
+    known = _known_pairs(known_file)
+    configured = _quiet(indexing.create_candidate_pairs, df, config.BLOCKING_PASSES)
+    address_pass = next(p for p in config.BLOCKING_PASSES if p.get("field") == "address_1")
+    address = _quiet(indexing.create_candidate_pairs, df, [address_pass])
+    print(f"\n### Top-k TF-IDF pass on {'+'.join(TFIDF_FIELDS)} ({len(known)} known duplicates) ###")
+    print(f"{indexing.describe_pass(address_pass)}: {len(address)} pairs, recall {known.isin(address).mean():.4f}")
+    print(f"{'k':>3} {'min sim':>7} {'pairs':>8} {'recall':>7} {'seconds':>8} {'new dups':>8}")
+    for k, min_similarity in settings:
+        tfidf_pass = {"method": "tfidf", "fields": TFIDF_FIELDS, "k": k, "min_similarity": min_similarity}
+        pairs, elapsed = _timed(_quiet, indexing.create_candidate_pairs, df, [tfidf_pass])
+        extra = pairs[~pairs.isin(configured)]
+        features = comparison.compare_pairs(extra, df, config.COMPARISON_FIELDS)
+        new_duplicates = classification.find_duplicates(features, config.CLASSIFICATION_THRESHOLD, verbose=False)
+        print(f"{k:>3} {min_similarity:>7} {len(pairs):>8} {known.isin(pairs).mean():>7.4f} "
+              f"{elapsed:>8.2f} {len(new_duplicates):>8}")
+
+    big = replicated(df[TFIDF_FIELDS], copies)
+    base_pass = {"method": "tfidf", "fields": TFIDF_FIELDS, "k": 10, "min_similarity": 0.3}
+    for options in ({}, {"max_entries": constants.DEFAULT_MAX_ENTRIES // 10}, {"max_df": 0.05}):
+        tfidf_pass = dict(base_pass, **options)
+        num_pairs, elapsed, peak = _traced(lambda: sum(len(batch) for batch in _quiet(
+            list, indexing.iter_candidate_batches(big, config.CANDIDATE_BATCH_SIZE, [tfidf_pass]))))
+        print(f"{len(big)} records, {options or 'defaults'}: {elapsed:.2f}s, peak {peak / 2**20:.0f} MB, "
+              f"{num_pairs} pairs")
+
+# Raw similarities only: row sums are added in a fixed column order, not in
+# pandas' layout-dependent order, so scores can be a few ulps apart
+SCORE_TOLERANCE = 1e-12
+
+def synthetic_features(num_rows, dtype=np.float64, seed=42):
+    """
+    Raw (unthresholded) similarity features for COMPARISON_FIELDS: 20% missing,
+    and a third of the rows high-scoring with one low outlier, so the trim
+    rule fires often.
+    """
+    rng = np.random.default_rng(seed)
+    labels = [comp["label"] for comp in config.COMPARISON_FIELDS]
+    outliers = rng.random(num_rows) < 1 / 3
+    low_field = rng.integers(0, len(labels), size=num_rows)
+    columns = {}
+    for j, label in enumerate(labels):
+        values = rng.random(num_rows).astype(dtype)
+        values[outliers] = 0.95
+        values[outliers & (low_field == j)] = 0.01
+        values[rng.random(num_rows) < 0.2] = np.nan
+        columns[label] = values
+    return pd.DataFrame(columns)
+
+def _score_difference(features):
+    """Largest score difference between find_duplicates and find_duplicates_pandas (all rows)."""
+    found = classification.find_duplicates(features, -np.inf, verbose=False)
+    expected = classification.find_duplicates_pandas(features.copy(), -np.inf, verbose=False)
+    assert found.index.equals(expected.index)
+    return float(np.abs(found.to_numpy() - expected.to_numpy()).max(initial=0.0))
+
+def check_classification_variants(features, seed=42):
+    """
+    The pipeline's features (0/1/NaN, weights exact in binary), also as
+    float32, with a compared column missing and with the columns
+    reordered (tied minima: both classifiers must trim the same column).
+    Row sums are then exact in any order, so scores must be identical.
+    """
+    rng = np.random.default_rng(seed)
+    labels = list(features.columns)
+    variants = {"pipeline features": features,
+                "float32": features.astype(np.float32),
+                "without address_2": features.drop(columns="address_2"),
+                "without state": features.drop(columns="state"),
+                "reversed columns": features[labels[::-1]],
+                "shuffled columns": features[list(rng.permutation(labels))]}
+    for name, variant in variants.items():
+        found = classification.find_duplicates(variant, -np.inf, verbose=False)
+        expected = classification.find_duplicates_pandas(variant.copy(), -np.inf, verbose=False)
+        pd.testing.assert_series_equal(found, expected, check_exact=True)
+        print(f"{name:<20} {len(found)} scores identical: yes")
+
+def bench_classification(features, num_rows=10_000_000, reference_rows=1_000_000, threshold=8.0):
+    """
+    pandas row-wise classifier vs. the NumPy one: identical scores on the
+    pipeline's `features`, then speed on float64 and float32 raw
+    similarities (scores within SCORE_TOLERANCE).
+    """
+    print(f"\n### Classification: {len(features)} pipeline feature rows ###")
+    check_classification_variants(features)
+    for dtype in (np.float64, np.float32):
+        features = synthetic_features(num_rows, dtype)
+        print(f"\n### Classification: {num_rows} synthetic {np.dtype(dtype).name} rows ###")
+
+        # The reference is slow and memory-hungry: time it on a prefix
+        sample = features.iloc[:reference_rows]
+        expected, reference_time, reference_peak = _traced(
+            classification.find_duplicates_pandas, sample.copy(), threshold, verbose=False)
+        difference = _score_difference(sample)
+        assert difference < SCORE_TOLERANCE, f"scores differ by {difference}"
+        print(f"pandas ({reference_rows} rows):  {reference_time:8.2f}s  ({reference_rows / reference_time:10.0f} rows/s, "
+              f"peak {reference_peak / 2**20:7.1f} MB)  max score difference {difference:.1e}")
+
+        found, fast_time, fast_peak = _traced(classification.find_duplicates, features, threshold, verbose=False)
+        print(f"NumPy ({num_rows} rows):  {fast_time:8.2f}s  ({num_rows / fast_time:10.0f} rows/s, "
+              f"peak {fast_peak / 2**20:7.1f} MB, features {features.memory_usage().sum() / 2**20:.0f} MB)  "
+              f"{(reference_time / reference_rows) / (fast_time / num_rows):.1f}x")
+        del features, sample
+
+def bench_clustering(num_records=1_000_000, links_per_record=0.6, seed=42):
+    """networkx connected components vs. pipeline/clustering.py, on synthetic strong links."""
+    rng = np.random.default_rng(seed)
+    num_links = int(num_records * links_per_record)
+    # Links between nearby ids: many small groups and some longer chains
+    left = rng.integers(0, num_records, size=num_links)
+    right = np.minimum(left + rng.integers(1, 5, size=num_links), num_records - 1)
+    record_ids = np.arange(num_records)
+    print(f"\n### Clustering: {num_records} synthetic records, {num_links} links ###")
+
+    expected, reference_time, reference_peak = _traced(cluster.assign_clusters_networkx, record_ids, left, right)
+    print(f"networkx:   {reference_time:8.2f}s  peak {reference_peak / 2**20:8.1f} MB")
+    found, fast_time, fast_peak = _traced(cluster.assign_clusters, record_ids, left, right)
+    print(f"clustering: {fast_time:8.2f}s  peak {fast_peak / 2**20:8.1f} MB")
+    assert np.array_equal(found, expected)
+    print(f"Cluster ids identical: yes ({len(np.unique(found))} clusters, "
+          f"{reference_time / fast_time:.1f}x faster, {reference_peak / fast_peak:.1f}x less memory)")
+
+def synthetic_records(records, num_records, seed=42):
+    """
+    `num_records` raw records resampled from `records`: names, suburbs, states
+    and postcodes repeat as in real data, while ids, dates of birth, street
+    numbers and addresses are mostly distinct.
+    """
+    rng = np.random.default_rng(seed)
+    sample = records.iloc[rng.integers(0, len(records), size=num_records)].reset_index(drop=True)
+    missing = rng.random(num_records) < 0.05
+    sample["soc_sec_id"] = rng.integers(1_000_000, 10_000_000, size=num_records)
+    sample["date_of_birth"] = np.where(missing, np.nan, (rng.integers(1900, 2000, size=num_records) * 10_000
+                                                         + rng.integers(1, 13, size=num_records) * 100
+                                                         + rng.integers(1, 29, size=num_records)).astype(float))
+    sample["street_number"] = np.where(rng.random(num_records) < 0.05, np.nan,
+                                       rng.integers(1, 1000, size=num_records).astype(float))
+    sample["address_1"] = sample["address_1"].where(
+        sample["address_1"].isna(), sample["address_1"].astype(str) + " " + rng.integers(0, 100, size=num_records).astype(str))
+    return sample
+
+def _read_and_clean_recordlinkage(path):
+    df = pd.read_csv(path)
+    df.index.name = "rec_id"
+    return preprocessing.clean_records_recordlinkage(df)
+
+def _timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def bench_preprocessing(records, sizes=(5_000, 1_000_000, 10_000_000), reference_rows=1_000_000):
+    """
+    Read + clean: default read_csv, recordlinkage `clean` per column and
+    `apply` for the keys vs. explicit dtypes and per-distinct-value cleaning.
+    The reference is skipped above `reference_rows`. Not traced: tracemalloc
+    slows the per-value Python code several times over.
+    """
+    for num_records in sizes:
+        print(f"\n### Preprocessing: {num_records} synthetic records ###")
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "records.csv")
+            synthetic_records(records, num_records).to_csv(path, index=False)
+            found, fast_time = _timed(_quiet, preprocessing.load_and_clean_data, path)
+            print(f"Per distinct value: {fast_time:8.2f}s  ({num_records / fast_time:10.0f} records/s)")
+            if num_records > reference_rows:
+                continue
+            expected, reference_time = _timed(_quiet, _read_and_clean_recordlinkage, path)
+            pd.testing.assert_frame_equal(found, expected, check_exact=True)
+            print(f"recordlinkage:      {reference_time:8.2f}s  ({num_records / reference_time:10.0f} records/s)  "
+                  f"identical, {reference_time / fast_time:.1f}x")
+            del expected
+        del found
+
+def _best_time(func, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def bench_storage(input_file, results_file, copies=(1, 20)):
+    """
+    Load time of each stage's input as CSV vs. Parquet vs. Feather: the
+    records main.py cleans and cluster.py reports on, the pairs and the
+    cluster report. `copies` > 1 stacks the tables with fresh integer ids.
+    """
+    records = preprocessing.load_records(input_file)
+    cleaned = _quiet(preprocessing.load_and_clean_data, input_file)
+    pairs = storage.read_table(results_file)
+    report = _quiet(cluster.build_cluster_report, records, pairs, config.CLUSTERING_THRESHOLD)
+    for num_copies in copies:
+        print(f"\n### Intermediate files: {input_file} x{num_copies} ###")
+        print(f"{'table':<16} {'rows':>9} {'format':<8} {'MB':>7} {'load s':>8} {'speedup':>8}")
+        n = len(records)
+        tables = {
+            "records": (records, "rec_id"),
+            "cleaned records": (cleaned, "rec_id"),
+            "pairs": (pairs.astype({"score": np.float32}), None),
+            "cluster report": (report, "record_id"),
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            for name, (table, index_label) in tables.items():
+                if num_copies > 1:
+                    table = pd.concat([table] * num_copies)
+                    if index_label is not None:
+                        table.index = pd.RangeIndex(len(table), name=table.index.name)
+                    else:
+                        # Pairs: shift the ids of each copy
+                        offsets = np.repeat(np.arange(num_copies) * n, len(pairs))
+                        table = table.assign(level_0=table["level_0"] + offsets, level_1=table["level_1"] + offsets)
+                csv_time = None
+                for fmt in ("csv", "parquet", "feather"):
+                    path = os.path.join(directory, name.replace(" ", "_"))
+                    if fmt == "csv" and name == "cleaned records":
+                        # Without a cache, the cleaned records are the raw CSV, re-cleaned
+                        source = os.path.join(directory, "input.csv")
+                        records_copy = pd.concat([records] * num_copies) if num_copies > 1 else records
+                        records_copy.to_csv(source, index=False)
+                        path = source
+                        load = lambda: _quiet(preprocessing.load_and_clean_data, source)
+                    else:
+                        path = storage.write_table(table, path, index_label=index_label, fmt=fmt)
+                        load = lambda: storage.read_table(path, index_col=index_label, fmt=fmt)
+                    elapsed = _best_time(load)
+                    csv_time = csv_time or elapsed
+                    print(f"{name:<16} {len(table):>9} {fmt:<8} {os.path.getsize(path) / 2**20:>7.2f} "
+                          f"{elapsed:>8.3f} {csv_time / elapsed:>7.1f}x")
+
+def disjoint_copies(records, copies):
+    """
+    Raw `records` stacked `copies` times, each copy with its own names,
+    addresses, postcodes and ids: the blocks and neighbourhoods keep their
+    size, so the number of candidate pairs grows linearly with the input.
+    """
+    tags = [a + b for a in "abcdefghijklmnopqrstuvwxyz" for b in "abcdefghijklmnopqrstuvwxyz"][:copies]
+    parts = []
+    for copy, tag in enumerate(tags):
+        part = records.reset_index(drop=True)
+        for col in ("given_name", "surname", "address_1"):
+            part[col] = tag + part[col].astype("string")
+        for col in ("postcode", "soc_sec_id"):
+            part[col] = part[col] + copy * 10 ** 7
+        parts.append(part)
+    return pd.concat(parts, ignore_index=True)
+
+# Runs one mode of main.py on another input, in a fresh process so that its
+# peak RSS is its own; prints the seconds and the peak RSS in MB
+_PIPELINE_RUN = """
+import contextlib, io, sys, time
+import config, main
+from pipeline import partitioned
+directory, mode = sys.argv[1], sys.argv[2]
+config.INPUT_FILE = f"{directory}/records.csv"
+config.RESULTS_FILE = f"{directory}/{mode}_pairs.csv"
+config.RECORDS_FILE = f"{directory}/records_cache.parquet"
+config.CLEANED_RECORDS_FILE = f"{directory}/cleaned_records_cache.parquet"
+config.COMPARISON_CACHE_FILE = f"{directory}/{mode}_comparison_cache.pkl"
+config.PARTITION_DIR = f"{directory}/partitions"
+config.INGEST_CHUNK_SIZE = int(sys.argv[3])
+start = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    main.run_partitioned() if mode == "partitioned" else main.run_pipeline()
+print(time.perf_counter() - start, partitioned.peak_rss_mb())
+"""
+
+def bench_partitioned(records, copies=(10, 40), chunk_size=50_000):
+    """
+    main.py in memory vs. --partitioned (chunks of `chunk_size` records),
+    each in its own process: time and peak RSS on disjoint copies of the
+    input, and whether the duplicate pairs are identical.
+    """
+    for num_copies in copies:
+        with tempfile.TemporaryDirectory() as directory:
+            disjoint_copies(records, num_copies).to_csv(os.path.join(directory, "records.csv"), index=False)
+            print(f"\n### Out-of-core pipeline: {len(records) * num_copies} records ###")
+            found = {}
+            for mode in ("in-memory", "partitioned"):
+                output = subprocess.run([sys.executable, "-c", _PIPELINE_RUN, directory, mode, str(chunk_size)],
+                                        capture_output=True, text=True, check=True).stdout
+                elapsed, peak = map(float, output.split())
+                found[mode] = storage.read_table(os.path.join(directory, f"{mode}_pairs.csv"))
+                print(f"{mode:<12} {elapsed:8.2f}s  peak RSS {peak:8.0f} MB  ({len(found[mode])} duplicate pairs)")
+            pd.testing.assert_frame_equal(found["partitioned"], found["in-memory"], check_exact=True)
+            print("Duplicate pairs identical: yes")
+
+def bench_comparison(df, candidate_pairs, name):
+    """recordlinkage.Compare vs. the batched comparison engine."""
+    print(f"\n### Comparison: {name} ({len(candidate_pairs)} pairs) ###")
+
+    start = time.perf_counter()
+    baseline = comparison.compare_pairs_recordlinkage(candidate_pairs, df, config.COMPARISON_FIELDS)
+    baseline_time = time.perf_counter() - start
+    print(f"recordlinkage.Compare: {baseline_time:8.2f}s  ({len(candidate_pairs) / baseline_time:10.0f} pairs/s)")
+
+    start = time.perf_counter()
+    features = comparison.compare_pairs(candidate_pairs, df, config.COMPARISON_FIELDS)
+    fast_time = time.perf_counter() - start
+    print(f"Batched engine:        {fast_time:8.2f}s  ({len(candidate_pairs) / fast_time:10.0f} pairs/s, "
+          f"{baseline_time / fast_time:.1f}x)")
+
+    pd.testing.assert_frame_equal(features, baseline, check_exact=True)
+    print("Features identical: yes")
+
+def bench_parallel(df, candidate_pairs, name, chunk_size=config.COMPARISON_CHUNK_SIZE):
+    """Chunked comparison + classification throughput vs. number of processes."""
+    print(f"\n### Chunked compare + classify: {name} ({len(candidate_pairs)} pairs, "
+          f"{os.cpu_count()} cores) ###")
+    features = comparison.compare_pairs(candidate_pairs, df, config.COMPARISON_FIELDS)
+    expected = classification.find_duplicates(features, config.CLASSIFICATION_THRESHOLD, verbose=False)
+    del features
+
+    baseline_time = None
+    for n_jobs in sorted({1, 2, 4, os.cpu_count() or 1}):
+        start = time.perf_counter()
+        found = parallel.find_duplicates_chunked(candidate_pairs, df, config.COMPARISON_FIELDS,
+                                                 config.CLASSIFICATION_THRESHOLD,
+                                                 n_jobs=n_jobs, chunk_size=chunk_size)
+        elapsed = time.perf_counter() - start
+        baseline_time = baseline_time or elapsed
+        pd.testing.assert_series_equal(found, expected, check_exact=True)
+        print(f"{n_jobs:>2} processes: {elapsed:8.2f}s  ({len(candidate_pairs) / elapsed:10.0f} pairs/s, "
+              f"{baseline_time / elapsed:.2f}x, {len(found)} duplicates, identical)")
+
+def bench_cascade(df, candidate_pairs, name):
+    """compare_pairs + find_duplicates vs. the cascaded comparison (heaviest fields first)."""
+    print(f"\n### Cascaded comparison: {name} ({len(candidate_pairs)} pairs) ###")
+    start = time.perf_counter()
+    features = comparison.compare_pairs(candidate_pairs, df, config.COMPARISON_FIELDS)
+    expected = classification.find_duplicates(features, config.CLASSIFICATION_THRESHOLD, verbose=False)
+    baseline_time = time.perf_counter() - start
+    del features
+    print(f"Compare + classify: {baseline_time:8.2f}s  ({len(candidate_pairs) / baseline_time:10.0f} pairs/s)")
+
+    stats = {}
+    start = time.perf_counter()
+    found = cascade.find_duplicates_cascaded(candidate_pairs, df, config.COMPARISON_FIELDS,
+                                             config.CLASSIFICATION_THRESHOLD, stats=stats)
+    elapsed = time.perf_counter() - start
+    compared = sum(c for c, _ in stats.values())
+    total = sum(n for _, n in stats.values())
+    print(f"Cascaded:           {elapsed:8.2f}s  ({len(candidate_pairs) / elapsed:10.0f} pairs/s, "
+          f"{baseline_time / elapsed:.1f}x, {1 - compared / total:.1%} of field comparisons skipped)")
+    pd.testing.assert_series_equal(found, expected, check_exact=True)
+    print(f"Duplicates identical: yes ({len(found)})")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--synthetic-pairs", type=int, default=1_000_000)
+    parser.add_argument("--synthetic-rows", type=int, default=10_000_000)
+    parser.add_argument("--synthetic-records", type=int, default=1_000_000)
+    parser.add_argument("--preprocessing-rows", default="5000,1000000,10000000",
+                        help="comma-separated record counts for the preprocessing benchmark")
+    parser.add_argument("--partitioned-copies", default="10,40",
+                        help="comma-separated input copies for the out-of-core benchmark")
+    args = parser.parse_args()
+
+    df = preprocessing.load_and_clean_data(config.INPUT_FILE)
+    if df is None:
+        return
+    bench_preprocessing(preprocessing.load_records(config.INPUT_FILE),
+                        [int(n) for n in args.preprocessing_rows.split(",")])
+    bench_indexing(df, config.INPUT_FILE)
+    if os.path.exists(storage.table_path(config.RESULTS_FILE)):
+        bench_minhash(df, config.RESULTS_FILE)
+        bench_phonetic(df, config.RESULTS_FILE)
+        bench_tfidf(df, config.RESULTS_FILE)
+        bench_storage(config.INPUT_FILE, config.RESULTS_FILE)
+    bench_indexing(replicated(df, 4), f"{config.INPUT_FILE} x4")
+    candidate_pairs = indexing.create_candidate_pairs(df, None)
+
+    bench_comparison(df, candidate_pairs, config.INPUT_FILE)
+    synthetic = synthetic_pairs(df, args.synthetic_pairs)
+    bench_comparison(df, synthetic, "synthetic")
+    bench_parallel(df, synthetic, "synthetic")
+    bench_cascade(df, candidate_pairs, config.INPUT_FILE)
+    bench_cascade(df, synthetic, "synthetic")
+    bench_classification(comparison.compare_pairs(candidate_pairs, df, config.COMPARISON_FIELDS),
+                         args.synthetic_rows)
+    bench_clustering(args.synthetic_records)
+    bench_partitioned(preprocessing.load_records(config.INPUT_FILE),
+                      [int(n) for n in args.partitioned_copies.split(",")])
+
+if __name__ == "__main__":
+    main()
@@ -1,116 +1,125 @@
-# --- File: cluster_results.py ---
+# --- File: cluster.py ---
 
+import numpy as np
 import pandas as pd
-import networkx as nx
 import config
+from pipeline import preprocessing, storage
+from pipeline.clustering import connected_components
 
-def generate_cluster_report():
+def assign_clusters(record_ids, left_ids, right_ids):
     """
-    Loads all records and the found pairs, filters pairs by a
-    "strength" threshold, and then groups all records into
-    clusters, sorting the final report by group size.
+    Numeric cluster id (1, 2, ...) of each record in `record_ids`, with the
+    records linked by (left_ids[i], right_ids[i]) in one cluster. Clusters
+    are numbered in order of their first record, as
+    networkx.connected_components yields them.
     """
-    
-    # --- 1. Load the original data ---
-    try:
-        df_data = pd.read_csv(config.INPUT_FILE)
-    except FileNotFoundError:
-        print(f"Error: Original data file '{config.INPUT_FILE}' not found.")
-        return
+    record_ids = pd.Index(record_ids)
+    # Integer-encode the ids; linked ids without a record become extra
+    # nodes after the records (they can still join two records)
+    nodes, _ = pd.factorize(np.concatenate([record_ids.to_numpy(), np.asarray(left_ids), np.asarray(right_ids)]))
+    num_records, num_links = len(record_ids), len(left_ids)
+    left = nodes[num_records:num_records + num_links]
+    right = nodes[num_records + num_links:]
+    labels = connected_components(nodes.max() + 1 if len(nodes) else 0, left, right)
+    return pd.factorize(labels[nodes[:num_records]])[0] + 1
 
-    # Set the correct index for joining
-    if 'rec_id' in df_data.columns:
-        df_data = df_data.set_index('rec_id')
-    elif 'Unnamed: 0' in df_data.columns:
-        df_data = df_data.set_index('Unnamed: 0')
-        df_data.index.name = 'rec_id'
-    else:
-        df_data = df_data.reset_index().rename(columns={"index": "rec_id"})
-        df_data = df_data.set_index('rec_id')
-        
-    all_record_ids = df_data.index.tolist()
-    original_index_name = df_data.index.name # Store for sorting
+def assign_clusters_networkx(record_ids, left_ids, right_ids):
+    """Reference implementation of assign_clusters with a networkx graph."""
+    import networkx as nx
 
-    # --- 2. Load the found duplicate pairs (with scores) ---
-    try:
-        df_pairs = pd.read_csv(config.RESULTS_FILE)
-    except FileNotFoundError:
-        print(f"Error: Results file '{config.RESULTS_FILE}' not found.")
-        print("Please run 'main.py' first.")
-        return
-    except Exception as e:
-        print(f"Error reading {config.RESULTS_FILE}: {e}")
-        return
+    G = nx.Graph()
+    G.add_nodes_from(record_ids)
+    G.add_edges_from(zip(left_ids, right_ids))
+    id_to_cluster_map = {}
+    for i, cluster_ids in enumerate(nx.connected_components(G)):
+        for record_id in cluster_ids:
+            id_to_cluster_map[record_id] = i + 1
+    return pd.Series(record_ids).map(id_to_cluster_map).to_numpy()
 
-    # --- 3. Filter for "Strong" Links ---
-    clustering_threshold = getattr(config, 'CLUSTERING_THRESHOLD', config.CLASSIFICATION_THRESHOLD)
-    
+def build_cluster_report(df_data, df_pairs, clustering_threshold):
+    """
+    Groups all records of `df_data` into clusters linked by the pairs of
+    `df_pairs` scoring at least `clustering_threshold`, sorted by group size.
+    """
+    original_index_name = df_data.index.name # Store for sorting
+
+    # --- 1. Filter for "Strong" Links ---
     strong_links_df = df_pairs[df_pairs['score'] >= clustering_threshold]
     print(f"Total pairs found: {len(df_pairs)}")
     print(f"Using cluster threshold: {clustering_threshold}")
     print(f"Filtered down to {len(strong_links_df)} strong links for clustering.")
 
-    # --- 4. Build the graph and find ALL clusters ---
-    print("Building graph...")
-    G = nx.Graph()
-    G.add_nodes_from(all_record_ids) # Add all 5,000 nodes
-    
-    # Add edges *only* from the strong pairs
-    G.add_edges_from(strong_links_df[['level_0', 'level_1']].values)
-    
-    clusters = list(nx.connected_components(G))
-    print(f"Found {len(clusters)} total groups (including unique records).")
-
-    # --- 5. Create a mapping from record_id to a numeric cluster_id ---
+    # --- 2. Find ALL clusters (connected components over integer-encoded record ids) ---
     # We use a numeric ID first for correct sorting
-    id_to_cluster_map = {}
-    for i, cluster_ids in enumerate(clusters):
-        cluster_id = i + 1  # Create a simple numeric ID
-        for record_id in cluster_ids:
-            id_to_cluster_map[record_id] = cluster_id
-            
-    cluster_series = pd.Series(id_to_cluster_map, name="cluster_id")
-    
-    # --- 6. Join the group label to the original data ---
-    df_report = df_data.join(cluster_series)
-    
-    # --- 7. Calculate and add group size ---
-    group_sizes = df_report['cluster_id'].map(df_report['cluster_id'].value_counts())
-    df_report['group_size'] = group_sizes
-    
-    # --- 8. Sort by group size (desc) and numeric ID (asc) ---
+    cluster_ids = assign_clusters(df_data.index, strong_links_df['level_0'].to_numpy(),
+                                  strong_links_df['level_1'].to_numpy())
+    print(f"Found {len(np.unique(cluster_ids))} total groups (including unique records).")
+
+    # --- 3. Add the group label and group size to the original data ---
+    df_report = df_data.copy()
+    df_report['cluster_id'] = cluster_ids
+    df_report['group_size'] = np.bincount(cluster_ids)[cluster_ids]
+
+    # --- 4. Sort by group size (desc) and numeric ID (asc) ---
     df_report = df_report.sort_values(
         by=['group_size', 'cluster_id', original_index_name],
         ascending=[False, True, True]
     )
-    
-    # --- 9. Create the final "Person" label (after sorting) ---
-    # Create a map from the numeric cluster_id to the "Person X" label
-    # This ensures "Person 1" is the largest group, "Person 2" is the next, etc.
-    cluster_id_to_person_label = {
-        cid: f"Person {i+1}" 
-        for i, cid in enumerate(df_report['cluster_id'].unique())
-    }
-    
-    df_report['person_group'] = df_report['cluster_id'].map(cluster_id_to_person_label)
-    
-    # --- 10. Finalize and Save ---
-    # Re-order columns to put 'person_group' and 'group_size' first
+
+    # --- 5. Create the final "Person" label (after sorting) ---
+    # Numbered in sorted order, so "Person 1" is the largest group, "Person 2" the next, etc.
+    person_numbers = pd.factorize(df_report['cluster_id'])[0] + 1
+    df_report['person_group'] = "Person " + pd.Series(person_numbers, index=df_report.index).astype(str)
+
+    # --- 6. Re-order columns to put 'person_group' and 'group_size' first ---
     cols = df_report.columns.tolist()
     cols.remove('person_group')
     cols.remove('group_size')
     cols.remove('cluster_id') # Remove the temporary numeric ID
     final_cols = ['person_group', 'group_size'] + cols
-    df_report = df_report[final_cols]
-    
-    OUTPUT_FILE = "full_cluster_report_sorted.csv"
+    return df_report[final_cols]
+
+def generate_cluster_report():
+    """
+    Loads all records and the found pairs, filters pairs by a
+    "strength" threshold, and then groups all records into
+    clusters, sorting the final report by group size.
+    """
+
+    # --- 1. Load the original data (parsed once, then cached) ---
+    df_data = preprocessing.load_raw_records(config.INPUT_FILE)
+    if df_data is None:
+        return
+
+    # --- 2. Load the found duplicate pairs (with scores) ---
+    results_file = storage.table_path(config.RESULTS_FILE)
+    try:
+        df_pairs = storage.read_table(config.RESULTS_FILE)
+    except FileNotFoundError:
+        print(f"Error: Results file '{results_file}' not found.")
+        print("Please run 'main.py' first.")
+        return
+    except Exception as e:
+        print(f"Error reading {results_file}: {e}")
+        return
+
+    clustering_threshold = getattr(config, 'CLUSTERING_THRESHOLD', config.CLASSIFICATION_THRESHOLD)
+    df_report = build_cluster_report(df_data, df_pairs, clustering_threshold)
+
+    save_cluster_report(df_report)
+
+def save_cluster_report(df_report):
+    """Saves the report to config.CLUSTER_REPORT_FILE in the intermediate format."""
     try:
-        df_report.to_csv(OUTPUT_FILE, index_label="record_id")
-        print(f"Successfully saved full report to '{OUTPUT_FILE}'.")
+        if config.EXPORT_CSV or storage.table_format() == "csv":
+            df_report.to_csv(config.CLUSTER_REPORT_FILE, index_label="record_id")
+        if storage.table_format() != "csv":
+            storage.write_table(df_report, config.CLUSTER_REPORT_FILE, index_label="record_id")
+        print(f"Successfully saved full report to '{storage.table_path(config.CLUSTER_REPORT_FILE)}'.")
     except Exception as e:
         print(f"Error saving file: {e}")
 
 if __name__ == "__main__":
     print("--- Starting Full Cluster Report Generation ---")
     generate_cluster_report()
-    print("--- Report Generation Finished ---")
\ No newline at end of file
+    print("--- Report Generation Finished ---")
@@ -1,15 +1,16 @@
-# --- File: analyze_cluster_quality.py ---
+# --- File: cluster_analysis.py ---
 
 import pandas as pd
 import numpy as np
 import config
+from pipeline import storage
 
-# --- Input Files ---
-CLUSTER_REPORT_FILE = "full_cluster_report_sorted.csv"
-PAIRS_FILE = "found_duplicate_pairs.csv"
+# --- Input Files (in config.INTERMEDIATE_FORMAT) ---
+CLUSTER_REPORT_FILE = storage.table_path(config.CLUSTER_REPORT_FILE)
+PAIRS_FILE = storage.table_path(config.RESULTS_FILE)
 
 # --- Output File ---
-ANALYSIS_FILE = "cluster_quality_analysis.csv"
+ANALYSIS_FILE = config.QUALITY_ANALYSIS_FILE
 
 def run_quality_analysis():
     """
@@ -21,20 +22,43 @@ def run_quality_analysis():
     
     # --- 1. Load Cluster Report ---
     try:
-        df_report = pd.read_csv(CLUSTER_REPORT_FILE, index_col='record_id')
+        df_report = storage.read_table(CLUSTER_REPORT_FILE, index_col='record_id')
     except FileNotFoundError:
         print(f"Error: Report file '{CLUSTER_REPORT_FILE}' not found.")
-        print("Please run 'cluster_results.py' first.")
+        print("Please run 'cluster.py' first.")
         return
     
     # --- 2. Load Pairs with Scores ---
     try:
-        df_pairs = pd.read_csv(PAIRS_FILE)
+        df_pairs = storage.read_table(PAIRS_FILE)
     except FileNotFoundError:
         print(f"Error: Pairs file '{PAIRS_FILE}' not found.")
         print("Please run 'main.py' first.")
         return
 
+    df_analysis = analyze_cluster_quality(df_report, df_pairs)
+    if df_analysis is not None:
+        save_quality_analysis(df_analysis)
+
+def save_quality_analysis(df_analysis):
+    """Saves the analysis to ANALYSIS_FILE and prints the weakest clusters."""
+    # Save to CSV
+    try:
+        df_analysis.to_csv(ANALYSIS_FILE, index=False)
+        print(f"\nSuccessfully saved detailed analysis to '{ANALYSIS_FILE}'.")
+    except Exception as e:
+        print(f"Error saving analysis file: {e}")
+        
+    # Print a sample to console
+    print("\n### Sample: 10 'Weakest' Clusters (by Avg. Score) ###")
+    print(df_analysis.head(10).to_string(index=False))
+
+def analyze_cluster_quality(df_report, df_pairs):
+    """
+    Group-wise link score statistics and link density of the duplicate
+    groups of a cluster report, weakest groups first. None if there are
+    no duplicate groups or internal links.
+    """
     # --- 3. Focus on Duplicate Groups ---
     df_dupes = df_report[df_report['group_size'] > 1]
     if df_dupes.empty:
@@ -46,6 +70,7 @@ def run_quality_analysis():
     id_to_group_map = df_dupes['person_group'].to_dict()
     
     # Map group names to both sides of the pairs
+    df_pairs = df_pairs.copy()
     df_pairs['group_left'] = df_pairs['level_0'].map(id_to_group_map)
     df_pairs['group_right'] = df_pairs['level_1'].map(id_to_group_map)
     
@@ -100,16 +125,7 @@ def run_quality_analysis():
     print(f"Overall avg. similarity: {df_analysis['avg_score'].mean():.2f}")
     print(f"Overall avg. link density: {df_analysis['link_density'].mean():.2f}")
 
-    # Save to CSV
-    try:
-        df_analysis.to_csv(ANALYSIS_FILE, index=False)
-        print(f"\nSuccessfully saved detailed analysis to '{ANALYSIS_FILE}'.")
-    except Exception as e:
-        print(f"Error saving analysis file: {e}")
-        
-    # Print a sample to console
-    print("\n### Sample: 10 'Weakest' Clusters (by Avg. Score) ###")
-    print(df_analysis.head(10).to_string(index=False))
+    return df_analysis
 
 if __name__ == "__main__":
     run_quality_analysis()
\ No newline at end of file
@@ -3,12 +3,76 @@
 # File configuration
 INPUT_FILE = "dedup_data.csv"
 RESULTS_FILE = "found_duplicate_pairs.csv"
+CLUSTER_REPORT_FILE = "full_cluster_report_sorted.csv"
+QUALITY_ANALYSIS_FILE = "cluster_quality_analysis.csv"
+
+# --- Intermediate Files ---
+# Format of the tables the stages hand over (results, cluster report, cached
+# records): "parquet" or "feather" (typed columns, need pyarrow) or "csv".
+# The extension of the file names is replaced accordingly; results keep
+# integer record ids and float32 scores.
+INTERMEDIATE_FORMAT = "parquet"
+EXPORT_CSV = False  # Also write RESULTS_FILE and CLUSTER_REPORT_FILE as CSV
+# Parsed and cleaned INPUT_FILE, reused until INPUT_FILE, the preprocessing
+# settings or code change (content hash in <file>.key)
+RECORDS_FILE = "records_cache.parquet"
+CLEANED_RECORDS_FILE = "cleaned_records_cache.parquet"
+# run.py: stage results, keyed by a hash of their inputs, config and code
+STAGE_CACHE_DIR = "stage_cache"  # None = no caching
 
 # --- Indexing Configuration ---
 SORTING_WINDOW_SIZE = 15
 POSTCODE_SORTING_WINDOW_SIZE = 5
 ADDRESS_SORTING_WINDOW_SIZE = 5  # <-- NEW (for our 5th pass)
 
+# Blocking passes, OR-ed together. Methods:
+#   block               records with equal `field`
+#   sortedneighbourhood records within `window_size` (odd) in sorted `field` order
+#   qgram               records sharing any q-gram of `field` (`q`, default 3)
+#   phonetic            records with equal phonetic code of `field`
+#                       (`encoding`: soundex, nysiis, metaphone, match_rating_codex)
+#   minhash             MinHash/LSH on the character q-grams of several `fields`
+#                       (`q`, default 2); `bands` x `rows` signature values
+#                       (default 30 x 5). More bands = more recall and pairs,
+#                       more rows = fewer, closer pairs.
+#   tfidf               each record with its `k` (default 10) most cosine-similar
+#                       records, at least `min_similarity` (default 0.5), over
+#                       TF-IDF vectors of the character q-grams (`q`, default 3)
+#                       of several `fields`; needs scikit-learn. Similarities
+#                       are computed in chunks of about `max_entries` (default
+#                       20M, ~14 bytes each); `max_df` < 1 drops q-grams in more
+#                       than that fraction of records (faster, approximate).
+# block, qgram, phonetic and minhash take an optional `max_block_size`: blocks
+# with more records are skipped (e.g. very common q-grams).
+BLOCKING_PASSES = [
+    {"method": "block", "field": "surname_trunc"},
+    {"method": "block", "field": "given_name_trunc"},
+    {"method": "sortedneighbourhood", "field": "soc_sec_id", "window_size": SORTING_WINDOW_SIZE},
+    {"method": "sortedneighbourhood", "field": "postcode", "window_size": POSTCODE_SORTING_WINDOW_SIZE},
+    {"method": "sortedneighbourhood", "field": "address_1", "window_size": ADDRESS_SORTING_WINDOW_SIZE},
+    # Phonetic name passes (PHONETIC_KEYS): catch e.g. catherine/katherine, but
+    # on dedup_data.csv every duplicate they add is already found by soc_sec_id
+    # {"method": "phonetic", "field": "surname", "encoding": "nysiis"},
+    # {"method": "phonetic", "field": "given_name", "encoding": "nysiis"},
+    # {"method": "qgram", "field": "soc_sec_id", "q": 4, "max_block_size": 50},
+    # {"method": "minhash", "fields": ["given_name", "surname", "address_1", "suburb",
+    #                                  "postcode", "date_of_birth", "soc_sec_id"],
+    #  "bands": 30, "rows": 5},
+    # Typo-tolerant alternative to the address_1 neighbourhood (recall 0.95 vs 0.83):
+    # {"method": "tfidf", "fields": ["given_name", "surname", "address_1"], "k": 10, "min_similarity": 0.3},
+]
+# Phonetic codes computed by preprocessing, as <field>_<encoding> columns,
+# once per distinct name: by default those of the phonetic passes above
+# (none while they are commented out). Phonetic passes on other fields or
+# encodings encode at indexing time. Codes are cached per value in
+# PHONETIC_CACHE_FILE (None = not saved).
+_PHONETIC_PASSES = [p for p in BLOCKING_PASSES if p["method"] == "phonetic"]
+PHONETIC_KEYS = {field: [p.get("encoding", "soundex") for p in _PHONETIC_PASSES if p["field"] == field]
+                 for field in dict.fromkeys(p["field"] for p in _PHONETIC_PASSES)}
+PHONETIC_CACHE_FILE = "phonetic_cache.pkl"
+# Candidate pairs are generated and compared in batches of this many pairs
+CANDIDATE_BATCH_SIZE = 100_000
+
 # Comparison fields and methods
 # (TUNED) Weights re-balanced. Total score is 16.0
 COMPARISON_FIELDS = [
@@ -39,6 +103,32 @@ COMPARISON_FIELDS = [
     {"field": "address_2", "method": "string", "string_method": "damerau_levenshtein", "threshold": 0.80, "label": "address_2", "weight": 0.25},
 ]
 CLASSIFICATION_THRESHOLD = 7.5
+# Compare fields heaviest first and stop comparing a pair once it cannot
+# reach the threshold even if every remaining field matched (same results)
+CASCADED_COMPARISON = True
+
+# --- Comparison Cache ---
+# Raw string similarities per unique value pair, reused across runs
+COMPARISON_CACHE_FILE = "comparison_cache.pkl"  # None = in-memory only
+COMPARISON_CACHE_MAX_ENTRIES = 500_000  # Per field; least recently used evicted
+
+# --- Parallel Comparison ---
+# 1 = compare and classify in this process; otherwise a process pool
+# (-1 = all cores) works through chunks of COMPARISON_CHUNK_SIZE pairs
+N_JOBS = 1
+COMPARISON_CHUNK_SIZE = 50_000
+
+# --- Incremental Deduplication (python main.py --incremental BATCH.csv) ---
+# Resolved records, blocking keys and cluster ids of every batch so far
+RESOLVED_INDEX_DB = "resolved_index.db"
+INCREMENTAL_RESULTS_FILE = "incremental_duplicate_pairs.csv"  # Appended per batch
 
 # Clustering configuration
-CLUSTERING_THRESHOLD = 10
\ No newline at end of file
+CLUSTERING_THRESHOLD = 10
+
+# --- Out-of-core Deduplication (python main.py --partitioned) ---
+# The input is cleaned INGEST_CHUNK_SIZE rows at a time and every blocking
+# pass is split into NUM_PARTITIONS partitions on disk, compared one by one
+INGEST_CHUNK_SIZE = 100_000
+NUM_PARTITIONS = 16
+PARTITION_DIR = "partitions"  # Replaced on every run
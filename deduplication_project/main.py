@@ -1,9 +1,36 @@
 # --- File: main.py ---
 
+import argparse
+import os
 import time
+import numpy as np
 import pandas as pd
 import config
-from pipeline import preprocessing, indexing, comparison, classification
+from pipeline import preprocessing, indexing, comparison, classification, cascade, parallel, partitioned, storage
+from pipeline.comparison_cache import ComparisonCache
+from pipeline.incremental import ResolvedIndex
+
+def save_results(duplicate_pairs_with_scores):
+    """
+    Writes the pairs (level_0, level_1, score) to config.RESULTS_FILE in the
+    intermediate format; scores are stored as float32 in Parquet/Feather.
+    """
+    results_file = storage.table_path(config.RESULTS_FILE)
+    print(f"Saving results (with scores) to {results_file}...")
+    try:
+        # Convert the Series (MultiIndex + score) to a DataFrame
+        df_to_save = duplicate_pairs_with_scores.reset_index()
+        
+        # Name the columns correctly so evaluation.py can find them
+        df_to_save.columns = ['level_0', 'level_1', 'score']
+
+        # Save *without* the new default index; the CSV keeps full precision
+        if config.EXPORT_CSV or storage.table_format() == "csv":
+            df_to_save.to_csv(config.RESULTS_FILE, index=False)
+        if storage.table_format() != "csv":
+            storage.write_table(df_to_save.astype({'score': np.float32}), config.RESULTS_FILE)
+    except Exception as e:
+        print(f"Error saving results: {e}")
 
 def run_pipeline():
     """
@@ -12,43 +39,188 @@ def run_pipeline():
     start_time = time.time()
 
     # --- 1. Preprocessing ---
-    df = preprocessing.load_and_clean_data(config.INPUT_FILE)
+    df = preprocessing.load_cleaned_records(config.INPUT_FILE)
     if df is None:
         print(f"Error: Could not load {config.INPUT_FILE}. Exiting.")
         return
 
-    # --- 2. Indexing ---
-    candidate_pairs = indexing.create_candidate_pairs(df, None)
+    if config.N_JOBS == 1:
+        # --- 2 + 3 + 4. Streamed Indexing, Comparison & Classification ---
+        # Candidate pairs are generated, compared and classified batch by
+        # batch, so neither the full pair index nor the features exist at once
+        cache = ComparisonCache.load(config.COMPARISON_CACHE_FILE, config.COMPARISON_CACHE_MAX_ENTRIES)
+        results = []
+        num_pairs = 0
+        cascade_stats = {}
+        for candidate_pairs in indexing.iter_candidate_batches(
+                df, config.CANDIDATE_BATCH_SIZE, config.BLOCKING_PASSES, stats=[]):
+            num_pairs += len(candidate_pairs)
+            # This is a Series with (pair) as index and (score) as value
+            if config.CASCADED_COMPARISON:
+                results.append(cascade.find_duplicates_cascaded(
+                    candidate_pairs, df, config.COMPARISON_FIELDS, config.CLASSIFICATION_THRESHOLD,
+                    cache, cascade_stats
+                ))
+                continue
+            features = comparison.compare_pairs(candidate_pairs, df, config.COMPARISON_FIELDS, cache)
+            results.append(classification.find_duplicates(
+                features, config.CLASSIFICATION_THRESHOLD, verbose=False
+            ))
+        print(f"Compared {num_pairs} candidate pairs.")
+        cascade.print_cascade_stats(cascade_stats)
+        cache.print_stats()
+        cache.save()
+        if results:
+            duplicate_pairs_with_scores = pd.concat(results).sort_index()
+        else:
+            duplicate_pairs_with_scores = pd.Series([], dtype=float, index=indexing.keys_to_multiindex(
+                np.empty(0, dtype=np.int64), df))
+    else:
+        # --- 2. Indexing ---
+        candidate_pairs = indexing.create_candidate_pairs(df, config.BLOCKING_PASSES)
 
-    # --- 3. Comparison ---
-    features = comparison.compare_pairs(candidate_pairs, df, config.COMPARISON_FIELDS)
-    
-    # --- 4. Classification ---
-    # This is a Series with (pair) as index and (score) as value
-    duplicate_pairs_with_scores = classification.find_duplicates(
-        features, config.CLASSIFICATION_THRESHOLD
-    )
+        # --- 3 + 4. Chunked Comparison & Classification (process pool) ---
+        # Workers do not share the comparison cache
+        duplicate_pairs_with_scores = parallel.find_duplicates_chunked(
+            candidate_pairs, df, config.COMPARISON_FIELDS, config.CLASSIFICATION_THRESHOLD,
+            n_jobs=config.N_JOBS, chunk_size=config.COMPARISON_CHUNK_SIZE
+        )
     print(f"** Found {len(duplicate_pairs_with_scores)} duplicate pairs. **")
 
     # --- 5. Save Results (with scores) ---
-    print(f"Saving results (with scores) to {config.RESULTS_FILE}...")
+    save_results(duplicate_pairs_with_scores)
+
+    end_time = time.time()
+    print(f"--- Pipeline finished in {end_time - start_time:.2f} seconds ---")
+
+def run_partitioned():
+    """
+    Executes the pipeline out of core: the input is read and cleaned in
+    chunks and each blocking pass is indexed, compared and classified one
+    partition at a time (see pipeline/partitioned.py), so memory is bounded
+    by the largest partition rather than by the input.
+    """
+    start_time = time.time()
+    cache = ComparisonCache.load(config.COMPARISON_CACHE_FILE, config.COMPARISON_CACHE_MAX_ENTRIES)
+    try:
+        duplicate_pairs_with_scores = partitioned.run_partitioned(
+            config.INPUT_FILE, config.PARTITION_DIR, config.BLOCKING_PASSES, config.COMPARISON_FIELDS,
+            config.CLASSIFICATION_THRESHOLD, config.INGEST_CHUNK_SIZE, config.NUM_PARTITIONS,
+            config.CANDIDATE_BATCH_SIZE, cache)
+    except FileNotFoundError:
+        print(f"Error: Could not load {config.INPUT_FILE}. Exiting.")
+        return
+    except (ValueError, ImportError) as e:
+        print(f"Error: {e}")
+        return
+    cache.print_stats()
+    cache.save()
+    print(f"** Found {len(duplicate_pairs_with_scores)} duplicate pairs. **")
+
+    save_results(duplicate_pairs_with_scores)
+    print(f"--- Pipeline finished in {time.time() - start_time:.2f} seconds "
+          f"(peak RSS {partitioned.peak_rss_mb():.0f} MB) ---")
+
+def run_incremental(batch_file):
+    """
+    Matches a batch of new records against the resolved index
+    (config.RESOLVED_INDEX_DB) and adds it. Only the batch is cleaned and
+    blocked; it is compared with the indexed records sharing a blocking key
+    (or a sorted neighbourhood) and with itself, so the cost grows with the
+    batch, not with the corpus. The first batch builds the index.
+    """
+    start_time = time.time()
+    timings = {}
+    index = ResolvedIndex(config.RESOLVED_INDEX_DB)
+    num_indexed = index.num_records()
+
+    # --- 1. Preprocessing (batch only) ---
+    step = time.time()
+    df_new = preprocessing.load_and_clean_data(batch_file, first_rec_id=index.next_rec_id())
+    if df_new is None:
+        print(f"Error: Could not load {batch_file}. Exiting.")
+        index.close()
+        return
+    try:
+        index.check_batch(df_new, config.BLOCKING_PASSES)
+    except ValueError as e:
+        print(f"Error: {e}")
+        index.close()
+        return
+    timings["preprocessing"] = time.time() - step
+
+    # --- 2. Indexing: batch vs. index, and batch vs. itself ---
+    step = time.time()
+    new_positions, old_positions = index.match(df_new, config.BLOCKING_PASSES)
+    matched = np.unique(old_positions)
+    df_old = index.fetch_records(matched)
+    # Local frame: the matched indexed records, then the batch
+    df = pd.concat([df_old, df_new]) if len(df_old) else df_new
+    offset = len(df_old)
+    keys = [indexing.pack_pairs(new_positions + offset, np.searchsorted(matched, old_positions))]
+    for batch_pairs in indexing.iter_candidate_batches(df_new, config.CANDIDATE_BATCH_SIZE, config.BLOCKING_PASSES):
+        keys.append(indexing.unpack_pairs_index(batch_pairs) + (offset << indexing.PAIR_SHIFT | offset))
+    candidate_pairs = indexing.keys_to_multiindex(np.unique(np.concatenate(keys)), df)
+    timings["indexing"] = time.time() - step
+    print(f"{len(candidate_pairs)} candidate pairs: {len(new_positions)} with {len(matched)} of the "
+          f"{num_indexed} indexed records, {len(candidate_pairs) - len(new_positions)} within the batch.")
+
+    # --- 3 + 4. Comparison & Classification ---
+    step = time.time()
+    cache = ComparisonCache.load(config.COMPARISON_CACHE_FILE, config.COMPARISON_CACHE_MAX_ENTRIES)
+    features = comparison.compare_pairs(candidate_pairs, df, config.COMPARISON_FIELDS, cache)
+    duplicate_pairs_with_scores = classification.find_duplicates(
+        features, config.CLASSIFICATION_THRESHOLD, verbose=False
+    ).sort_index()
+    cache.save()
+    timings["comparison"] = time.time() - step
+    print(f"** Found {len(duplicate_pairs_with_scores)} duplicate pairs. **")
+
+    # --- 5. Update the index: add the batch, merge its clusters ---
+    step = time.time()
+    first_new = index.add_records(df_new, config.BLOCKING_PASSES)
+    # Local positions -> index positions (not the MultiIndex codes: sort_index
+    # renumbers them when df.index is not monotonic)
+    index_positions = np.concatenate([matched, first_new + np.arange(len(df_new))])
+    strong = duplicate_pairs_with_scores[duplicate_pairs_with_scores >= config.CLUSTERING_THRESHOLD]
+    left = index_positions[df.index.get_indexer(strong.index.get_level_values(0))]
+    right = index_positions[df.index.get_indexer(strong.index.get_level_values(1))]
+    num_merges = index.merge_clusters(left, right)
+    num_split = index.split_links(left, right)
+    if num_split:
+        print(f"Error: {num_split} strong links would span several clusters; index left unchanged.")
+        index.close()
+        return
+    index.commit()
+    timings["index update"] = time.time() - step
+    print(f"Indexed {len(df_new)} new records ({index.num_records()} total); {len(strong)} strong links "
+          f"merged {num_merges} clusters ({index.num_clusters()} clusters total).")
+    index.close()
+
+    # --- 6. Append Results (with scores) ---
+    print(f"Appending results (with scores) to {config.INCREMENTAL_RESULTS_FILE}...")
     try:
-        # --- (MODIFIED) ---
-        # Convert the Series (MultiIndex + score) to a DataFrame
         df_to_save = duplicate_pairs_with_scores.reset_index()
-        
-        # Name the columns correctly so evaluation.py can find them
         df_to_save.columns = ['level_0', 'level_1', 'score']
-        
-        # Save to CSV, *without* the new default index
-        df_to_save.to_csv(config.RESULTS_FILE, index=False)
-        # --- (END MODIFIED) ---
-        
+        df_to_save.to_csv(config.INCREMENTAL_RESULTS_FILE, mode='a', index=False,
+                          header=not os.path.exists(config.INCREMENTAL_RESULTS_FILE))
     except Exception as e:
         print(f"Error saving results: {e}")
 
-    end_time = time.time()
-    print(f"--- Pipeline finished in {end_time - start_time:.2f} seconds ---")
+    print("Time per stage: " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items()))
+    print(f"--- Incremental run finished in {time.time() - start_time:.2f} seconds ---")
 
 if __name__ == "__main__":
-    run_pipeline()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Deduplication pipeline.")
+    parser.add_argument("--incremental", metavar="BATCH_FILE",
+                        help=f"match a batch of new records against {config.RESOLVED_INDEX_DB} and add it")
+    parser.add_argument("--partitioned", action="store_true",
+                        help=f"read the input in chunks and compare partitions from {config.PARTITION_DIR}/ "
+                             f"one at a time (out of core)")
+    args = parser.parse_args()
+    if args.incremental:
+        run_incremental(args.incremental)
+    elif args.partitioned:
+        run_partitioned()
+    else:
+        run_pipeline()
\ No newline at end of file
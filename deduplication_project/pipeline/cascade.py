@@ -0,0 +1,93 @@
+# --- File: pipeline/cascade.py ---
+
+import numpy as np
+import pandas as pd
+from pipeline import comparison, classification
+
+# Cascaded comparison: fields are compared in order of decreasing weight,
+# and after each field every pair gets an upper bound on its final score.
+# Pairs that cannot reach the threshold are dropped before the next field.
+#
+# The score is total_weight * M / A, where M is the weighted sum of the
+# available (non-missing, untrimmed) features and A their summed weight.
+# Features lie in [0, 1]. With M and A over the compared fields, W the
+# weight still to compare, and w_low the largest weight of a compared
+# feature low enough to be trimmed, no outcome of the remaining fields
+# scores more than
+#     total_weight * (M + W) / (A + W - w_low):
+# (M + x) / (A + x) grows with x as M <= A, and trimming one feature
+# removes at most w_low from A.
+
+# Bound slack: the classifier adds the same terms in another order
+BOUND_TOLERANCE = 1e-9
+
+def _field_order(comparison_fields):
+    """Positions of the comparisons, heaviest first (ties in config order)."""
+    weights = [comp.get("weight", 1.0) for comp in comparison_fields]
+    return sorted(range(len(comparison_fields)), key=lambda j: -weights[j])
+
+def find_duplicates_cascaded(candidate_pairs, df, comparison_fields, threshold, cache=None, stats=None):
+    """
+    compare_pairs + find_duplicates, skipping the remaining comparisons of
+    pairs that can no longer reach `threshold`. The duplicates and their
+    scores are identical to the uncascaded result. If `stats` is a dict,
+    the pairs compared per label are added to stats[label] = [compared,
+    candidates].
+    """
+    left_pos = df.index.get_indexer(candidate_pairs.get_level_values(0))
+    right_pos = df.index.get_indexer(candidate_pairs.get_level_values(1))
+    num_pairs = len(candidate_pairs)
+
+    weights = {j: comp.get("weight", 1.0) for j, comp in enumerate(comparison_fields)}
+    total_weight = sum(weights.values())
+    remaining = total_weight
+    matched = np.zeros(num_pairs)
+    available = np.zeros(num_pairs)
+    low_weight = np.zeros(num_pairs)
+    alive = np.arange(num_pairs)
+    features = {}
+
+    for j in _field_order(comparison_fields):
+        comp = comparison_fields[j]
+        pairs = candidate_pairs if len(alive) == num_pairs else candidate_pairs[alive]
+        feature = comparison.compare_field(comp, pairs, df, left_pos[alive], right_pos[alive], cache)
+        if stats is not None:
+            counts = stats.setdefault(comp["label"], [0, 0])
+            counts[0] += len(alive) if feature is not None else 0
+            counts[1] += num_pairs if feature is not None else 0
+        remaining -= weights[j]
+        if feature is None:
+            continue
+        column = np.full(num_pairs, np.nan)
+        column[alive] = feature
+        features[j] = column
+
+        present = ~np.isnan(feature)
+        matched[alive] += np.where(present, feature * weights[j], 0.0)
+        available[alive] += np.where(present, weights[j], 0.0)
+        low = present & (feature < classification.TRIM_MIN_THRESHOLD)
+        low_weight[alive] = np.where(low, np.maximum(low_weight[alive], weights[j]), low_weight[alive])
+
+        denominator = available[alive] + remaining - low_weight[alive]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            bound = np.where(denominator > 0,
+                             total_weight * (matched[alive] + remaining) / denominator, np.inf)
+        alive = alive[bound >= threshold - BOUND_TOLERANCE]
+
+    survivors = pd.DataFrame({comparison_fields[j]["label"]: features[j][alive]
+                              for j in range(len(comparison_fields)) if j in features},
+                             index=candidate_pairs if len(alive) == num_pairs else candidate_pairs[alive])
+    return classification.find_duplicates(survivors, threshold, verbose=False)
+
+def print_cascade_stats(stats):
+    """Pairs compared per field and the share of field comparisons skipped."""
+    if not stats:
+        return
+    print("Cascaded comparison (heaviest fields first):")
+    for label, (compared, candidates) in stats.items():
+        print(f"  {label:<16} {compared:>10}/{candidates:<10} compared")
+    compared = sum(c for c, _ in stats.values())
+    candidates = sum(n for _, n in stats.values())
+    if candidates:
+        print(f"  Skipped {candidates - compared} of {candidates} field comparisons "
+              f"({1 - compared / candidates:.1%}).")
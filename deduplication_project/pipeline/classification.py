@@ -11,8 +11,101 @@ TRIM_AVG_THRESHOLD = 0.8
 TRIM_MIN_THRESHOLD = 0.1
 # ...we will ignore the single lowest score.
 
-def find_duplicates(features, threshold):
+def _trimmed_columns(columns, dtype):
     """
+    For each row: the position of the column to trim (its first minimum in
+    column order, like idxmin, if the unweighted mean is high and the
+    minimum low), or -1.
+    """
+    num_rows = len(columns[0])
+    sums = np.zeros(num_rows, dtype=dtype)
+    counts = np.zeros(num_rows, dtype=np.int64)
+    row_min = np.full(num_rows, np.inf, dtype=dtype)
+    row_argmin = np.full(num_rows, -1, dtype=np.int64)
+    for j, column in enumerate(columns):
+        present = ~np.isnan(column)
+        np.add(sums, column, out=sums, where=present)
+        counts += present
+        lower = column < row_min  # False for NaN; keeps the first minimum
+        row_min[lower] = column[lower]
+        row_argmin[lower] = j
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        unweighted_mean = sums / counts.astype(dtype)
+    outlier_mask = (unweighted_mean > TRIM_AVG_THRESHOLD) & (row_min < TRIM_MIN_THRESHOLD)
+    return np.where(outlier_mask, row_argmin, -1)
+
+def _weighted_normalized_sums(columns, weights, trimmed):
+    """Weighted sum / available weight per row; trimmed, missing and unweighted scores are skipped."""
+    num_rows = len(trimmed)
+    sum_scores = np.zeros(num_rows)
+    count_scores = np.zeros(num_rows)
+    for j, column in enumerate(columns):
+        if np.isnan(weights[j]):
+            continue
+        available = ~np.isnan(column) & (trimmed != j)
+        np.add(sum_scores, column * weights[j], out=sum_scores, where=available)
+        np.add(count_scores, weights[j], out=count_scores, where=available)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return sum_scores / count_scores
+
+def find_duplicates(features, threshold, verbose=True, chunk_rows=1_000_000):
+    """
+    Classifies pairs as duplicates using a "Trimmed Weighted Normalized Sum."
+    
+    This is the most advanced classifier:
+    1. It finds and "trims" (ignores) outlier low scores
+       on otherwise high-matching pairs.
+    2. It then calculates the "Weighted Normalized Sum" on
+       the remaining (non-NaN) fields.
+
+    Works on NumPy views of the `features` columns (float64 or float32),
+    `chunk_rows` rows at a time, and leaves `features` unmodified: a
+    trimmed score is skipped, not overwritten. Row sums are always added
+    column by column in `features` column order, so a pair's score does
+    not depend on the other rows. On the pipeline's features (0/1/NaN,
+    weights exact in binary) scores are identical to
+    find_duplicates_pandas; on raw similarities they can differ by a few
+    ulps, as pandas' summation order depends on the frame's layout.
+    """
+    # Columns without a configured weight have weight NaN and are ignored
+    config_weights = {comp['label']: comp.get('weight', 1.0) for comp in config.COMPARISON_FIELDS}
+    if features.shape[1] == 0:
+        return find_duplicates_pandas(features.copy(), threshold, verbose)
+    columns = [features.iloc[:, j].to_numpy() for j in range(features.shape[1])]
+    weights = np.array([config_weights.get(label, np.nan) for label in features.columns], dtype=np.float64)
+    dtype = np.result_type(*[column.dtype for column in columns])
+    chunks = [slice(start, start + chunk_rows) for start in range(0, len(features), chunk_rows)]
+
+    # --- 1. Outlier Trimming Logic (vectorized) ---
+    trimmed = np.empty(len(features), dtype=np.int64)
+    for rows in chunks:
+        trimmed[rows] = _trimmed_columns([column[rows] for column in columns], dtype)
+    num_outliers = int((trimmed >= 0).sum())
+    if verbose and num_outliers:
+        print(f"Trimming outliers from {num_outliers} pairs...")
+
+    # --- 2. Weighted Normalized Sum Logic ---
+    normalized_sum = np.empty(len(features))
+    for rows in chunks:
+        normalized_sum[rows] = _weighted_normalized_sums([column[rows] for column in columns],
+                                                         weights, trimmed[rows])
+
+    # Get the total possible weight (max score)
+    num_total_fields = pd.Series(config_weights, dtype=np.float64).sum()
+    normalized_sum[np.isnan(normalized_sum)] = 0
+    normalized_sum *= num_total_fields
+
+    # Classify and return the passing scores
+    matches = normalized_sum >= threshold
+    return pd.Series(normalized_sum[matches], index=features.index[matches])
+
+def find_duplicates_pandas(features, threshold, verbose=True):
+    """
+    Reference implementation of find_duplicates with row-wise pandas ops.
+    Trims outliers in place, one cell at a time, so it modifies `features`.
+    Kept as the baseline in benchmark.py.
+
     Classifies pairs as duplicates using a "Trimmed Weighted Normalized Sum."
     
     This is the most advanced classifier:
@@ -33,7 +126,8 @@ def find_duplicates(features, threshold):
                    (unweighted_min < TRIM_MIN_THRESHOLD)
     
     if outlier_mask.any():
-        print(f"Trimming outliers from {outlier_mask.sum()} pairs...")
+        if verbose:
+            print(f"Trimming outliers from {outlier_mask.sum()} pairs...")
         
         # Get the field name (label) of the lowest score for each outlier row
         outlier_field_labels = features[outlier_mask].idxmin(axis=1)
@@ -0,0 +1,71 @@
+# --- File: pipeline/clustering.py ---
+
+import numpy as np
+
+try:
+    from scipy import sparse
+    from scipy.sparse import csgraph
+except ImportError:
+    sparse = csgraph = None
+
+class UnionFind:
+    """
+    Array-backed disjoint sets over the integers 0 .. n-1, with path
+    compression and union by rank.
+    """
+
+    def __init__(self, num_items):
+        self.parent = np.arange(num_items, dtype=np.int64)
+        self.rank = np.zeros(num_items, dtype=np.int8)
+
+    def find(self, item):
+        parent = self.parent
+        root = item
+        while parent[root] != root:
+            root = parent[root]
+        # Path compression
+        while parent[item] != root:
+            parent[item], item = root, parent[item]
+        return root
+
+    def union(self, a, b):
+        """Merges the sets of a and b; returns the new root."""
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return root_a
+        if self.rank[root_a] < self.rank[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        if self.rank[root_a] == self.rank[root_b]:
+            self.rank[root_a] += 1
+        return root_a
+
+    def union_pairs(self, left, right):
+        """Merges the sets of every (left[i], right[i])."""
+        for a, b in zip(np.asarray(left).tolist(), np.asarray(right).tolist()):
+            self.union(a, b)
+
+    def roots(self):
+        """The root of every item, resolved for all items at once (pointer jumping)."""
+        parent = self.parent
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+        self.parent = parent
+        return parent.copy()
+
+def connected_components(num_items, left, right):
+    """
+    Component label of each of `num_items` nodes linked by the edges
+    (left[i], right[i]): equal labels = same component. One sparse graph
+    traversal with scipy, else a union-find.
+    """
+    if csgraph is None:
+        sets = UnionFind(num_items)
+        sets.union_pairs(left, right)
+        return sets.roots()
+    graph = sparse.coo_matrix((np.ones(len(left), dtype=np.int8), (np.asarray(left), np.asarray(right))),
+                              shape=(num_items, num_items))
+    return csgraph.connected_components(graph, directed=False)[1]
@@ -2,31 +2,198 @@
 
 import recordlinkage
 import numpy as np  # Required for np.nan
+import pandas as pd
+from recordlinkage.algorithms import string as rl_string
 
-def compare_pairs(candidate_pairs, df, comparison_fields):
+# Fast batched string kernels; without rapidfuzz we fall back to
+# recordlinkage's per-pair jellyfish loop (same results, much slower)
+try:
+    from rapidfuzz.distance import DamerauLevenshtein, Jaro, JaroWinkler, Levenshtein
+    from rapidfuzz.process import cpdist
+except ImportError:
+    cpdist = None
+
+# recordlinkage's names for the string algorithms with a batched kernel:
+# name -> (reference jellyfish implementation, rapidfuzz metric, is_distance).
+# Distances are normalized like recordlinkage: 1 - d / max(len).
+# Other algorithms (qgram, cosine, ...) handle missing values differently
+# and are left to recordlinkage.
+if cpdist is not None:
+    STRING_KERNELS = {
+        "jaro": (rl_string.jaro_similarity, Jaro, False),
+        "levenshtein": (rl_string.levenshtein_similarity, Levenshtein, True),
+    }
+    STRING_KERNELS.update({name: (rl_string.jarowinkler_similarity, JaroWinkler, False)
+                           for name in ("jarowinkler", "jaro_winkler", "jw")})
+    STRING_KERNELS.update({name: (rl_string.damerau_levenshtein_similarity, DamerauLevenshtein, True)
+                           for name in ("damerau_levenshtein", "dameraulevenshtein", "dl")})
+else:
+    STRING_KERNELS = {}
+
+# Metrics with sim(a, b) == sim(b, a), so cached pairs can be unordered.
+# Jaro(-Winkler)'s greedy matching is not guaranteed symmetric.
+SYMMETRIC_ALGORITHMS = {"levenshtein", "damerau_levenshtein", "dameraulevenshtein", "dl"}
+
+def _get_fields(comp):
+    """Returns (field_left, field_right) of a comparison, or None if malformed."""
+    # Check for single field (e.g., given_name vs given_name)
+    if "field" in comp:
+        return comp["field"], comp["field"]
+    # Check for crossed fields (e.g., given_name vs surname)
+    if "field_left" in comp and "field_right" in comp:
+        return comp["field_left"], comp["field_right"]
+    return None
+
+def compare_pairs(candidate_pairs, df, comparison_fields, cache=None):
     """
     Computes similarity features for each candidate pair.
-    
+
     - Handles both single and crossed-field comparisons.
     - Sets 'missing_value=np.nan' to ignore missing fields.
+    - Each field is compared once per *unique* value pair, with batched
+      rapidfuzz kernels. Output is identical to recordlinkage.Compare.
+    - With a ComparisonCache, value pairs scored before are not recomputed.
+    """
+    if cpdist is None:
+        print("rapidfuzz not installed; comparing with recordlinkage (slow).")
+
+    # Row positions of both records of every pair
+    left_pos = df.index.get_indexer(candidate_pairs.get_level_values(0))
+    right_pos = df.index.get_indexer(candidate_pairs.get_level_values(1))
+
+    features = {}
+    for comp in comparison_fields:
+        feature = compare_field(comp, candidate_pairs, df, left_pos, right_pos, cache)
+        if feature is not None:
+            features[comp["label"]] = feature
+
+    return pd.DataFrame(features, index=candidate_pairs)
+
+def compare_field(comp, candidate_pairs, df, left_pos, right_pos, cache=None):
+    """
+    The feature array of one comparison for the pairs at row positions
+    (left_pos, right_pos) of `df`; None if its fields are malformed or not
+    in `df`. `candidate_pairs` is only needed without a batched kernel.
+    """
+    fields = _get_fields(comp)
+    if fields is None:
+        return None
+    field_left, field_right = fields
+    if field_left not in df.columns or field_right not in df.columns:
+        return None
+
+    method = comp["method"]
+    algo = comp.get("string_method", "jarowinkler")
+    if method == "string" and algo not in STRING_KERNELS:
+        return compare_pairs_recordlinkage(candidate_pairs, df, [comp])[comp["label"]].to_numpy()
+    if method == "string":
+        return _compare_string_field(df, field_left, field_right, left_pos, right_pos, algo,
+                                     comp["threshold"], cache, comp["label"])
+    if method == "exact":
+        return _compare_exact_field(df, field_left, field_right, left_pos, right_pos)
+    return None
+
+def _encode_pair_values(df, field_left, field_right, left_pos, right_pos):
+    """
+    Factorizes both fields over a shared vocabulary and returns
+    (codes_left, codes_right, uniques) per pair. Missing values get code -1.
+    """
+    values = np.concatenate([df[field_left].to_numpy(object), df[field_right].to_numpy(object)])
+    codes, uniques = pd.factorize(values)
+    num_records = len(df)
+    return codes[:num_records][left_pos], codes[num_records:][right_pos], uniques
+
+def _compare_exact_field(df, field_left, field_right, left_pos, right_pos):
+    """1.0 if both values are equal, 0.0 if not, NaN if either is missing."""
+    codes_left, codes_right, _ = _encode_pair_values(df, field_left, field_right, left_pos, right_pos)
+    result = (codes_left == codes_right).astype(np.float64)
+    result[(codes_left < 0) | (codes_right < 0)] = np.nan
+    return result
+
+def _compare_string_field(df, field_left, field_right, left_pos, right_pos, algo, threshold,
+                          cache=None, label=None):
+    """
+    Thresholded string similarity per pair (1.0 / 0.0, NaN if either value
+    is missing), computed once per distinct (left value, right value).
+    """
+    codes_left, codes_right, uniques = _encode_pair_values(df, field_left, field_right, left_pos, right_pos)
+    result = np.full(len(codes_left), np.nan)
+    valid = (codes_left >= 0) & (codes_right >= 0)
+    if not valid.any():
+        return result
+
+    # Deduplicate value pairs: pack both codes into one int64 key
+    num_values = len(uniques)
+    keys = codes_left[valid].astype(np.int64) * num_values + codes_right[valid]
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    codes_left, codes_right = unique_keys // num_values, unique_keys % num_values
+
+    lengths = _str_lengths(uniques)
+
+    def compute(mask):
+        left, right = codes_left[mask], codes_right[mask]
+        return string_similarity(uniques[left], uniques[right], algo, lengths[left], lengths[right])
+
+    if cache is None:
+        similarity = compute(slice(None))
+    else:
+        similarity = cache.get_or_compute(
+            (field_left, field_right, algo), label, uniques, codes_left, codes_right,
+            algo in SYMMETRIC_ALGORITHMS, compute
+        )
+    if threshold is not None:
+        # Same rule as recordlinkage: >= threshold is 1, below is 0, NaN stays
+        similarity = np.where(np.isnan(similarity), np.nan,
+                              np.where(similarity >= threshold, 1.0, 0.0))
+
+    result[valid] = similarity[inverse]
+    return result
+
+def string_similarity(strings_left, strings_right, algo, lengths_left=None, lengths_right=None):
+    """
+    Element-wise similarity of two equal-length arrays of strings,
+    bit-identical to recordlinkage's jellyfish implementation of `algo`
+    (one of STRING_KERNELS). String lengths are computed if not given.
+    """
+    reference, metric, is_distance = STRING_KERNELS[algo]
+    if lengths_left is None:
+        lengths_left, lengths_right = _str_lengths(strings_left), _str_lengths(strings_right)
+
+    if is_distance:
+        distance = cpdist(strings_left, strings_right, scorer=metric.distance, dtype=np.int64)
+        max_len = np.maximum(lengths_left, lengths_right)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            similarity = 1 - distance / max_len
+    else:
+        similarity = cpdist(strings_left, strings_right, scorer=metric.similarity, dtype=np.float64)
+
+    # jellyfish and rapidfuzz disagree on empty strings (e.g. JW of two
+    # empty strings is 0.0 in jellyfish, 1.0 in rapidfuzz); use the reference
+    empty = (lengths_left == 0) | (lengths_right == 0)
+    if empty.any():
+        similarity[empty] = reference(pd.Series(strings_left[empty]), pd.Series(strings_right[empty]))
+    return similarity
+
+def _str_lengths(strings):
+    return np.fromiter((len(s) for s in strings), dtype=np.int64, count=len(strings))
+
+def compare_pairs_recordlinkage(candidate_pairs, df, comparison_fields):
+    """
+    Reference implementation: hands every comparison to recordlinkage.Compare,
+    which scores pair by pair in Python. Used when rapidfuzz is missing and
+    as the baseline in benchmark.py.
     """
     compare_cl = recordlinkage.Compare()
 
     for comp in comparison_fields:
         method = comp["method"]
         label = comp["label"]
-        
-        # Check for single field (e.g., given_name vs given_name)
-        if "field" in comp:
-            field_left = comp["field"]
-            field_right = comp["field"]
-        # Check for crossed fields (e.g., given_name vs surname)
-        elif "field_left" in comp and "field_right" in comp:
-            field_left = comp["field_left"]
-            field_right = comp["field_right"]
-        else:
+
+        fields = _get_fields(comp)
+        if fields is None:
             continue
-            
+        field_left, field_right = fields
+
         if field_left not in df.columns:
             continue
         if field_right not in df.columns:
@@ -34,16 +201,16 @@ def compare_pairs(candidate_pairs, df, comparison_fields):
 
         if method == "string":
             algo = comp.get("string_method", "jarowinkler")
-            compare_cl.string(field_left, field_right, 
-                              method=algo, 
-                              threshold=comp["threshold"], 
+            compare_cl.string(field_left, field_right,
+                              method=algo,
+                              threshold=comp["threshold"],
                               label=label,
                               missing_value=np.nan)
         elif method == "exact":
-            compare_cl.exact(field_left, field_right, 
+            compare_cl.exact(field_left, field_right,
                              label=label,
                              missing_value=np.nan)
-        
+
     features = compare_cl.compute(candidate_pairs, df)
-    
-    return features
\ No newline at end of file
+
+    return features
@@ -0,0 +1,182 @@
+# --- File: pipeline/comparison_cache.py ---
+
+import os
+import pickle
+import numpy as np
+
+# Cached scores are only valid for the library versions that produced them
+try:
+    import rapidfuzz
+    import jellyfish
+    CACHE_VERSION = (1, rapidfuzz.__version__, getattr(jellyfish, "__version__", ""))
+except ImportError:
+    CACHE_VERSION = None
+
+# A value pair is one int64 key, id_a << ID_BITS | id_b; ids must stay
+# below MAX_IDS to keep keys positive and unambiguous
+ID_BITS = 32
+ID_MASK = np.int64((1 << ID_BITS) - 1)
+MAX_IDS = 1 << 31
+
+class _Segment:
+    """
+    Cached similarities for one (field_left, field_right, algorithm).
+
+    Values are interned to int ids; a value pair becomes one int64 key
+    (id_a << 32 | id_b). Keys are kept sorted, so a whole batch of pairs
+    is looked up with one np.searchsorted. `ticks` records the batch in
+    which each entry was last used, for LRU eviction. Values no longer
+    used by any key are dropped from the vocabulary once it outgrows what
+    `max_entries` keys can reference, and before saving.
+    """
+
+    def __init__(self):
+        self.vocab = {}
+        self.keys = np.empty(0, dtype=np.int64)
+        self.values = np.empty(0, dtype=np.float64)
+        self.ticks = np.empty(0, dtype=np.int64)
+
+        # --- Stats ---
+        self.lookups = 0
+        self.hits = 0
+        self.evictions = 0
+
+    def pair_keys(self, uniques, codes_left, codes_right, symmetric):
+        vocab = self.vocab
+        ids = np.fromiter((vocab.setdefault(value, len(vocab)) for value in uniques),
+                          dtype=np.int64, count=len(uniques))
+        if len(vocab) > MAX_IDS:
+            raise OverflowError(f"Comparison cache vocabulary exceeds {MAX_IDS} values; "
+                                f"lower COMPARISON_CACHE_MAX_ENTRIES.")
+        ids_left, ids_right = ids[codes_left], ids[codes_right]
+        if symmetric:
+            ids_left, ids_right = np.minimum(ids_left, ids_right), np.maximum(ids_left, ids_right)
+        return (ids_left << ID_BITS) | ids_right
+
+    def lookup(self, keys, tick):
+        positions = np.searchsorted(self.keys, keys)
+        hit = positions < len(self.keys)
+        hit[hit] = self.keys[positions[hit]] == keys[hit]
+        self.ticks[positions[hit]] = tick
+
+        self.lookups += len(keys)
+        self.hits += int(hit.sum())
+        return self.values[positions[hit]], hit
+
+    def store(self, keys, values, tick, max_entries):
+        # The same unordered pair can appear twice in one batch when symmetric
+        keys, first = np.unique(keys, return_index=True)
+        all_keys = np.concatenate([self.keys, keys])
+        order = np.argsort(all_keys, kind="stable")
+        self.keys = all_keys[order]
+        self.values = np.concatenate([self.values, values[first]])[order]
+        self.ticks = np.concatenate([self.ticks, np.full(len(keys), tick)])[order]
+
+        if len(self.keys) > max_entries:
+            # Keep the most recently used entries, in key order
+            keep = np.sort(np.argpartition(-self.ticks, max_entries - 1)[:max_entries])
+            self.evictions += len(self.keys) - len(keep)
+            self.keys, self.values, self.ticks = self.keys[keep], self.values[keep], self.ticks[keep]
+            # max_entries keys reference at most 2 * max_entries values
+            if len(self.vocab) > 2 * max_entries:
+                self.compact()
+
+    def compact(self):
+        """
+        Drops the values no cached key references and renumbers the rest.
+        Ids keep their relative order, so the keys stay sorted.
+        """
+        ids_left, ids_right = self.keys >> ID_BITS, self.keys & ID_MASK
+        live = np.unique(np.concatenate([ids_left, ids_right]))
+        if len(live) == len(self.vocab):
+            return
+        values = list(self.vocab)  # Insertion order is id order
+        self.vocab = {values[old]: new for new, old in enumerate(live.tolist())}
+        self.keys = (np.searchsorted(live, ids_left) << ID_BITS) | np.searchsorted(live, ids_right)
+
+class ComparisonCache:
+    """
+    Bounded memo of raw (pre-threshold) string similarities, keyed on
+    (field_left, field_right, algorithm, value_a, value_b). For symmetric
+    metrics the value pair is unordered. Each field keeps at most
+    `max_entries` pairs, evicting the least recently used batch first, and
+    the cache can be saved to disk so later runs skip known pairs.
+    """
+
+    def __init__(self, max_entries, path=None):
+        self.max_entries = max_entries
+        self.path = path
+        self.segments = {}
+        self.labels = {}  # Segment -> comparison label(s), for stats
+        self._tick = 0
+
+    @classmethod
+    def load(cls, path, max_entries):
+        """Loads a saved cache, or starts an empty one if missing or stale."""
+        cache = cls(max_entries, path)
+        if path is None or not os.path.exists(path):
+            return cache
+        try:
+            with open(path, "rb") as f:
+                saved = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            print(f"Warning: could not read comparison cache {path}: {e}")
+            return cache
+        if saved.get("version") != CACHE_VERSION:
+            print("Comparison cache was built with other library versions; starting empty.")
+            return cache
+
+        for namespace, (vocab, keys, values, ticks) in saved["segments"].items():
+            segment = _Segment()
+            segment.vocab = {value: i for i, value in enumerate(vocab)}
+            segment.keys, segment.values, segment.ticks = keys, values, ticks
+            cache.segments[namespace] = segment
+        cache._tick = saved.get("tick", 0)
+        print(f"Loaded comparison cache from {path} "
+              f"({sum(len(s.keys) for s in cache.segments.values())} entries).")
+        return cache
+
+    def save(self):
+        if self.path is None:
+            return
+        for segment in self.segments.values():
+            segment.compact()
+        segments = {namespace: (list(segment.vocab), segment.keys, segment.values, segment.ticks)
+                    for namespace, segment in self.segments.items()}
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"version": CACHE_VERSION, "tick": self._tick, "segments": segments},
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+
+    def get_or_compute(self, namespace, label, uniques, codes_left, codes_right, symmetric, compute):
+        """
+        Similarities of the value pairs (uniques[codes_left], uniques[codes_right]).
+        Misses are computed with `compute(miss_mask)` and added to the cache.
+        """
+        segment = self.segments.get(namespace)
+        if segment is None:
+            segment = self.segments[namespace] = _Segment()
+        self.labels.setdefault(namespace, set()).add(label)
+        self._tick += 1
+
+        keys = segment.pair_keys(uniques, codes_left, codes_right, symmetric)
+        similarity = np.empty(len(keys), dtype=np.float64)
+        cached, hit = segment.lookup(keys, self._tick)
+        similarity[hit] = cached
+
+        miss = ~hit
+        if miss.any():
+            similarity[miss] = compute(miss)
+            segment.store(keys[miss], similarity[miss], self._tick, self.max_entries)
+        return similarity
+
+    def print_stats(self):
+        print("Comparison cache hit rates (unique value pairs):")
+        for namespace, segment in self.segments.items():
+            if not segment.lookups:
+                continue
+            labels = ", ".join(sorted(self.labels.get(namespace, [])))
+            print(f"  {labels:<28} {segment.hits:>9}/{segment.lookups:<9} "
+                  f"{100 * segment.hits / segment.lookups:5.1f}%  "
+                  f"({len(segment.keys)} cached, {segment.evictions} evicted)")
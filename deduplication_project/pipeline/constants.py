@@ -20,6 +20,37 @@ DEFAULT_STRING_ALGO = "jarowinkler"
 
 # Indexing configuration
 SORTING_WINDOW_SIZE = "window_size"  # Config key for window size
+KEY_Q = "q"  # q-gram length
+KEY_ENCODING = "encoding"  # Phonetic algorithm
+KEY_MAX_BLOCK_SIZE = "max_block_size"  # Skip larger blocks (stop keys)
+KEY_FIELDS = "fields"  # Several fields shingled together (minhash)
+KEY_BANDS = "bands"  # LSH bands
+KEY_ROWS = "rows"  # MinHash values per band
+KEY_SEED = "seed"
+KEY_TOP_K = "k"  # Nearest neighbours per record (tfidf)
+KEY_MIN_SIMILARITY = "min_similarity"  # Lowest cosine similarity paired (tfidf)
+KEY_MAX_ENTRIES = "max_entries"  # Similarity entries per chunk product (tfidf)
+KEY_MAX_DF = "max_df"  # Drop q-grams in a larger fraction of records (tfidf)
+
+# Indexing methods
+INDEX_BLOCK = "block"
+INDEX_SORTED_NEIGHBOURHOOD = "sortedneighbourhood"
+INDEX_QGRAM = "qgram"
+INDEX_PHONETIC = "phonetic"
+INDEX_MINHASH = "minhash"
+INDEX_TFIDF = "tfidf"
+
+# Default values (indexing)
+DEFAULT_Q = 3
+DEFAULT_PHONETIC_ENCODING = "soundex"
+DEFAULT_MINHASH_Q = 2
+DEFAULT_BANDS = 30
+DEFAULT_ROWS = 5
+DEFAULT_TFIDF_Q = 3
+DEFAULT_TOP_K = 10
+DEFAULT_MIN_SIMILARITY = 0.5
+DEFAULT_MAX_ENTRIES = 20_000_000
+DEFAULT_MAX_DF = 1.0
 NAME_1_FIELD = "name_1"
 NAME_2_FIELD = "name_2"
 
@@ -0,0 +1,249 @@
+# --- File: pipeline/incremental.py ---
+
+import json
+import sqlite3
+import numpy as np
+import pandas as pd
+from pipeline import constants, indexing
+from pipeline.clustering import UnionFind
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    pos     INTEGER PRIMARY KEY,  -- Insertion order, 0 .. n-1
+    rec_id  UNIQUE NOT NULL,
+    cluster INTEGER NOT NULL,     -- Cluster id (the pos of one of its records)
+    data    TEXT NOT NULL         -- Cleaned record, JSON array in meta 'columns' order
+);
+CREATE INDEX IF NOT EXISTS records_cluster ON records (cluster);
+CREATE TABLE IF NOT EXISTS blocking_keys (
+    pass INTEGER NOT NULL,
+    key          NOT NULL,
+    pos  INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS blocking_keys_lookup ON blocking_keys (pass, key);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# SQLite's default limit on host parameters per statement is 999
+MAX_PARAMS = 900
+
+def _chunks(values, size=MAX_PARAMS):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+def _plain(value):
+    """NumPy scalars -> Python values SQLite and json accept; NaN -> None."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+class ResolvedIndex:
+    """
+    The resolved corpus for incremental deduplication, in SQLite: every
+    cleaned record with its cluster id, and the blocking keys of every
+    pass, indexed so a new batch is blocked with lookups that cost
+    O(batch size * log(corpus size)) instead of re-indexing the corpus.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def get_meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_meta(self, key, value):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+    def num_records(self):
+        return self.conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def next_rec_id(self):
+        """First free integer record id (for batches without a rec_id column)."""
+        row = self.conn.execute("SELECT MAX(rec_id) FROM records WHERE typeof(rec_id) = 'integer'").fetchone()
+        return 0 if row[0] is None else row[0] + 1
+
+    def check_batch(self, batch_df, passes):
+        """
+        Raises ValueError if the batch cannot be matched against the index:
+        other blocking passes or columns than the indexed records, or
+        record ids that are already indexed.
+        """
+        if any(p[constants.KEY_METHOD] == constants.INDEX_MINHASH for p in passes):
+            # Shingle ids are numbered over the records at hand, so the keys
+            # of a batch are not comparable with those of the corpus
+            raise ValueError("MinHash passes cannot be used for incremental matching.")
+        if any(p[constants.KEY_METHOD] in indexing.PAIR_METHODS for p in passes):
+            # Neighbours (and IDF weights) depend on all the records at hand
+            raise ValueError("TF-IDF passes cannot be used for incremental matching.")
+        stored = self.get_meta("passes")
+        if stored is not None and stored != json.loads(json.dumps(passes)):
+            raise ValueError(f"{self.path} was built with other blocking passes; "
+                             "delete it to rebuild the index from scratch.")
+        stored = self.get_meta("columns")
+        if stored is not None and stored != batch_df.columns.tolist():
+            raise ValueError(f"Batch columns {batch_df.columns.tolist()} differ from the indexed records {stored}.")
+        clashes = self.existing_ids(batch_df.index)
+        if clashes:
+            raise ValueError(f"{len(clashes)} record ids are already indexed (e.g. {clashes[0]!r}).")
+
+    def existing_ids(self, rec_ids):
+        found = []
+        for chunk in _chunks([_plain(rec_id) for rec_id in rec_ids]):
+            found += [row[0] for row in self.conn.execute(
+                f"SELECT rec_id FROM records WHERE rec_id IN ({','.join('?' * len(chunk))})", chunk)]
+        return found
+
+    # --- Blocking a batch against the index ---
+
+    def _positions_for_keys(self, pass_id, keys):
+        """DataFrame (key, pos) of the indexed records having any of `keys`."""
+        rows = []
+        for chunk in _chunks(keys):
+            rows += self.conn.execute(
+                f"SELECT key, pos FROM blocking_keys WHERE pass = ? AND key IN ({','.join('?' * len(chunk))})",
+                [pass_id] + chunk).fetchall()
+        return pd.DataFrame(rows, columns=["key", "pos"])
+
+    def _neighbour_keys(self, pass_id, batch_keys, max_lag):
+        """
+        DataFrame (key, old_key): indexed keys at most `max_lag` apart from a
+        batch key among the sorted distinct keys of the corpus plus batch.
+        Only the max_lag nearest indexed keys on each side can qualify.
+        """
+        batch_keys = np.unique(batch_keys)
+        matches = []
+        for key in batch_keys.tolist():
+            below = [row[0] for row in self.conn.execute(
+                "SELECT DISTINCT key FROM blocking_keys WHERE pass = ? AND key <= ? ORDER BY key DESC LIMIT ?",
+                (pass_id, key, max_lag + 1))]
+            above = [row[0] for row in self.conn.execute(
+                "SELECT DISTINCT key FROM blocking_keys WHERE pass = ? AND key > ? ORDER BY key LIMIT ?",
+                (pass_id, key, max_lag))]
+            old_keys = np.array(below + above, dtype=object)
+            if not len(old_keys):
+                continue
+            # Distance in the merged order: the batch keys between also count
+            merged = np.unique(np.concatenate([old_keys, batch_keys]))
+            distance = np.abs(np.searchsorted(merged, old_keys) - np.searchsorted(merged, key))
+            matches += [(key, old_key) for old_key in old_keys[distance <= max_lag].tolist()]
+        return pd.DataFrame(matches, columns=["key", "old_key"])
+
+    def match(self, batch_df, passes):
+        """
+        Blocks the batch against the indexed records with every pass.
+        Returns unique (batch position, indexed pos) pairs as two arrays.
+        """
+        batch_positions, index_positions = [], []
+        for pass_id, indexing_pass in enumerate(passes):
+            positions, keys, max_lag = indexing.record_keys(batch_df, indexing_pass)
+            batch = pd.DataFrame({"key": [_plain(key) for key in keys], "new_pos": positions})
+            if max_lag:
+                neighbours = self._neighbour_keys(pass_id, batch["key"].to_numpy(object), max_lag)
+                old = self._positions_for_keys(pass_id, neighbours["old_key"].unique().tolist())
+                old = neighbours.merge(old.rename(columns={"key": "old_key"}), on="old_key")
+            else:
+                old = self._positions_for_keys(pass_id, batch["key"].unique().tolist())
+                max_block_size = indexing_pass.get(constants.KEY_MAX_BLOCK_SIZE)
+                if max_block_size is not None:
+                    # Block size over corpus + batch
+                    sizes = old["key"].value_counts().add(batch["key"].value_counts(), fill_value=0)
+                    small = sizes.index[sizes <= max_block_size]
+                    old, batch = old[old["key"].isin(small)], batch[batch["key"].isin(small)]
+            pairs = batch.merge(old, on="key")
+            print(f"Pass {pass_id + 1}: {len(pairs)} batch-to-index pairs ({indexing.describe_pass(indexing_pass)}).")
+            batch_positions.append(pairs["new_pos"].to_numpy(np.int64))
+            index_positions.append(pairs["pos"].to_numpy(np.int64))
+
+        keys = np.unique(indexing.pack_pairs(np.concatenate(batch_positions), np.concatenate(index_positions)))
+        return indexing.unpack_pairs(keys)
+
+    def fetch_records(self, positions):
+        """The cleaned records at the sorted `positions`, indexed by rec_id."""
+        rows = []
+        for chunk in _chunks([int(pos) for pos in positions]):
+            rows += self.conn.execute(
+                f"SELECT pos, rec_id, data FROM records WHERE pos IN ({','.join('?' * len(chunk))})", chunk).fetchall()
+        rows.sort()
+        records = pd.DataFrame([json.loads(data) for _, _, data in rows], columns=self.get_meta("columns"))
+        records.index = pd.Index([rec_id for _, rec_id, _ in rows], name="rec_id")
+        # JSON null -> NaN, as after cleaning
+        return records.astype(object).where(records.notna(), np.nan)
+
+    # --- Updating the index ---
+
+    def add_records(self, batch_df, passes):
+        """Appends the batch as singleton clusters, with its blocking keys. Returns the first new pos."""
+        first = self.num_records()
+        self.set_meta("columns", batch_df.columns.tolist())
+        self.set_meta("passes", passes)
+
+        rows = ((first + i, _plain(rec_id), first + i, json.dumps([_plain(v) for v in values]))
+                for i, (rec_id, values) in enumerate(zip(batch_df.index, batch_df.itertuples(index=False))))
+        self.conn.executemany("INSERT INTO records (pos, rec_id, cluster, data) VALUES (?, ?, ?, ?)", rows)
+        for pass_id, indexing_pass in enumerate(passes):
+            positions, keys, _ = indexing.record_keys(batch_df, indexing_pass)
+            self.conn.executemany("INSERT INTO blocking_keys (pass, key, pos) VALUES (?, ?, ?)",
+                                  zip([pass_id] * len(keys), map(_plain, keys), (positions + first).tolist()))
+        return first
+
+    def merge_clusters(self, left, right):
+        """
+        Union-find merge of the clusters linked by (left[i], right[i]) (record
+        positions). Each merged cluster keeps its oldest cluster id, so only
+        the records of the other clusters are relabelled. Returns the
+        number of merges.
+        """
+        if not len(left):
+            return 0
+        cluster_of = self._clusters_of(np.concatenate([left, right]))
+
+        clusters = np.unique(list(cluster_of.values()))
+        sets = UnionFind(len(clusters))
+        sets.union_pairs(np.searchsorted(clusters, [cluster_of[pos] for pos in left.tolist()]),
+                         np.searchsorted(clusters, [cluster_of[pos] for pos in right.tolist()]))
+        roots = sets.roots()
+        # Oldest (smallest) cluster id of each merged set
+        oldest = pd.Series(clusters).groupby(roots).transform("min").to_numpy()
+        renamed = [(int(new), int(old)) for old, new in zip(clusters, oldest) if old != new]
+        self.conn.executemany("UPDATE records SET cluster = ? WHERE cluster = ?", renamed)
+        return len(renamed)
+
+    def _clusters_of(self, positions):
+        """{pos: cluster id} of the records at `positions`."""
+        cluster_of = {}
+        for chunk in _chunks(np.unique(positions).tolist()):
+            cluster_of.update(self.conn.execute(
+                f"SELECT pos, cluster FROM records WHERE pos IN ({','.join('?' * len(chunk))})", chunk).fetchall())
+        return cluster_of
+
+    def split_links(self, left, right):
+        """The number of links (left[i], right[i]) whose records are in different clusters."""
+        if not len(left):
+            return 0
+        cluster_of = self._clusters_of(np.concatenate([left, right]))
+        return sum(cluster_of[a] != cluster_of[b] for a, b in zip(left.tolist(), right.tolist()))
+
+    def commit(self):
+        self.conn.commit()
+
+    def num_clusters(self):
+        return self.conn.execute("SELECT COUNT(DISTINCT cluster) FROM records").fetchone()[0]
+
+    def cluster_assignments(self):
+        """Series rec_id -> cluster id, for all indexed records."""
+        rows = self.conn.execute("SELECT rec_id, cluster FROM records ORDER BY pos").fetchall()
+        return pd.Series([cluster for _, cluster in rows],
+                         index=pd.Index([rec_id for rec_id, _ in rows], name="rec_id"), name="cluster_id")
@@ -1,65 +1,446 @@
 # --- File: pipeline/indexing.py ---
 
+import time
+import numpy as np
+import pandas as pd
 import recordlinkage
 import config
+from pipeline import constants, phonetic
 
-def create_candidate_pairs(df, block_config):
-    """
-    Creates candidate pairs using a "penta-pass" OR logic.
-    
-    1. Blocks on 'surname_trunc'
-    2. Blocks on 'given_name_trunc'
-    3. Sorts on 'soc_sec_id'
-    4. Sorts on 'postcode'
-    5. (NEW) Sorts on 'address_1'
-    """
-    
-    # --- Pass 1: Block on surname_trunc ---
-    print("Running Pass 1: Blocking on 'surname_trunc'...")
-    indexer_pass1 = recordlinkage.Index()
-    indexer_pass1.block(on='surname_trunc')
-    pairs_pass1 = indexer_pass1.index(df)
-    print(f"Pass 1 found {len(pairs_pass1)} pairs.")
-    
-    # --- Pass 2: Block on given_name_trunc ---
-    print("Running Pass 2: Blocking on 'given_name_trunc'...")
-    indexer_pass2 = recordlinkage.Index()
-    indexer_pass2.block(on='given_name_trunc')
-    pairs_pass2 = indexer_pass2.index(df)
-    print(f"Pass 2 found {len(pairs_pass2)} pairs.")
-    
-    # --- Pass 3: Sort on soc_sec_id ---
-    print(f"Running Pass 3: SortedNeighbourhood on 'soc_sec_id' (window={config.SORTING_WINDOW_SIZE})...")
-    indexer_pass3 = recordlinkage.Index()
-    indexer_pass3.sortedneighbourhood(
-        left_on='soc_sec_id', 
-        window=config.SORTING_WINDOW_SIZE
-    )
-    pairs_pass3 = indexer_pass3.index(df)
-    print(f"Pass 3 found {len(pairs_pass3)} pairs.")
-
-    # --- Pass 4: Sort on postcode ---
-    print(f"Running Pass 4: SortedNeighbourhood on 'postcode' (window={config.POSTCODE_SORTING_WINDOW_SIZE})...")
-    indexer_pass4 = recordlinkage.Index()
-    indexer_pass4.sortedneighbourhood(
-        left_on='postcode', 
-        window=config.POSTCODE_SORTING_WINDOW_SIZE
-    )
-    pairs_pass4 = indexer_pass4.index(df)
-    print(f"Pass 4 found {len(pairs_pass4)} pairs.")
-
-    # --- (NEW) Pass 5: Sort on address_1 ---
-    print(f"Running Pass 5: SortedNeighbourhood on 'address_1' (window={config.ADDRESS_SORTING_WINDOW_SIZE})...")
-    indexer_pass5 = recordlinkage.Index()
-    indexer_pass5.sortedneighbourhood(
-        left_on='address_1', 
-        window=config.ADDRESS_SORTING_WINDOW_SIZE  # Use the new window
-    )
-    pairs_pass5 = indexer_pass5.index(df)
-    print(f"Pass 5 found {len(pairs_pass5)} pairs.")
-
-    # --- 6. Combine all results (union) ---
-    print("Combining pairs from all 5 passes...")
-    candidate_pairs = pairs_pass1.union(pairs_pass2).union(pairs_pass3).union(pairs_pass4).union(pairs_pass5)
-    
-    return candidate_pairs
\ No newline at end of file
+try:
+    from sklearn.feature_extraction.text import TfidfVectorizer
+except ImportError:
+    TfidfVectorizer = None
+
+# A pair of record positions (a > b) packed into one int64: a << 32 | b
+PAIR_SHIFT = np.int64(32)
+PAIR_MASK = np.int64((1 << 32) - 1)
+
+def pack_pairs(higher, lower):
+    return (higher.astype(np.int64) << PAIR_SHIFT) | lower.astype(np.int64)
+
+def unpack_pairs(keys):
+    return keys >> PAIR_SHIFT, keys & PAIR_MASK
+
+def unpack_pairs_index(candidate_pairs):
+    """Packed position keys of a MultiIndex built by keys_to_multiindex."""
+    return pack_pairs(candidate_pairs.codes[0], candidate_pairs.codes[1])
+
+def keys_to_multiindex(keys, df):
+    """Turns packed position pairs into a (rec_id_1, rec_id_2) MultiIndex."""
+    higher, lower = unpack_pairs(keys)
+    name = df.index.name
+    names = [f"{name}_1", f"{name}_2"] if name is not None else [None, None]
+    return pd.MultiIndex(levels=[df.index, df.index], codes=[higher, lower],
+                         names=names, verify_integrity=False)
+
+# --- Pass keys ---
+# Each indexing method maps the records to (positions, keys, max_lag):
+# record positions[i] has blocking key keys[i]. With max_lag 0 records with
+# equal keys are paired; otherwise records whose keys are at most max_lag
+# apart among the sorted distinct keys. A record may have several keys
+# (qgram, minhash); records with a missing key are left out.
+
+def _field_values(df, indexing_pass):
+    field = indexing_pass[constants.FIELD_SINGLE]
+    if field not in df.columns:
+        raise ValueError(f"Blocking field '{field}' not found in the data.")
+    values = df[field].to_numpy(object)
+    present = np.flatnonzero(~pd.isna(values))
+    return present, values[present]
+
+def _block_keys(df, indexing_pass):
+    positions, values = _field_values(df, indexing_pass)
+    return positions, values, 0
+
+def _sorted_neighbourhood_keys(df, indexing_pass):
+    window = indexing_pass[constants.SORTING_WINDOW_SIZE]
+    if not isinstance(window, int) or window < 0 or not window % 2:
+        raise ValueError("window is not a positive and odd integer")
+    positions, values = _field_values(df, indexing_pass)
+    return positions, values, (window - 1) // 2
+
+def _qgram_keys(df, indexing_pass):
+    q = indexing_pass.get(constants.KEY_Q, constants.DEFAULT_Q)
+    positions, values = _field_values(df, indexing_pass)
+    # Values shorter than q are their own single gram
+    grams = [{value[i:i + q] for i in range(max(len(value) - q + 1, 1))}
+             for value in map(str, values)]
+    counts = np.fromiter(map(len, grams), dtype=np.int64, count=len(grams))
+    keys = np.fromiter((g for record in grams for g in record), dtype=object, count=counts.sum())
+    return np.repeat(positions, counts), keys, 0
+
+def _phonetic_keys(df, indexing_pass):
+    encoding = indexing_pass.get(constants.KEY_ENCODING, constants.DEFAULT_PHONETIC_ENCODING)
+    field = indexing_pass[constants.FIELD_SINGLE]
+    column = phonetic.phonetic_column(field, encoding)
+    if column in df.columns:
+        # Computed by preprocessing (config.PHONETIC_KEYS)
+        return _block_keys(df, {constants.FIELD_SINGLE: column})
+    positions, values = _field_values(df, indexing_pass)
+    codes = phonetic.encode_column(pd.Series(values, name=field), encoding).to_numpy(object)
+    return positions, codes, 0
+
+# Universal hashing (a * x + b) mod p for MinHash; x < 2**31, so no overflow
+MERSENNE_PRIME = np.int64((1 << 31) - 1)
+
+def _shingles(df, fields, q):
+    """
+    Character q-grams of `fields`, pooled per record (so swapped name fields
+    still overlap). Returns (record positions, shingle ids), grouped by record.
+    """
+    missing = [field for field in fields if field not in df.columns]
+    if missing:
+        raise ValueError(f"Blocking fields {missing} not found in the data.")
+    records = []
+    for values in zip(*(df[field].to_numpy(object) for field in fields)):
+        grams = set()
+        for value in values:
+            if not pd.isna(value):
+                value = str(value)
+                grams.update(value[i:i + q] for i in range(max(len(value) - q + 1, 1)))
+        records.append(grams)
+    counts = np.fromiter(map(len, records), dtype=np.int64, count=len(records))
+    # Sorted vocabulary: ids (and so signatures) must not depend on set order
+    shingle_ids, _ = pd.factorize(np.fromiter((g for grams in records for g in grams),
+                                              dtype=object, count=counts.sum()), sort=True)
+    positions = np.repeat(np.arange(len(records)), counts)
+    return positions, shingle_ids.astype(np.int64)
+
+def minhash_signatures(positions, shingle_ids, num_perm, seed=0, chunk_entries=1_000_000):
+    """
+    MinHash signature (num_records x num_perm) of each record's shingle set;
+    `positions` must be grouped by record. Hash permutations are computed in
+    column chunks so the (entries x permutations) matrix stays bounded.
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, MERSENNE_PRIME, size=num_perm, dtype=np.int64)
+    b = rng.integers(0, MERSENNE_PRIME, size=num_perm, dtype=np.int64)
+    starts = np.flatnonzero(np.r_[True, positions[1:] != positions[:-1]]) if len(positions) else positions
+
+    signatures = np.empty((len(starts), num_perm), dtype=np.int64)
+    step = max(1, chunk_entries // max(len(shingle_ids), 1))
+    for first in range(0, num_perm, step):
+        cols = slice(first, first + step)
+        hashes = (shingle_ids[:, None] * a[cols] + b[cols]) % MERSENNE_PRIME
+        signatures[:, cols] = np.minimum.reduceat(hashes, starts, axis=0)
+    return positions[starts], signatures
+
+def _minhash_keys(df, indexing_pass):
+    """
+    MinHash/LSH: the signature is cut into `bands` bands of `rows` values;
+    records agreeing on all values of any band share a bucket. Two records
+    with shingle Jaccard similarity s meet with probability
+    1 - (1 - s**rows)**bands.
+    """
+    fields = indexing_pass[constants.KEY_FIELDS]
+    q = indexing_pass.get(constants.KEY_Q, constants.DEFAULT_MINHASH_Q)
+    bands = indexing_pass.get(constants.KEY_BANDS, constants.DEFAULT_BANDS)
+    rows = indexing_pass.get(constants.KEY_ROWS, constants.DEFAULT_ROWS)
+    positions, shingle_ids = _shingles(df, fields, q)
+    records, signatures = minhash_signatures(positions, shingle_ids, bands * rows,
+                                             indexing_pass.get(constants.KEY_SEED, 0))
+
+    # One bucket id per (band, band values): pack each band row into bytes,
+    # so records share a bucket only if all values of the band are equal
+    band_ranks = []
+    offset = 0
+    for band in range(bands):
+        values = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+        ranks, uniques = pd.factorize(values.view(f"S{8 * rows}").ravel())
+        band_ranks.append(ranks + offset)
+        offset += len(uniques)
+    return np.tile(records, bands), np.concatenate(band_ranks), 0
+
+def tfidf_vectors(df, fields, q, max_df=constants.DEFAULT_MAX_DF):
+    """
+    TF-IDF vectors (CSR, rows L2-normalized) of the character q-grams of
+    each record's `fields`, joined by spaces; records without any value
+    get an all-zero row. Q-grams in more than a `max_df` fraction of the
+    records are left out: they weigh little but make most similarity
+    entries.
+    """
+    if TfidfVectorizer is None:
+        raise ImportError("The tfidf indexing method requires scikit-learn.")
+    missing = [field for field in fields if field not in df.columns]
+    if missing:
+        raise ValueError(f"Blocking fields {missing} not found in the data.")
+    text = [" ".join(str(value) for value in values if not pd.isna(value))
+            for values in zip(*(df[field].to_numpy(object) for field in fields))]
+    vectorizer = TfidfVectorizer(analyzer="char", ngram_range=(q, q), lowercase=False, max_df=max_df,
+                                 dtype=np.float32)
+    return vectorizer.fit_transform(text).tocsr()
+
+def top_k_neighbours(vectors, k, min_similarity, max_entries):
+    """
+    Yields (rows, neighbours): for every row of `vectors`, its (at most) k
+    most cosine-similar other rows with similarity >= min_similarity, ties
+    broken by position.
+
+    Rows are multiplied with vectors.T in chunks. A chunk's product has at
+    most sum(document frequency of its q-grams) entries, so chunks are cut
+    where that bound reaches `max_entries`.
+    """
+    num_rows = vectors.shape[0]
+    doc_freq = np.bincount(vectors.indices, minlength=vectors.shape[1]).astype(np.int64)
+    entry_rows = np.repeat(np.arange(num_rows), np.diff(vectors.indptr))
+    row_cost = np.bincount(entry_rows, weights=doc_freq[vectors.indices], minlength=num_rows).astype(np.int64)
+    bounds = np.searchsorted(np.cumsum(row_cost), np.arange(1, row_cost.sum() // max_entries + 1) * max_entries)
+    transposed = vectors.T.tocsr()
+
+    first = 0
+    for last in np.unique(np.r_[bounds, num_rows]):
+        last = max(last, first + 1)  # A row costlier than max_entries forms its own chunk
+        if first >= num_rows:
+            break
+        similarities = (vectors[first:last] @ transposed).tocsr()
+        rows = np.repeat(np.arange(first, last), np.diff(similarities.indptr))
+        cols, values = similarities.indices, similarities.data
+        keep = (values >= min_similarity) & (cols != rows)
+        rows, cols, values = rows[keep], cols[keep], values[keep]
+        order = np.lexsort((cols, -values, rows))
+        rows, cols = rows[order], cols[order]
+        rank = np.arange(len(rows)) - np.searchsorted(rows, rows)
+        yield rows[rank < k], cols[rank < k]
+        first = last
+
+def _tfidf_pairs(df, indexing_pass, batch_size):
+    """
+    Top-k nearest neighbours over TF-IDF character q-grams of `fields`:
+    each record is paired with its k most similar records (cosine >=
+    min_similarity), so a pass yields at most k pairs per record, whatever
+    the key distribution. A pair can come from both of its records.
+    """
+    vectors = tfidf_vectors(df, indexing_pass[constants.KEY_FIELDS],
+                            indexing_pass.get(constants.KEY_Q, constants.DEFAULT_TFIDF_Q),
+                            indexing_pass.get(constants.KEY_MAX_DF, constants.DEFAULT_MAX_DF))
+    for rows, neighbours in top_k_neighbours(
+            vectors, indexing_pass.get(constants.KEY_TOP_K, constants.DEFAULT_TOP_K),
+            indexing_pass.get(constants.KEY_MIN_SIMILARITY, constants.DEFAULT_MIN_SIMILARITY),
+            indexing_pass.get(constants.KEY_MAX_ENTRIES, constants.DEFAULT_MAX_ENTRIES)):
+        keys = np.unique(pack_pairs(np.maximum(rows, neighbours), np.minimum(rows, neighbours)))
+        for start in range(0, len(keys), batch_size):
+            yield keys[start:start + batch_size]
+
+INDEX_METHODS = {
+    constants.INDEX_BLOCK: _block_keys,
+    constants.INDEX_SORTED_NEIGHBOURHOOD: _sorted_neighbourhood_keys,
+    constants.INDEX_QGRAM: _qgram_keys,
+    constants.INDEX_PHONETIC: _phonetic_keys,
+    constants.INDEX_MINHASH: _minhash_keys,
+}
+
+# Methods producing pairs directly rather than keys: (df, pass, batch_size)
+# -> sorted packed pair keys, in batches
+PAIR_METHODS = {
+    constants.INDEX_TFIDF: _tfidf_pairs,
+}
+
+# Methods that can repeat a pair within a pass (a record in several blocks,
+# or a pair found from both of its records)
+MULTI_KEY_METHODS = {constants.INDEX_QGRAM, constants.INDEX_MINHASH, constants.INDEX_TFIDF}
+
+def record_keys(df, indexing_pass):
+    """(positions, keys, max_lag) of one pass; see INDEX_METHODS."""
+    method = indexing_pass[constants.KEY_METHOD]
+    if method in PAIR_METHODS:
+        raise ValueError(f"'{method}' passes produce pairs, not blocking keys.")
+    if method not in INDEX_METHODS:
+        raise ValueError(f"Unknown indexing method '{method}'.")
+    return INDEX_METHODS[method](df, indexing_pass)
+
+def _pass_keys(df, indexing_pass):
+    """
+    Returns (positions, ranks, max_lag): keys replaced by integer ranks, in
+    sorted key order when neighbours (max_lag > 0) are paired.
+    """
+    positions, keys, max_lag = record_keys(df, indexing_pass)
+    if max_lag:
+        # As in recordlinkage: neighbours in the order of the *distinct* sorted keys
+        _, ranks = np.unique(keys, return_inverse=True)
+    else:
+        ranks, _ = pd.factorize(keys)
+
+    max_block_size = indexing_pass.get(constants.KEY_MAX_BLOCK_SIZE)
+    if max_block_size is not None and max_lag == 0:
+        small = np.bincount(ranks)[ranks] <= max_block_size
+        positions, ranks = positions[small], ranks[small]
+    return positions, ranks, max_lag
+
+def describe_pass(indexing_pass):
+    method = indexing_pass[constants.KEY_METHOD]
+    field = indexing_pass.get(constants.FIELD_SINGLE) or "+".join(indexing_pass[constants.KEY_FIELDS])
+    if method == constants.INDEX_BLOCK:
+        return f"Blocking on '{field}'"
+    if method == constants.INDEX_SORTED_NEIGHBOURHOOD:
+        return f"SortedNeighbourhood on '{field}' (window={indexing_pass[constants.SORTING_WINDOW_SIZE]})"
+    options = ", ".join(f"{key}={value}" for key, value in indexing_pass.items()
+                        if key not in (constants.KEY_METHOD, constants.FIELD_SINGLE, constants.KEY_FIELDS))
+    return f"{method} on '{field}' ({options})" if options else f"{method} on '{field}'"
+
+def iter_pass_pairs(df, indexing_pass, batch_size):
+    """
+    Yields the record pairs of one pass as sorted arrays of packed keys,
+    at most `batch_size` pairs per batch.
+
+    Records are grouped by rank; for every lag d the pairs are the
+    cartesian products of group r with group r + d, enumerated by a flat
+    pair counter so no group, however large, is materialized at once.
+    """
+    if indexing_pass[constants.KEY_METHOD] in PAIR_METHODS:
+        yield from PAIR_METHODS[indexing_pass[constants.KEY_METHOD]](df, indexing_pass, batch_size)
+        return
+    positions, ranks, max_lag = _pass_keys(df, indexing_pass)
+    order = np.argsort(ranks, kind="stable")
+    sorted_positions = positions[order]
+    counts = np.bincount(ranks) if len(ranks) else np.zeros(0, dtype=np.int64)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(np.int64)
+
+    for lag in range(max_lag + 1):
+        num_groups = len(counts) - lag
+        if num_groups <= 0:
+            break
+        left_counts, right_counts = counts[:num_groups], counts[lag:]
+        sizes = left_counts * right_counts
+        offsets = np.concatenate([[0], np.cumsum(sizes)])
+
+        for first in range(0, offsets[-1], batch_size):
+            flat = np.arange(first, min(first + batch_size, offsets[-1]), dtype=np.int64)
+            group = np.searchsorted(offsets, flat, side="right") - 1
+            within = flat - offsets[group]
+            left = sorted_positions[starts[group] + within // right_counts[group]]
+            right = sorted_positions[starts[group + lag] + within % right_counts[group]]
+            if lag == 0:
+                keep = left > right  # Both orders and self-pairs are enumerated
+                keys = pack_pairs(left[keep], right[keep])
+            else:
+                keys = pack_pairs(np.maximum(left, right), np.minimum(left, right))
+            keys.sort()
+            yield keys
+
+def _drop_seen(keys, seen):
+    """The keys not in the sorted array `seen`."""
+    positions = np.searchsorted(seen, keys)
+    found = positions < len(seen)
+    found[found] = seen[positions[found]] == keys[found]
+    return keys[~found]
+
+def iter_candidate_batches(df, batch_size=config.CANDIDATE_BATCH_SIZE, passes=None, stats=None):
+    """
+    Streams the union of the blocking passes (default config.BLOCKING_PASSES)
+    as MultiIndex batches of new pairs.
+
+    Pairs are deduplicated across passes against a sorted int64 array of
+    the keys emitted so far (8 bytes per candidate pair), so no per-pass
+    MultiIndex is ever built. Batches are not globally sorted.
+
+    Per-pass cost is printed and, if `stats` is a list, appended to it.
+    Time spent by the consumer between batches is not counted.
+    """
+    passes = config.BLOCKING_PASSES if passes is None else passes
+    num_records = len(df)
+    all_pairs = num_records * (num_records - 1) // 2
+    seen = np.empty(0, dtype=np.int64)
+    for number, indexing_pass in enumerate(passes, start=1):
+        print(f"Running Pass {number}: {describe_pass(indexing_pass)}...")
+        elapsed = 0.0
+        pass_pairs = 0
+        new_keys = []
+        pass_seen = np.empty(0, dtype=np.int64)
+        may_repeat = indexing_pass[constants.KEY_METHOD] in MULTI_KEY_METHODS
+        peak_bytes = seen.nbytes
+
+        start = time.perf_counter()
+        for keys in iter_pass_pairs(df, indexing_pass, batch_size):
+            if may_repeat:
+                # Records sharing several keys meet in several blocks
+                keys = _drop_seen(np.unique(keys), pass_seen)
+                pass_seen = np.sort(np.concatenate([pass_seen, keys]), kind="stable")
+            pass_pairs += len(keys)
+            batch_bytes = 3 * keys.nbytes
+            keys = _drop_seen(keys, seen)
+
+            pending = sum(k.nbytes for k in new_keys) + keys.nbytes
+            peak_bytes = max(peak_bytes, seen.nbytes + pass_seen.nbytes + pending + batch_bytes)
+            if len(keys):
+                new_keys.append(keys)
+                elapsed += time.perf_counter() - start
+                yield keys_to_multiindex(keys, df)
+                start = time.perf_counter()
+
+        # Only earlier passes need checking: a pass never repeats its own pairs
+        if new_keys:
+            seen = np.sort(np.concatenate([seen] + new_keys))
+        elapsed += time.perf_counter() - start
+
+        num_new = sum(len(k) for k in new_keys)
+        reduction = 1 - pass_pairs / all_pairs if all_pairs else 0.0
+        print(f"Pass {number} found {pass_pairs} pairs ({num_new} new) in {elapsed:.2f}s. "
+              f"Reduction ratio: {reduction:.4%}. Peak indexer memory: {peak_bytes / 2**20:.1f} MB")
+        if stats is not None:
+            stats.append({"pass": number, "description": describe_pass(indexing_pass),
+                          "pairs": pass_pairs, "new_pairs": num_new, "seconds": elapsed,
+                          "reduction_ratio": reduction})
+
+    if stats is not None:
+        print_pass_summary(stats, len(seen), all_pairs)
+
+def print_pass_summary(stats, num_candidates, all_pairs):
+    """Table of per-pass cost; passes adding (almost) no new pairs can be dropped."""
+    print("Blocking pass summary:")
+    print(f"  {'#':>2}  {'pass':<48} {'pairs':>10} {'new':>10} {'seconds':>8} {'reduction':>10}")
+    for row in stats:
+        print(f"  {row['pass']:>2}  {row['description'][:48]:<48} {row['pairs']:>10} "
+              f"{row['new_pairs']:>10} {row['seconds']:>8.2f} {row['reduction_ratio']:>10.4%}")
+    reduction = 1 - num_candidates / all_pairs if all_pairs else 0.0
+    print(f"  {'':>2}  {'all passes (union)':<48} {num_candidates:>10} {'':>10} "
+          f"{sum(row['seconds'] for row in stats):>8.2f} {reduction:>10.4%}")
+
+def create_candidate_pairs(df, block_config=None, batch_size=config.CANDIDATE_BATCH_SIZE):
+    """
+    Creates candidate pairs as the union of the blocking passes in
+    `block_config` (default config.BLOCKING_PASSES), as one sorted MultiIndex.
+    Identical to create_candidate_pairs_recordlinkage.
+    """
+    stats = []
+    batches = [unpack_pairs_index(batch)
+               for batch in iter_candidate_batches(df, batch_size, block_config, stats)]
+    print(f"Combining pairs from all {len(stats)} passes...")
+    keys = np.sort(np.concatenate(batches)) if batches else np.empty(0, dtype=np.int64)
+    if not df.index.is_monotonic_increasing:
+        # Position order is not label order; sort like MultiIndex.union does
+        label_rank = np.empty(len(df), dtype=np.int64)
+        label_rank[np.argsort(df.index.to_numpy(), kind="stable")] = np.arange(len(df))
+        higher, lower = unpack_pairs(keys)
+        keys = keys[np.lexsort((label_rank[lower], label_rank[higher]))]
+    return keys_to_multiindex(keys, df)
+
+def create_candidate_pairs_recordlinkage(df, block_config=None):
+    """
+    Reference implementation: one recordlinkage index per block and
+    sortedneighbourhood pass, then a chain of unions. Kept as the baseline
+    in benchmark.py.
+    """
+    passes = config.BLOCKING_PASSES if block_config is None else block_config
+    all_pairs = []
+    for number, indexing_pass in enumerate(passes, start=1):
+        method = indexing_pass[constants.KEY_METHOD]
+        field = indexing_pass[constants.FIELD_SINGLE]
+        print(f"Running Pass {number}: {describe_pass(indexing_pass)}...")
+        indexer = recordlinkage.Index()
+        if method == constants.INDEX_BLOCK:
+            indexer.block(on=field)
+        elif method == constants.INDEX_SORTED_NEIGHBOURHOOD:
+            indexer.sortedneighbourhood(left_on=field, window=indexing_pass[constants.SORTING_WINDOW_SIZE])
+        else:
+            raise ValueError(f"recordlinkage has no '{method}' indexer.")
+        pairs = indexer.index(df)
+        print(f"Pass {number} found {len(pairs)} pairs.")
+        all_pairs.append(pairs)
+
+    # --- Combine all results (union) ---
+    print(f"Combining pairs from all {len(all_pairs)} passes...")
+    candidate_pairs = all_pairs[0]
+    for pairs in all_pairs[1:]:
+        candidate_pairs = candidate_pairs.union(pairs)
+    return candidate_pairs
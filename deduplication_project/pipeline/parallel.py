@@ -0,0 +1,66 @@
+# --- File: pipeline/parallel.py ---
+
+import multiprocessing
+import os
+import numpy as np
+import pandas as pd
+from pipeline import comparison, classification
+
+# Worker state, set once per process by _init_worker. With the fork start
+# method the cleaned DataFrame is inherited copy-on-write, not pickled.
+_worker_df = None
+_worker_fields = None
+_worker_threshold = None
+_worker_names = None
+
+def _init_worker(df, comparison_fields, threshold, index_names):
+    global _worker_df, _worker_fields, _worker_threshold, _worker_names
+    _worker_df = df
+    _worker_fields = comparison_fields
+    _worker_threshold = threshold
+    _worker_names = index_names
+
+def _process_chunk(chunk):
+    """Compares and classifies one chunk; returns only the passing pairs."""
+    level_0, level_1 = chunk
+    candidate_pairs = pd.MultiIndex.from_arrays([level_0, level_1], names=_worker_names)
+    features = comparison.compare_pairs(candidate_pairs, _worker_df, _worker_fields)
+    return classification.find_duplicates(features, _worker_threshold, verbose=False)
+
+def _get_context():
+    # fork shares the DataFrame copy-on-write; elsewhere it is pickled once per worker
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
+
+def find_duplicates_chunked(candidate_pairs, df, comparison_fields, threshold,
+                            n_jobs=-1, chunk_size=50_000):
+    """
+    Runs comparison + classification over `candidate_pairs` in chunks of
+    `chunk_size` pairs on a pool of `n_jobs` processes (-1 = all cores).
+
+    Only the passing pairs of each chunk are sent back, so the full feature
+    matrix never exists. Chunks are collected in order; the result is
+    identical to find_duplicates(compare_pairs(...)) on the whole index.
+    """
+    if n_jobs is None or n_jobs < 1:
+        n_jobs = os.cpu_count() or 1
+
+    level_0 = candidate_pairs.get_level_values(0).to_numpy()
+    level_1 = candidate_pairs.get_level_values(1).to_numpy()
+    chunks = [(level_0[start:start + chunk_size], level_1[start:start + chunk_size])
+              for start in range(0, len(candidate_pairs), chunk_size)]
+    print(f"Comparing {len(candidate_pairs)} pairs in {len(chunks)} chunks on {n_jobs} processes...")
+
+    initargs = (df, comparison_fields, threshold, candidate_pairs.names)
+    if n_jobs == 1:
+        _init_worker(*initargs)
+        results = [_process_chunk(chunk) for chunk in chunks]
+    else:
+        with _get_context().Pool(n_jobs, initializer=_init_worker, initargs=initargs) as pool:
+            results = list(pool.imap(_process_chunk, chunks))
+
+    if not results:
+        return pd.Series([], dtype=np.float64,
+                         index=pd.MultiIndex.from_arrays([[], []], names=candidate_pairs.names))
+    return pd.concat(results)
@@ -0,0 +1,247 @@
+# --- File: pipeline/partitioned.py ---
+
+import os
+import resource
+import shutil
+import time
+import numpy as np
+import pandas as pd
+import config
+from pipeline import constants, indexing, preprocessing, comparison, classification, cascade, phonetic, storage
+
+# Out-of-core deduplication. The input is streamed in chunks, cleaned, and
+# every record is written to one partition per blocking pass:
+#   - block / phonetic passes: partition = hash of the blocking key, so each
+#     block lies in one partition;
+#   - sortedneighbourhood passes: partition = a range of the sorted distinct
+#     keys, plus a halo of the next window // 2 keys, so every neighbour pair
+#     is in the partition of its lower key.
+# Indexing, comparison and classification then run one partition at a time.
+# A pair is kept only by the first pass producing it: a partition of pass p
+# drops the pairs that an earlier pass would also produce, tested from the
+# records' own keys (block) or global key ranks (sortedneighbourhood).
+# Memory is bounded by the largest partition and its pairs, plus one
+# sorted-neighbourhood pass's distinct keys; a comparison batch holds only
+# the records its pairs reference.
+
+PARTITIONED_METHODS = (constants.INDEX_BLOCK, constants.INDEX_PHONETIC, constants.INDEX_SORTED_NEIGHBOURHOOD)
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far (Linux reports KB)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _check_passes(passes):
+    for indexing_pass in passes:
+        method = indexing_pass[constants.KEY_METHOD]
+        if method not in PARTITIONED_METHODS:
+            raise ValueError(f"'{method}' passes cannot be partitioned (one partition per record and "
+                             f"pass); use {', '.join(PARTITIONED_METHODS)}.")
+        if indexing_pass.get(constants.KEY_MAX_BLOCK_SIZE) is not None:
+            raise ValueError("max_block_size needs global block sizes; not supported when partitioned.")
+
+def _rank_column(number):
+    return f"_rank_{number}"
+
+def _part_dir(directory, number, partition):
+    return os.path.join(directory, f"pass-{number}", f"partition-{partition:04d}")
+
+def ingest(filepath, directory, passes, chunk_size):
+    """
+    Phase 1: streams `filepath`, cleans each chunk and writes it to
+    directory/records. Returns the number of records and, per
+    sortedneighbourhood pass, its sorted distinct keys.
+    """
+    records_dir = os.path.join(directory, "records")
+    os.makedirs(records_dir)
+    distinct = {number: np.empty(0, dtype=object) for number, indexing_pass in enumerate(passes)
+                if indexing_pass[constants.KEY_METHOD] == constants.INDEX_SORTED_NEIGHBOURHOOD}
+    num_records = 0
+    # One phonetic cache for all chunks, saved once (clean_records would reload it per chunk)
+    phonetic_cache = phonetic.PhoneticCache.load(config.PHONETIC_CACHE_FILE) if config.PHONETIC_KEYS else None
+    for chunk_number, chunk in enumerate(preprocessing.read_record_chunks(filepath, chunk_size)):
+        cleaned = preprocessing.clean_records(chunk, phonetic_cache, verbose=False)
+        cleaned["_pos"] = np.arange(num_records, num_records + len(cleaned))
+        for number in distinct:
+            _, keys, _ = indexing.record_keys(cleaned, passes[number])
+            distinct[number] = np.union1d(distinct[number], np.unique(keys))
+        storage.write_table(cleaned, os.path.join(records_dir, f"part-{chunk_number:05d}.parquet"),
+                            index_label="rec_id", fmt="parquet")
+        num_records += len(cleaned)
+    if phonetic_cache is not None:
+        phonetic_cache.save()
+    return num_records, distinct
+
+def partition(directory, passes, distinct, num_partitions):
+    """
+    Phase 2: re-reads the cleaned chunks and writes each record to its
+    partition of every pass (and to the halo of earlier ranges), annotated
+    with its global key rank in every sortedneighbourhood pass.
+    """
+    records_dir = os.path.join(directory, "records")
+    # Range boundaries over the distinct keys of each sortedneighbourhood pass
+    bounds = {number: np.linspace(0, len(keys), num_partitions + 1).astype(np.int64)
+              for number, keys in distinct.items()}
+    for part in sorted(os.listdir(records_dir)):
+        cleaned = storage.read_table(os.path.join(records_dir, part), fmt="parquet")
+        for number, keys in distinct.items():
+            positions, values, _ = indexing.record_keys(cleaned, passes[number])
+            ranks = np.full(len(cleaned), -1, dtype=np.int64)
+            ranks[positions] = np.searchsorted(keys, values)
+            cleaned[_rank_column(number)] = ranks
+
+        for number, indexing_pass in enumerate(passes):
+            positions, values, max_lag = indexing.record_keys(cleaned, indexing_pass)
+            if max_lag:
+                ranks = cleaned[_rank_column(number)].to_numpy()[positions]
+                ends = bounds[number][1:]
+                own = np.searchsorted(ends, ranks, side="right")
+                targets = [(own, positions, True)]
+                # Halo: the first max_lag ranks past the end of an earlier range
+                for earlier in range(num_partitions):
+                    halo = (ranks >= ends[earlier]) & (ranks < ends[earlier] + max_lag) & (own > earlier)
+                    targets.append((np.full(halo.sum(), earlier), positions[halo], False))
+            else:
+                hashes = pd.util.hash_array(values.astype(object))
+                targets = [((hashes % np.uint64(num_partitions)).astype(np.int64), positions, True)]
+
+            for partitions, rows, own_rows in targets:
+                for target in np.unique(partitions):
+                    part_dir = _part_dir(directory, number, target)
+                    os.makedirs(part_dir, exist_ok=True)
+                    piece = cleaned.iloc[rows[partitions == target]].assign(_own=own_rows)
+                    name = f"{os.path.splitext(part)[0]}-{'own' if own_rows else 'halo'}"
+                    storage.write_table(piece, os.path.join(part_dir, name), fmt="parquet")
+
+def _earlier_pass_keys(local, passes, number):
+    """
+    (codes, max_lag) per pass before `number`: the pair of rows i, j is
+    produced by that pass iff codes i and j are present (>= 0) and at most
+    max_lag apart. Codes are local key codes for block-type passes and
+    global key ranks for sortedneighbourhood passes.
+    """
+    earlier_keys = []
+    for earlier, indexing_pass in enumerate(passes[:number]):
+        if indexing_pass[constants.KEY_METHOD] == constants.INDEX_SORTED_NEIGHBOURHOOD:
+            max_lag = (indexing_pass[constants.SORTING_WINDOW_SIZE] - 1) // 2
+            earlier_keys.append((local[_rank_column(earlier)].to_numpy(), max_lag))
+        else:
+            positions, keys, _ = indexing.record_keys(local, indexing_pass)
+            codes = np.full(len(local), -1, dtype=np.int64)
+            codes[positions] = pd.factorize(keys)[0]
+            earlier_keys.append((codes, 0))
+    return earlier_keys
+
+def _drop_earlier_pairs(keys, earlier_keys):
+    """The pairs (packed local positions) no earlier pass produces."""
+    higher, lower = indexing.unpack_pairs(keys)
+    keep = np.ones(len(keys), dtype=bool)
+    for codes, max_lag in earlier_keys:
+        keep &= ~((codes[higher] >= 0) & (codes[lower] >= 0)
+                  & (np.abs(codes[higher] - codes[lower]) <= max_lag))
+    return keys[keep]
+
+def _read_partition(part_dir):
+    """The records of one partition, in input order and indexed by rec_id."""
+    pieces = [pd.read_parquet(os.path.join(part_dir, name)) for name in sorted(os.listdir(part_dir))]
+    local = pd.concat(pieces, ignore_index=True)
+    # Missing strings come back as None; the pipeline expects NaN
+    for col in local.columns[local.dtypes == object]:
+        local[col] = local[col].where(local[col].notna(), np.nan)
+    return local.sort_values("_pos", kind="stable").set_index("rec_id")
+
+def find_duplicates_partitioned(directory, passes, num_partitions, comparison_fields, threshold,
+                                batch_size, cache=None):
+    """
+    Phase 3: indexing, comparison and classification, one partition at a
+    time. Returns the duplicate pairs with scores and the number of
+    candidate pairs.
+    """
+    results = []
+    num_candidates = 0
+    largest = 0
+    # Pairs of small partitions are compared and classified together, in
+    # batches of about batch_size pairs as in the in-memory pipeline
+    pending_records, pending_pairs, pending_rows = [], [], 0
+    cascade_stats = {}
+
+    def compare_pending():
+        nonlocal pending_records, pending_pairs, pending_rows
+        records = pd.concat(pending_records)
+        # Halo records are also in their own partition
+        records = records[~records.index.duplicated()]
+        candidate_pairs = pending_pairs[0].append(pending_pairs[1:])
+        if config.CASCADED_COMPARISON:
+            results.append(cascade.find_duplicates_cascaded(
+                candidate_pairs, records, comparison_fields, threshold, cache, cascade_stats))
+        else:
+            features = comparison.compare_pairs(candidate_pairs, records, comparison_fields, cache)
+            results.append(classification.find_duplicates(features, threshold, verbose=False))
+        pending_records, pending_pairs, pending_rows = [], [], 0
+
+    for number, indexing_pass in enumerate(passes):
+        start = time.perf_counter()
+        pass_candidates = 0
+        for target in range(num_partitions):
+            part_dir = _part_dir(directory, number, target)
+            if not os.path.isdir(part_dir):
+                continue
+            local = _read_partition(part_dir)
+            largest = max(largest, len(local))
+            own = local["_own"].to_numpy()
+            earlier_keys = _earlier_pass_keys(local, passes, number)
+
+            for keys in indexing.iter_pass_pairs(local, indexing_pass, batch_size):
+                higher, lower = indexing.unpack_pairs(keys)
+                # A halo-only pair belongs to the next range's partition
+                keys = keys[own[higher] | own[lower]]
+                keys = _drop_earlier_pairs(keys, earlier_keys)
+                if not len(keys):
+                    continue
+                pass_candidates += len(keys)
+                # Only the records these pairs reference are kept for comparison
+                higher, lower = indexing.unpack_pairs(keys)
+                pending_records.append(local.iloc[np.unique(np.r_[higher, lower])])
+                pending_pairs.append(indexing.keys_to_multiindex(keys, local))
+                pending_rows += len(keys)
+                if pending_rows >= batch_size:
+                    compare_pending()
+        num_candidates += pass_candidates
+        print(f"Pass {number + 1}: {pass_candidates} new candidate pairs in {time.perf_counter() - start:.2f}s "
+              f"({indexing.describe_pass(indexing_pass)}).")
+    if pending_pairs:
+        compare_pending()
+    print(f"Largest partition: {largest} records.")
+    cascade.print_cascade_stats(cascade_stats)
+    if not results:
+        return pd.Series([], dtype=float), num_candidates
+    return pd.concat(results).sort_index(), num_candidates
+
+def run_partitioned(filepath, directory, passes, comparison_fields, threshold,
+                    chunk_size, num_partitions, batch_size, cache=None):
+    """
+    Out-of-core deduplication of `filepath`; partitions are written to (and
+    replace) `directory`. Prints the time and peak RSS after each phase.
+    Returns the duplicate pairs with scores.
+    """
+    if storage.pyarrow is None:
+        raise ImportError("Partitioned ingestion writes Parquet and requires pyarrow.")
+    _check_passes(passes)
+    shutil.rmtree(directory, ignore_errors=True)
+
+    start = time.perf_counter()
+    num_records, distinct = ingest(filepath, directory, passes, chunk_size)
+    print(f"Ingested {num_records} records in chunks of {chunk_size} in {time.perf_counter() - start:.2f}s. "
+          f"Peak RSS: {peak_rss_mb():.0f} MB")
+
+    start = time.perf_counter()
+    partition(directory, passes, distinct, num_partitions)
+    del distinct
+    print(f"Wrote {num_partitions} partitions per pass in {time.perf_counter() - start:.2f}s. "
+          f"Peak RSS: {peak_rss_mb():.0f} MB")
+
+    start = time.perf_counter()
+    duplicate_pairs_with_scores, num_candidates = find_duplicates_partitioned(
+        directory, passes, num_partitions, comparison_fields, threshold, batch_size, cache)
+    print(f"Compared {num_candidates} candidate pairs in {time.perf_counter() - start:.2f}s. "
+          f"Peak RSS: {peak_rss_mb():.0f} MB")
+    return duplicate_pairs_with_scores
@@ -0,0 +1,97 @@
+# --- File: pipeline/phonetic.py ---
+
+import os
+import pickle
+from importlib import metadata
+import numpy as np
+import pandas as pd
+
+try:
+    import jellyfish
+    # Cached codes are only valid for the jellyfish version that produced them
+    CACHE_VERSION = (1, metadata.version("jellyfish"))
+except ImportError:
+    jellyfish = None
+    CACHE_VERSION = None
+
+PHONETIC_ENCODINGS = ("soundex", "nysiis", "metaphone", "match_rating_codex")
+
+def phonetic_column(field, encoding):
+    """Name of the column preprocessing adds for `field` encoded with `encoding`."""
+    return f"{field}_{encoding}"
+
+class PhoneticCache:
+    """
+    Phonetic codes per (encoding, value), optionally saved to disk. Names
+    repeat heavily, so after the first run almost every distinct value is
+    a dictionary lookup rather than a jellyfish call.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.codes = {}  # encoding -> {value: code}
+        self.lookups = 0
+        self.hits = 0
+
+    @classmethod
+    def load(cls, path):
+        """Loads a saved cache, or starts an empty one if missing or stale."""
+        cache = cls(path)
+        if path is None or not os.path.exists(path):
+            return cache
+        try:
+            with open(path, "rb") as f:
+                saved = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            print(f"Warning: could not read phonetic cache {path}: {e}")
+            return cache
+        if saved.get("version") != CACHE_VERSION:
+            print("Phonetic cache was built with another jellyfish version; starting empty.")
+            return cache
+        cache.codes = saved["codes"]
+        return cache
+
+    def save(self):
+        if self.path is None:
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"version": CACHE_VERSION, "codes": self.codes}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+
+    def encode(self, values, encoding):
+        """Codes of the distinct `values`; values not seen before are encoded and added."""
+        known = self.codes.setdefault(encoding, {})
+        encode = getattr(jellyfish, encoding)
+        self.lookups += len(values)
+        self.hits += sum(value in known for value in values)
+        return [known[value] if value in known else known.setdefault(value, encode(value))
+                for value in values]
+
+def encode_column(column, encoding, cache=None):
+    """
+    Phonetic codes of a column of cleaned strings, computed once per
+    distinct value (through `cache` if given); an object Series, NaN kept.
+    """
+    if jellyfish is None:
+        raise ImportError("Phonetic keys require jellyfish.")
+    if encoding not in PHONETIC_ENCODINGS:
+        raise ValueError(f"Unknown phonetic encoding '{encoding}'.")
+    codes, uniques = pd.factorize(column)
+    values = [str(value) for value in uniques]
+    encoded = cache.encode(values, encoding) if cache is not None else [
+        getattr(jellyfish, encoding)(value) for value in values]
+    mapped = np.array(encoded + [np.nan], dtype=object)
+    return pd.Series(mapped[codes], index=column.index, name=phonetic_column(column.name, encoding))
+
+def add_phonetic_keys(df, phonetic_keys, cache=None):
+    """
+    Adds a <field>_<encoding> column to `df` (in place) for every encoding
+    of every field in `phonetic_keys` ({field: [encoding, ...]}) that `df`
+    has.
+    """
+    for field, encodings in phonetic_keys.items():
+        if field not in df.columns:
+            continue
+        for encoding in encodings:
+            df[phonetic_column(field, encoding)] = encode_column(df[field], encoding, cache)
@@ -1,21 +1,92 @@
 # --- File: pipeline/preprocessing.py ---
 
+import re
 import pandas as pd
 import numpy as np
 from recordlinkage.preprocessing import clean
+import config
+from pipeline import constants, phonetic, storage
 
-def load_and_clean_data(filepath):
+# Read dtypes of the text fields (few distinct values -> category). Numeric
+# fields are left to inference: cleaning their parsed values is part of the
+# established keys (street_number 5 is read as 5.0 and cleaned to "50").
+READ_DTYPES = {
+    'given_name': str, 'surname': str, 'address_1': str, 'address_2': str,
+    'suburb': 'category', 'state': 'category',
+}
+
+# recordlinkage.preprocessing.clean with its defaults, as one function per value
+BRACKETS = re.compile(r"(\[.*?\]|\(.*?\)|\{.*?\})")
+SPECIAL_CHARACTERS = re.compile(r"[^ \-\_A-Za-z0-9]+")
+# Lowercased values no step would change (most names and ids)
+ALREADY_CLEAN = re.compile(r"[a-z0-9]+(?: [a-z0-9]+)*")
+
+def clean_value(value):
     """
-    Loads and cleans data.
-    - Manually cleans only non-null values to preserve NaNs.
-    - Creates 'trunc' (truncated) fields for indexing.
+    Lowercases, drops bracketed text and characters other than letters,
+    digits, spaces, '-' and '_', turns '-' and '_' into spaces, collapses
+    runs of spaces and strips. Only spaces are left when whitespace is
+    collapsed, so split/join does it.
+    """
+    value = str(value).lower()
+    if ALREADY_CLEAN.fullmatch(value):
+        return value
+    value = SPECIAL_CHARACTERS.sub("", BRACKETS.sub("", value))
+    return " ".join(value.replace("-", " ").replace("_", " ").split())
+
+def _map_unique(column, func):
+    """func applied once per distinct non-null value; an object Series, NaN kept."""
+    codes, uniques = pd.factorize(column)
+    mapped = np.array([func(value) for value in uniques] + [np.nan], dtype=object)
+    return pd.Series(mapped[codes], index=column.index, name=column.name)
+
+def _read_dtypes(filepath):
+    """READ_DTYPES keyed by the file's own (not yet lower-cased) header names."""
+    header = pd.read_csv(filepath, nrows=0).columns
+    return {name: READ_DTYPES[name.lower().strip()] for name in header
+            if name.lower().strip() in READ_DTYPES}
+
+def load_records(filepath, first_rec_id=0):
+    """
+    Loads the raw records, indexed by a unique 'rec_id'.
+    - Text fields are read with explicit dtypes (READ_DTYPES).
+    - Files without a record id column are numbered from `first_rec_id`.
     """
     try:
-        df = pd.read_csv(filepath)
+        df = pd.read_csv(filepath, dtype=_read_dtypes(filepath))
     except FileNotFoundError:
         print(f"Error: Input file not found at {filepath}")
         return None
+    return set_record_index(df, first_rec_id)
+
+def _whole_file_dtypes(filepath, chunk_size):
+    """
+    The dtypes read_csv would infer for the whole file, found chunk by chunk.
+    Reading chunks with them keeps the parsed (and so the cleaned) values
+    of load_records: a chunk without missing street numbers would
+    otherwise parse them as int, and 5 would clean to "5", not "50".
+    """
+    dtypes = _read_dtypes(filepath)
+    inferred = {}
+    for chunk in pd.read_csv(filepath, usecols=lambda name: name not in dtypes, chunksize=chunk_size):
+        for name, dtype in chunk.dtypes.items():
+            seen = inferred.get(name, dtype)
+            if seen.kind in "iuf" and dtype.kind in "iuf":
+                inferred[name] = np.result_type(seen, dtype)
+            else:
+                inferred[name] = np.dtype(object)
+    dtypes.update({name: str if dtype == object else dtype for name, dtype in inferred.items()})
+    return dtypes
+
+def read_record_chunks(filepath, chunk_size):
+    """load_records, streamed: yields raw record chunks of `chunk_size` rows."""
+    dtypes = _whole_file_dtypes(filepath, chunk_size)
+    for chunk in pd.read_csv(filepath, dtype=dtypes, chunksize=chunk_size):
+        # Chunks keep counting rows, so generated ids match load_records
+        yield set_record_index(chunk)
 
+def set_record_index(df, first_rec_id=0):
+    """Indexes raw records by a unique 'rec_id' (rows numbered from `first_rec_id` if none)."""
     # --- Set a unique record index ---
     if 'rec_id' in df.columns:
         df = df.set_index('rec_id')
@@ -24,25 +95,73 @@ def load_and_clean_data(filepath):
         df.index.name = 'rec_id'
     else:
         df = df.reset_index().rename(columns={"index": "rec_id"})
+        df['rec_id'] += first_rec_id
         df = df.set_index('rec_id')
+    return df
+
+def load_and_clean_data(filepath, first_rec_id=0):
+    """
+    Loads and cleans data.
+    - Cleans only non-null values to preserve NaNs.
+    - Creates 'trunc' (truncated) fields and phonetic codes for indexing.
+    - Files without a record id column are numbered from `first_rec_id`.
+    """
+    df = load_records(filepath, first_rec_id)
+    if df is None:
+        return None
+    return clean_records(df)
+
+def clean_records(df, phonetic_cache=None, verbose=True):
+    """
+    The cleaning steps of load_and_clean_data, on a (shallow) copy of the raw
+    records. Each field is cleaned once per distinct value, and the cleaned
+    columns replace the raw ones whole. Cleaned fields are object columns
+    of str, NaN where missing. Phonetic codes (config.PHONETIC_KEYS) come
+    from `phonetic_cache`, else from config.PHONETIC_CACHE_FILE, which is
+    updated. `verbose=False` prints warnings only, not progress.
+    """
+    df = df.copy(deep=False)
 
     # --- Standardize column names ---
     df.columns = [c.lower().strip() for c in df.columns]
 
     # --- Clean data in relevant fields ---
-    fields_to_clean = [
-        'given_name', 'surname', 'street_number', 'address_1', 'address_2',
-        'suburb', 'postcode', 'state', 'date_of_birth', 'soc_sec_id'
-    ]
-    
-    for col in fields_to_clean:
+    for col in constants.FIELDS_TO_CLEAN:
+        if col in df.columns:
+            df[col] = _map_unique(df[col], clean_value)
+
+    # --- Create Truncated Indexing Keys ---
+    if verbose:
+        print("Creating truncated keys for indexing...")
+    if 'given_name' in df.columns:
+        df['given_name_trunc'] = _map_unique(df['given_name'], lambda name: name[:4]).rename('given_name_trunc')
+    if 'surname' in df.columns:
+        df['surname_trunc'] = _map_unique(df['surname'], lambda name: name[:4]).rename('surname_trunc')
+
+    # --- Create Phonetic Indexing Keys (once per distinct name) ---
+    if config.PHONETIC_KEYS:
+        if phonetic.jellyfish is None:
+            print("jellyfish not installed; phonetic keys not created.")
+        else:
+            if verbose:
+                print("Creating phonetic keys for indexing...")
+            cache = phonetic_cache if phonetic_cache is not None else phonetic.PhoneticCache.load(
+                config.PHONETIC_CACHE_FILE)
+            phonetic.add_phonetic_keys(df, config.PHONETIC_KEYS, cache)
+            if phonetic_cache is None:
+                cache.save()
+
+    return df
+
+def clean_records_recordlinkage(df):
+    """Reference implementation of clean_records: recordlinkage `clean` per column, `apply` for the keys."""
+    df = df.copy()
+    df.columns = [c.lower().strip() for c in df.columns]
+    for col in constants.FIELDS_TO_CLEAN:
         if col in df.columns:
             non_null_mask = df[col].notna()
             df.loc[non_null_mask, col] = clean(df.loc[non_null_mask, col].astype(str))
 
-    # --- Create Truncated Indexing Keys ---
-    print("Creating truncated keys for indexing...")
-    
     def get_trunc(name, length=4):
         if pd.isna(name):
             return np.nan
@@ -52,5 +171,29 @@ def load_and_clean_data(filepath):
         df['given_name_trunc'] = df['given_name'].apply(get_trunc)
     if 'surname' in df.columns:
         df['surname_trunc'] = df['surname'].apply(get_trunc)
-        
-    return df
\ No newline at end of file
+
+    if config.PHONETIC_KEYS and phonetic.jellyfish is not None:
+        for field, encodings in config.PHONETIC_KEYS.items():
+            if field not in df.columns:
+                continue
+            for encoding in encodings:
+                encode = getattr(phonetic.jellyfish, encoding)
+                df[phonetic.phonetic_column(field, encoding)] = df[field].apply(
+                    lambda name: np.nan if pd.isna(name) else encode(str(name)))
+    return df
+
+def load_cleaned_records(filepath):
+    """
+    load_and_clean_data, cached in config.CLEANED_RECORDS_FILE until
+    `filepath`, the preprocessing settings or code change.
+    """
+    settings = {"read_dtypes": READ_DTYPES, "fields": constants.FIELDS_TO_CLEAN,
+                "phonetic_keys": config.PHONETIC_KEYS}
+    return storage.load_cached(config.CLEANED_RECORDS_FILE, filepath,
+                               lambda: load_and_clean_data(filepath), 'rec_id',
+                               settings, [__file__, constants.__file__, phonetic.__file__])
+
+def load_raw_records(filepath):
+    """load_records, cached in config.RECORDS_FILE until `filepath`, READ_DTYPES or this code change."""
+    return storage.load_cached(config.RECORDS_FILE, filepath, lambda: load_records(filepath), 'rec_id',
+                               {"read_dtypes": READ_DTYPES}, [__file__])
@@ -0,0 +1,100 @@
+# --- File: pipeline/storage.py ---
+
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+import config
+
+# Parquet and Feather need pyarrow; without it the stages exchange CSV
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+FORMATS = ("parquet", "feather", "csv")
+
+def table_format(fmt=None):
+    """The intermediate file format: `fmt`, else config.INTERMEDIATE_FORMAT."""
+    fmt = fmt or config.INTERMEDIATE_FORMAT
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown intermediate format '{fmt}' (expected one of {FORMATS}).")
+    if fmt != "csv" and pyarrow is None:
+        return "csv"
+    return fmt
+
+def table_path(path, fmt=None):
+    """`path` with the extension of the intermediate format."""
+    return f"{os.path.splitext(path)[0]}.{table_format(fmt)}"
+
+def write_table(df, path, index_label=None, fmt=None):
+    """
+    Writes `df` to `path` (extension replaced by the format). The index is
+    written as column `index_label`, or dropped if None. Returns the path.
+    """
+    fmt = table_format(fmt)
+    path = table_path(path, fmt)
+    if index_label is not None:
+        df = df.rename_axis(index_label).reset_index()
+    if fmt == "parquet":
+        df.to_parquet(path, index=False)
+    elif fmt == "feather":
+        df.reset_index(drop=True).to_feather(path)
+    else:
+        df.to_csv(path, index=False)
+    return path
+
+def read_table(path, index_col=None, fmt=None):
+    """Reads a table written by write_table, with `index_col` as the index."""
+    fmt = table_format(fmt)
+    path = table_path(path, fmt)
+    if fmt == "csv":
+        df = pd.read_csv(path)
+    else:
+        df = pd.read_parquet(path) if fmt == "parquet" else pd.read_feather(path)
+        # Missing strings come back as None; the pipeline expects NaN
+        for col in df.columns[df.dtypes == object]:
+            df[col] = df[col].where(df[col].notna(), np.nan)
+    if index_col is not None:
+        df = df.set_index(index_col)
+    return df
+
+def file_digest(path):
+    """SHA-256 of the contents of the file `path`."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def cache_key(source, settings, code_files):
+    """Content hash of a cached table's input file, settings and code."""
+    payload = json.dumps({"source": file_digest(source), "settings": settings,
+                          "code": [file_digest(path) for path in code_files]}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+def load_cached(cache_path, source, build, index_label, settings=None, code_files=()):
+    """
+    The table cached at `cache_path` if it was built from the same file
+    `source`, `settings` and code (the contents of `code_files`), as
+    recorded in `cache_path`.key; otherwise build() (None on failure),
+    cached for the next run. Not cached as CSV: re-parsing would lose the
+    types, e.g. cleaned postcodes would come back as numbers.
+    """
+    if table_format() == "csv" or not os.path.exists(source):
+        return build()
+    path = table_path(cache_path)
+    key_path = path + ".key"
+    key = cache_key(source, settings, code_files)
+    if os.path.exists(path) and os.path.exists(key_path):
+        with open(key_path) as f:
+            if f.read().strip() == key:
+                print(f"Loading cached records from {path}...")
+                return read_table(path, index_col=index_label)
+    df = build()
+    if df is not None:
+        write_table(df, path, index_label=index_label)
+        with open(key_path, "w") as f:
+            f.write(key)
+    return df
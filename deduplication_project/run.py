@@ -0,0 +1,179 @@
+# --- File: run.py ---
+"""
+Runs the deduplication pipeline end to end in one process, handing each
+stage's result to the next in memory.
+
+Usage: python run.py [--stages STAGE[,STAGE...]] [--force]
+
+Stages: preprocess, index, compare, classify, cluster, analyze. The selected
+stages (default: all) and the stages they depend on are run; classify,
+cluster and analyze save their output files when selected. Every stage
+result is cached in config.STAGE_CACHE_DIR under a hash of its input file,
+upstream results, config and code, so unchanged stages are loaded instead
+of re-run. --force re-runs the selected stages regardless.
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import pickle
+import time
+import config
+import cluster
+import cluster_analysis
+import main
+from pipeline import preprocessing, indexing, comparison, classification, clustering, constants, phonetic, storage
+from pipeline.comparison_cache import ComparisonCache
+
+def _preprocess(results):
+    records = preprocessing.load_records(config.INPUT_FILE)
+    if records is None:
+        raise FileNotFoundError(config.INPUT_FILE)
+    return {"records": records, "cleaned": preprocessing.clean_records(records)}
+
+def _index(results):
+    return indexing.create_candidate_pairs(results["preprocess"]["cleaned"], config.BLOCKING_PASSES)
+
+def _compare(results):
+    cache = ComparisonCache.load(config.COMPARISON_CACHE_FILE, config.COMPARISON_CACHE_MAX_ENTRIES)
+    features = comparison.compare_pairs(results["index"], results["preprocess"]["cleaned"],
+                                        config.COMPARISON_FIELDS, cache)
+    cache.print_stats()
+    cache.save()
+    return features
+
+def _classify(results):
+    duplicate_pairs_with_scores = classification.find_duplicates(
+        results["compare"], config.CLASSIFICATION_THRESHOLD, verbose=False).sort_index()
+    print(f"** Found {len(duplicate_pairs_with_scores)} duplicate pairs. **")
+    return duplicate_pairs_with_scores
+
+def _pairs_table(duplicate_pairs_with_scores):
+    df_pairs = duplicate_pairs_with_scores.reset_index()
+    df_pairs.columns = ['level_0', 'level_1', 'score']
+    return df_pairs
+
+def _cluster(results):
+    return cluster.build_cluster_report(results["preprocess"]["records"], _pairs_table(results["classify"]),
+                                        config.CLUSTERING_THRESHOLD)
+
+def _analyze(results):
+    return cluster_analysis.analyze_cluster_quality(results["cluster"], _pairs_table(results["classify"]))
+
+def _save_analysis(df_analysis):
+    if df_analysis is not None:
+        cluster_analysis.save_quality_analysis(df_analysis)
+
+# name: (run, upstream stages, config the result depends on, modules whose
+# code it depends on, saves the result when the stage is selected)
+STAGES = {
+    "preprocess": (_preprocess, [], lambda: {"input": storage.file_digest(config.INPUT_FILE),
+                                             "phonetic_keys": config.PHONETIC_KEYS},
+                   [preprocessing, phonetic], None),
+    "index": (_index, ["preprocess"], lambda: {"passes": config.BLOCKING_PASSES},
+              [indexing, constants, phonetic], None),
+    "compare": (_compare, ["preprocess", "index"], lambda: {"fields": config.COMPARISON_FIELDS},
+                [comparison], None),
+    "classify": (_classify, ["compare"], lambda: {"threshold": config.CLASSIFICATION_THRESHOLD},
+                 [classification], main.save_results),
+    "cluster": (_cluster, ["preprocess", "classify"], lambda: {"threshold": config.CLUSTERING_THRESHOLD},
+                [cluster, clustering], cluster.save_cluster_report),
+    "analyze": (_analyze, ["classify", "cluster"], lambda: {},
+                [cluster_analysis], _save_analysis),
+}
+
+def _stage_key(name, keys):
+    """Content hash of a stage: its upstream keys, config and code."""
+    _, upstream, stage_config, modules, _ = STAGES[name]
+    code = [storage.file_digest(module.__file__) for module in modules]
+    payload = json.dumps({"stage": name, "upstream": [keys[u] for u in upstream],
+                          "config": stage_config(), "code": code}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+def _cache_file(name, key):
+    return os.path.join(config.STAGE_CACHE_DIR, f"{name}-{key}.pkl")
+
+def _store(name, key, result):
+    os.makedirs(config.STAGE_CACHE_DIR, exist_ok=True)
+    # One entry per stage: results of older inputs are dropped
+    for old in glob.glob(_cache_file(name, "*")):
+        os.remove(old)
+    tmp = _cache_file(name, key) + ".tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, _cache_file(name, key))
+
+def _dependencies(targets):
+    """The targets and every stage they depend on, in pipeline order."""
+    needed = set()
+    pending = list(targets)
+    while pending:
+        name = pending.pop()
+        if name not in needed:
+            needed.add(name)
+            pending += STAGES[name][1]
+    return [name for name in STAGES if name in needed]
+
+def run(targets=tuple(STAGES), force=False):
+    """
+    Runs (or loads from the stage cache) the `targets` and the stages they
+    need, saves the targets' outputs and prints the time of every stage.
+    Returns the results by stage name.
+    """
+    start_time = time.time()
+    order = _dependencies(targets)
+    keys = {}
+    for name in order:
+        keys[name] = _stage_key(name, keys)
+
+    results, timings = {}, []
+
+    def resolve(name):
+        # Cached results are loaded only when a stage that runs needs them
+        if name in results:
+            return results[name]
+        run_stage, upstream, _, _, _ = STAGES[name]
+        cache_file = _cache_file(name, keys[name]) if config.STAGE_CACHE_DIR else None
+        cached = cache_file and os.path.exists(cache_file) and not (force and name in targets)
+        if not cached:
+            for dependency in upstream:
+                resolve(dependency)
+        print(f"\n=== {name} ===")
+        step = time.time()
+        if cached:
+            with open(cache_file, "rb") as f:
+                results[name] = pickle.load(f)
+            print(f"Unchanged since the last run: loaded {cache_file}.")
+        else:
+            results[name] = run_stage(results)
+            if cache_file:
+                _store(name, keys[name], results[name])
+        timings.append((name, "cached" if cached else "ran", time.time() - step))
+        return results[name]
+
+    for name in order:
+        if name in targets:
+            save = STAGES[name][4]
+            result = resolve(name)
+            if save is not None:
+                save(result)
+
+    print("\nStage timings:")
+    for name, how, seconds in timings:
+        print(f"  {name:<12} {how:<7} {seconds:>8.2f}s")
+    print(f"--- Pipeline finished in {time.time() - start_time:.2f} seconds ---")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--stages", default=",".join(STAGES),
+                        help=f"comma-separated stages to run ({', '.join(STAGES)})")
+    parser.add_argument("--force", action="store_true", help="re-run the selected stages even if cached")
+    args = parser.parse_args()
+    targets = [name.strip() for name in args.stages.split(",") if name.strip()]
+    unknown = [name for name in targets if name not in STAGES]
+    if unknown:
+        parser.error(f"unknown stages {unknown}; choose from {', '.join(STAGES)}")
+    run(targets, args.force)